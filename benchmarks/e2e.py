@@ -0,0 +1,296 @@
+import argparse
+import asyncio
+import html
+import json
+import os
+import platform
+import re
+import sys
+import tempfile
+import time
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from multiprocessing import get_context
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlparse
+import logging
+
+from benchmarks.fake_retailer import FakeRetailerServer, catalogue_urls
+from benchmarks.fixtures import seed_products, sqlite_url
+from rate_limit import retailer_for_url
+
+logger = logging.getLogger(__name__)
+
+# Windows-specific setup
+if platform.system() == 'Windows':
+    asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines', 'e2e.json')
+DEFAULT_SIZES = (100, 1000, 10000)
+
+# The fake site never throttles; the production limits would only measure the limiter's sleeps
+UNTHROTTLED_LIMITS = {
+    retailer: {'rate': 1e6, 'max_rate': 1e6, 'concurrency': 8} for retailer in ('amazon', 'flipkart', 'croma')
+}
+
+# Same elements the Selenium scrapers read, as regexes over the fake site's markup
+HTTP_PATTERNS = {
+    'amazon': (r'id="productTitle">([^<]*)<', r'class="a-price-whole">([^<]*)<'),
+    'flipkart': (r'class="B_NuCI">([^<]*)<', r'class="_30jeq3">([^<]*)<'),
+    'croma': (r'class="pdp-product-title">([^<]*)<', r'class="amount">([^<]*)<'),
+}
+
+
+def http_scrape_product_data(driver=None, amazon_url=None, flipkart_url=None, croma_url=None, deadline=None):
+    """scrape_product_data without a browser: fetch the fake page over HTTP and read name and price
+
+    For machines without Chrome. Everything around the page load (limiters,
+    breakers, DB writes, events, alerts) still runs for real.
+    """
+    from deadline import DeadlineExceeded
+    from scrap_f import extract_price
+
+    url = amazon_url or flipkart_url or croma_url
+    retailer = retailer_for_url(url)
+    result = {'price': None, 'name': None, 'retailer': retailer, 'error': None, 'timed_out': False, 'outcome': None}
+    parsed = urlparse(url)
+    # *.localhost names need not resolve outside the browser; talk to the loopback address directly
+    request = urllib.request.Request(f"http://127.0.0.1:{parsed.port}{parsed.path}", headers={'Host': parsed.netloc})
+    try:
+        with urllib.request.urlopen(request, timeout=deadline.timeout(30) if deadline else 30) as response:
+            page = response.read().decode('utf-8')
+    except DeadlineExceeded:
+        result['error'] = "deadline exceeded"
+        result['timed_out'] = True
+        return result
+    except OSError as e:
+        result['error'] = str(e)
+        return result
+
+    name_pattern, price_pattern = HTTP_PATTERNS[retailer]
+    name = re.search(name_pattern, page)
+    price = re.search(price_pattern, page)
+    result['name'] = html.unescape(name.group(1)).strip() if name else None
+    result['price'] = extract_price(html.unescape(price.group(1))) if price else None
+    result['outcome'] = 'ok' if result['price'] else None
+    if not result['price']:
+        result['error'] = "price element not found"
+    return result
+
+
+@contextmanager
+def _patched(module, **attrs):
+    saved = {name: getattr(module, name) for name in attrs}
+    for name, value in attrs.items():
+        setattr(module, name, value)
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            setattr(module, name, value)
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process (None where the resource module is missing)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+async def run_cycle(
+    products: int,
+    browser: bool = False,
+    latency: float = 0.0,
+    jitter: float = 0.0,
+    change_ratio: float = 0.1,
+    history_length: int = 1,
+    seed: int = 1
+) -> Dict[str, Any]:
+    """Seed `products` products, serve them from the fake site and time one check_all_products cycle
+
+    Uses whatever database db_d is configured for, which must start without
+    products. With browser=False the page loads go through
+    http_scrape_product_data instead of Chrome.
+    """
+    from sqlalchemy import event
+
+    import check_prices
+    import db_d
+    from rate_limit import LimiterRegistry
+    from sinks import NotificationFanout
+
+    server = FakeRetailerServer(latency=latency, jitter=jitter, change_ratio=change_ratio, seed=seed)
+    async with server:
+        db = next(db_d.get_db())
+        try:
+            seed_products(db, catalogue_urls(products, server.port), history_length)
+        finally:
+            db.close()
+
+        commits = 0
+
+        def count_commit(connection):
+            nonlocal commits
+            commits += 1
+
+        patches = {'limiters': LimiterRegistry(UNTHROTTLED_LIMITS)}
+        if not browser:
+            patches['init_driver'] = lambda headless=True: None
+            patches['scrape_product_data'] = http_scrape_product_data
+
+        with _patched(check_prices, **patches):
+            monitor = check_prices.PriceMonitor()
+            # Offline: alerts are built and routed, but there is nowhere to send them
+            await monitor.notifier.close()
+            monitor.notifier = NotificationFanout([])
+
+            checked = {True: 0, False: 0}
+            check_product = monitor.check_product
+
+            async def counted_check(product_url, deadline=None):
+                ok = await check_product(product_url, deadline)
+                checked[ok] += 1
+                return ok
+
+            monitor.check_product = counted_check
+            event.listen(db_d.engine, 'commit', count_commit)
+            try:
+                async with monitor:
+                    started = time.perf_counter()
+                    await monitor.check_all_products(resume=False)
+                    elapsed = time.perf_counter() - started
+            finally:
+                event.remove(db_d.engine, 'commit', count_commit)
+
+    pages = sum(server.pages.values())
+    return {
+        'products': products,
+        'scraper': 'selenium' if browser else 'http',
+        'checked': checked[True],
+        'failed': checked[False],
+        'price_changes': sum(counts['changes'] for counts in monitor.stats.summary().values()),
+        'cycle_s': round(elapsed, 3),
+        'pages': pages,
+        'pages_per_s': round(pages / elapsed, 1) if elapsed else 0.0,
+        'db_commits': commits,
+        'db_writes_per_s': round(commits / elapsed, 1) if elapsed else 0.0,
+        'peak_rss_mb': peak_rss_mb()
+    }
+
+
+def _run_in_process(products: int, options: Dict[str, Any]) -> Dict[str, Any]:
+    """Child process body: fresh database, fresh working directory, quiet logs"""
+    from log_setup import configure_logging
+    configure_logging(level=options.pop('log_level'))
+    # Every drop alert would warn that no sinks are configured
+    logging.getLogger('sinks').setLevel(logging.ERROR)
+    database_url = options.pop('database_url')
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix='price-bench-') as directory:
+        # db_d builds its engine from POSTGRES_URL on first use, so set it before touching the database
+        os.environ['POSTGRES_URL'] = database_url or sqlite_url(directory)
+        os.chdir(directory)  # Checkpoint and scheduler state files land here
+        try:
+            return asyncio.run(run_cycle(products, **options))
+        finally:
+            os.chdir(cwd)
+
+
+def run_sizes(sizes: List[int], options: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """One child process per size, so peak RSS and the database are per run"""
+    results = []
+    for products in sizes:
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as pool:
+            result = pool.submit(_run_in_process, products, dict(options)).result()
+        print(format_result(result), flush=True)
+        results.append(result)
+    return results
+
+
+def format_result(result: Dict[str, Any]) -> str:
+    return (
+        f"{result['products']:>6} products ({result['scraper']}) in {result['cycle_s']:.2f}s | "
+        f"{result['pages_per_s']:.1f} pages/s | {result['db_writes_per_s']:.1f} DB commits/s | "
+        f"{result['checked']} ok, {result['failed']} failed, {result['price_changes']} changes | "
+        f"peak RSS {result['peak_rss_mb']} MB"
+    )
+
+
+def compare(results: List[Dict[str, Any]], baseline: Dict[str, Any]) -> List[str]:
+    """Lines describing how each run moved against the baseline run of the same size and scraper"""
+    lines = []
+    for result in results:
+        key = f"{result['scraper']}-{result['products']}"
+        previous = baseline.get('results', {}).get(key)
+        if not previous:
+            lines.append(f"{key}: no baseline")
+            continue
+        changes = []
+        for metric in ('cycle_s', 'pages_per_s', 'db_writes_per_s', 'peak_rss_mb'):
+            old, new = previous.get(metric), result.get(metric)
+            if old and new is not None:
+                changes.append(f"{metric} {old} -> {new} ({(new - old) / old:+.1%})")
+        lines.append(f"{key}: " + ", ".join(changes))
+    return lines
+
+
+def save_baseline(path: str, results: List[Dict[str, Any]], config: Dict[str, Any]) -> None:
+    """Merge results into the baseline file; keys are stable so a regression reads as a plain diff"""
+    baseline = {'config': config, 'results': {}}
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            baseline['results'] = json.load(f).get('results', {})
+    for result in results:
+        baseline['results'][f"{result['scraper']}-{result['products']}"] = result
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark of a full price check cycle")
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES), help="Catalogue sizes to run")
+    parser.add_argument('--browser', action='store_true', help="Load pages with headless Chrome (needs Chrome)")
+    parser.add_argument('--latency', type=float, default=0.0, help="Fake page latency in seconds")
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--change-ratio', type=float, default=0.1, help="Share of products whose price drops")
+    parser.add_argument('--history-length', type=int, default=1, help="Seeded price history entries per product")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--database-url', help="Empty database to use instead of a temporary SQLite file")
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true', help="Write these results into the baseline file")
+    parser.add_argument('--log-level', default='WARNING')
+    args = parser.parse_args()
+
+    options = {
+        'browser': args.browser,
+        'latency': args.latency,
+        'jitter': args.jitter,
+        'change_ratio': args.change_ratio,
+        'history_length': args.history_length,
+        'seed': args.seed,
+        'database_url': args.database_url,
+        'log_level': args.log_level
+    }
+    results = run_sizes(args.sizes, options)
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        for line in compare(results, baseline):
+            print(line)
+    if args.save_baseline:
+        config = {key: options[key] for key in ('latency', 'jitter', 'change_ratio', 'history_length', 'seed')}
+        config['python'] = platform.python_version()
+        save_baseline(args.baseline, results, config)
+        print(f"Baseline written to {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+import argparse
+import asyncio
+import html
+import logging
+import platform
+import random
+import zlib
+from collections import Counter
+from typing import List, Optional
+
+from aiohttp import web
+
+from rate_limit import retailer_for_url
+
+logger = logging.getLogger(__name__)
+
+# Windows-specific setup
+if platform.system() == 'Windows':
+    asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+
+RETAILERS = ('amazon', 'flipkart', 'croma')
+
+# Chrome resolves every *.localhost name to the loopback address, so these hosts reach the
+# fake server while still containing the "amazon." / "flipkart." / "croma." the scrapers key on
+RETAILER_HOSTS = {
+    'amazon': 'www.amazon.in.localhost',
+    'flipkart': 'www.flipkart.com.localhost',
+    'croma': 'www.croma.com.localhost',
+}
+PRODUCT_PATHS = {
+    'amazon': '/dp/B{:09d}',
+    'flipkart': '/item/p/itm{:010d}',
+    'croma': '/p/{:d}',
+}
+
+# Markup each scraper's selectors find (productTitle / a-price-whole, B_NuCI / _30jeq3,
+# pdp-product-title / amount), wrapped in enough filler to pass the classifier's size check
+PRODUCT_MARKUP = {
+    'amazon': (
+        '<span id="productTitle">{name}</span>'
+        '<div id="availability"><span>In stock</span></div>'
+        '<span class="a-price"><span class="a-offscreen">&#8377;{price}</span>'
+        '<span class="a-price-whole">{price}</span></span>'
+    ),
+    'flipkart': '<h1><span class="B_NuCI">{name}</span></h1><div class="_30jeq3">&#8377;{price}</div>',
+    'croma': '<h1 class="pdp-product-title">{name}</h1><span class="amount">&#8377;{price}</span>',
+}
+FILLER = '<p>Specifications, offers, delivery and warranty details for this product.</p>' * 30
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html><head><title>{name} | {retailer}</title></head>
+<body><main>{markup}</main><section>{filler}</section></body></html>"""
+
+
+def product_url(retailer: str, index: int, port: int) -> str:
+    return f"http://{RETAILER_HOSTS[retailer]}:{port}{PRODUCT_PATHS[retailer].format(index)}"
+
+
+def catalogue_urls(products: int, port: int) -> List[str]:
+    """`products` URLs on the fake server, spread round-robin over the retailers"""
+    return [product_url(RETAILERS[i % len(RETAILERS)], i, port) for i in range(products)]
+
+
+def base_price(path: str) -> int:
+    """Stable per-product price, so a seeded database and the server agree without talking"""
+    return 1000 + zlib.crc32(path.encode()) % 90000
+
+
+def price_changes(path: str, change_ratio: float) -> bool:
+    """Whether this product's page shows a new price; a stable `change_ratio` share does"""
+    return (zlib.crc32(path.encode(), 1) % 10000) < change_ratio * 10000
+
+
+def format_inr(value: int) -> str:
+    """12345678 -> '1,23,45,678' (Indian digit grouping, as the retailers print it)"""
+    digits = str(value)
+    if len(digits) <= 3:
+        return digits
+    head, tail = digits[:-3], digits[-3:]
+    groups = []
+    while len(head) > 2:
+        groups.insert(0, head[-2:])
+        head = head[:-2]
+    if head:
+        groups.insert(0, head)
+    return ','.join(groups + [tail])
+
+
+class FakeRetailerServer:
+    """Offline stand-in for Amazon, Flipkart and Croma product pages
+
+    Serves every product path under the hosts in RETAILER_HOSTS after sleeping
+    `latency` (+ up to `jitter`) seconds. Prices come from base_price(); a
+    `change_ratio` share of products shows a 20% drop, so a check cycle has
+    price changes to write and alert on.
+    """
+
+    def __init__(
+        self,
+        host: str = '127.0.0.1',
+        port: int = 0,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        change_ratio: float = 0.1,
+        seed: Optional[int] = None
+    ):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.jitter = jitter
+        self.change_ratio = change_ratio
+        self.random = random.Random(seed)
+        self.pages: Counter = Counter()
+        self.runner = None
+
+    def render(self, retailer: str, path: str) -> str:
+        price = base_price(path)
+        if price_changes(path, self.change_ratio):
+            price = int(price * 0.8)
+        name = html.escape(f"{retailer.title()} benchmark product {path.rsplit('/', 1)[-1]}")
+        markup = PRODUCT_MARKUP[retailer].format(name=name, price=format_inr(price))
+        return PAGE_TEMPLATE.format(name=name, retailer=retailer.title(), markup=markup, filler=FILLER)
+
+    async def handle(self, request: web.Request) -> web.Response:
+        retailer = retailer_for_url(f"http://{request.host}")
+        if retailer not in RETAILERS:
+            return web.Response(status=404, text="Unknown retailer host")
+
+        delay = self.latency + (self.random.uniform(0, self.jitter) if self.jitter else 0.0)
+        if delay:
+            await asyncio.sleep(delay)
+
+        self.pages[retailer] += 1
+        return web.Response(text=self.render(retailer, request.path), content_type='text/html')
+
+    async def start(self) -> int:
+        app = web.Application()
+        app.router.add_get('/{tail:.*}', self.handle)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, self.host, self.port)
+        await site.start()
+        # Resolve the real port when an ephemeral one (0) was requested
+        self.port = self.runner.addresses[0][1]
+        logger.info("Fake retailer site listening on %s:%s", self.host, self.port)
+        return self.port
+
+    async def stop(self):
+        if self.runner:
+            await self.runner.cleanup()
+            self.runner = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.stop()
+
+
+async def serve_forever(server: FakeRetailerServer):
+    async with server:
+        for retailer in RETAILERS:
+            logger.info("Example %s page: %s", retailer, product_url(retailer, 1, server.port))
+        while True:
+            await asyncio.sleep(3600)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve fake Amazon/Flipkart/Croma product pages")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8098)
+    parser.add_argument('--latency', type=float, default=0.0, help="Base page latency in seconds")
+    parser.add_argument('--jitter', type=float, default=0.0, help="Extra random latency in seconds")
+    parser.add_argument('--change-ratio', type=float, default=0.1, help="Share of products showing a price drop")
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    server = FakeRetailerServer(
+        host=args.host,
+        port=args.port,
+        latency=args.latency,
+        jitter=args.jitter,
+        change_ratio=args.change_ratio,
+        seed=args.seed
+    )
+    try:
+        asyncio.run(serve_forever(server))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    from log_setup import configure_logging
+    configure_logging()
+    main()
@@ -0,0 +1,58 @@
+import os
+import time
+import uuid
+from typing import Iterable
+from urllib.parse import urlparse
+import logging
+
+from benchmarks.fake_retailer import base_price
+from rate_limit import retailer_for_url
+
+logger = logging.getLogger(__name__)
+
+SEED_BATCH_SIZE = 1000
+
+
+def sqlite_url(directory: str) -> str:
+    """A throwaway SQLite database in `directory` (a file, so scrape threads share it)"""
+    return f"sqlite:///{os.path.join(directory, 'benchmark_prices.db')}"
+
+
+def seed_products(db, urls: Iterable[str], history_length: int = 1) -> int:
+    """Insert one product per URL at its fake-site base price, with `history_length` history entries
+
+    Refuses a database that already tracks products: the benchmark checks the
+    whole table, so anything else in it would be scraped (and fail) too.
+    """
+    from db_d import Base, Product
+
+    Base.metadata.create_all(db.get_bind())
+    if db.query(Product.product_id).first() is not None:
+        raise ValueError("The benchmark database must start without products; point it at an empty database")
+
+    seeded = 0
+    batch = []
+    started = time.perf_counter()
+    for url in urls:
+        price = base_price(urlparse(url).path)
+        history = [
+            {'value': price, 'currency': 'INR', 'timestamp': f"2024-01-01 00:{i // 60 % 60:02d}:{i % 60:02d}"}
+            for i in range(history_length)
+        ]
+        batch.append({
+            'product_id': uuid.uuid4(),
+            'url': url,
+            'retailer': retailer_for_url(url),
+            'latest_prices': dict(history[-1]),
+            'price_history': history
+        })
+        if len(batch) >= SEED_BATCH_SIZE:
+            db.bulk_insert_mappings(Product, batch)
+            seeded += len(batch)
+            batch = []
+    if batch:
+        db.bulk_insert_mappings(Product, batch)
+        seeded += len(batch)
+    db.commit()
+    logger.info("Seeded %s products in %.1fs", seeded, time.perf_counter() - started)
+    return seeded
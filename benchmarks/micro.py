@@ -0,0 +1,302 @@
+import argparse
+import importlib
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import timeit
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Sequence
+import logging
+
+logger = logging.getLogger(__name__)
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines', 'micro.json')
+REGRESSION_THRESHOLD = 0.25  # A median this much slower than the baseline fails --check
+HISTORY_LENGTHS = (10, 100, 1000, 5000)
+
+# Modules carrying their own copy of the parser; the scrapers share product_urls.clean_url
+EXTRACT_PRICE_MODULES = ('scrap_f', 'scrap_d', 'scrapy')
+CLEAN_URL_MODULES = ('product_urls',)
+
+PRICE_TEMPLATES = (
+    "₹{inr}", "₹ {inr}", "₹{inr}.00", "M.R.P.: ₹{inr}.00", "Rs. {inr}", "Rs.{plain}/-", "INR {plain}",
+    "{inr}", "{plain}", "{plain}.{paise:02d}", "Deal Price: ₹{inr}", "₹{inr}\n(Inclusive of all taxes)",
+    "${intl}.{paise:02d}", "{euro},{paise:02d} €", "  ₹ {inr}  ", "",
+)
+URL_TEMPLATES = (
+    "https://www.amazon.in/{slug}/dp/B0{code}?ref=sr_1_{n}&tag=affiliate-21&psc=1&th=1",
+    "https://www.amazon.in/dp/B0{code}?pd_rd_w={token}&pf_rd_p={token}&content-id=amzn1.sym.{token}",
+    "https://www.amazon.in/{slug}/dp/B0{code}/ref=sr_1_{n}?keywords={slug}&qid=1700000000&sr=8-{n}#customerReviews",
+    "https://www.flipkart.com/{slug}/p/itm{token}?pid=MOB{code}&lid=LSTMOB{code}&marketplace=FLIPKART&srno=s_1_{n}",
+    "https://www.flipkart.com/{slug}/p/itm{token}?pid=MOB{code}&otracker=search&fm=organic&iid={token}",
+    "https://www.croma.com/{slug}/p/{n}{code}?utm_source=google&utm_medium=cpc&gclid={token}",
+    "https://www.croma.com/{slug}/p/{n}",
+    "https://shop.example.com/{slug}?utm_campaign={token}",
+)
+
+
+def _indian(value: int) -> str:
+    digits = str(value)
+    head, tail = digits[:-3], digits[-3:]
+    groups = []
+    while len(head) > 2:
+        groups.insert(0, head[-2:])
+        head = head[:-2]
+    return ','.join(([head] if head else []) + groups + [tail])
+
+
+def price_corpus(size: int = 20000, seed: int = 1) -> List[str]:
+    """Price strings as the three retailers (and the odd foreign page) print them"""
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(size):
+        value = int(rng.lognormvariate(9.5, 1.2)) + 1
+        corpus.append(rng.choice(PRICE_TEMPLATES).format(
+            inr=_indian(value), plain=value, paise=rng.randrange(100),
+            intl=f"{value:,}", euro=f"{value:,}".replace(',', '.')
+        ))
+    return corpus
+
+
+def url_corpus(size: int = 20000, seed: int = 1) -> List[str]:
+    """Product URLs with the tracking parameters, fragments and slugs seen in shared links"""
+    rng = random.Random(seed)
+    words = ('apple', 'iphone', 'samsung', 'galaxy', 'pro', 'max', '128gb', 'black', 'titanium', 'oneplus', '5g')
+    return [
+        rng.choice(URL_TEMPLATES).format(
+            slug='-'.join(rng.choices(words, k=rng.randint(2, 6))),
+            code=''.join(rng.choices('ABCDEFGHJKLMNPQRSTUVWXYZ0123456789', k=8)),
+            token=uuid.UUID(int=rng.getrandbits(128)).hex[:16],
+            n=rng.randint(1, 999999)
+        )
+        for _ in range(size)
+    ]
+
+
+def measure(func: Callable[[], Any], ops: int, repeat: int = 7, min_time: float = 0.2) -> List[float]:
+    """Seconds per operation for each of `repeat` runs; `func` performs `ops` operations per call"""
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange() if min_time else (1, None)
+    # autorange aims at 0.2s per run; scale that to the requested run length
+    number = max(1, int(number * min_time / 0.2)) if min_time else 1
+    return [total / (number * ops) for total in timer.repeat(repeat=repeat, number=number)]
+
+
+def summarize(name: str, samples: Sequence[float]) -> Dict[str, Any]:
+    """Median, spread and extremes in microseconds per operation"""
+    ordered = sorted(samples)
+    quartiles = statistics.quantiles(ordered, n=4) if len(ordered) > 1 else [ordered[0]] * 3
+    return {
+        'name': name,
+        'runs': len(ordered),
+        'median_us': round(statistics.median(ordered) * 1e6, 4),
+        'mean_us': round(statistics.fmean(ordered) * 1e6, 4),
+        'stdev_us': round(statistics.stdev(ordered) * 1e6, 4) if len(ordered) > 1 else 0.0,
+        'iqr_us': round((quartiles[2] - quartiles[0]) * 1e6, 4),
+        'min_us': round(ordered[0] * 1e6, 4),
+        'max_us': round(ordered[-1] * 1e6, 4)
+    }
+
+
+def bench_corpus(function_name: str, modules: Sequence[str], corpus: List[str],
+                 repeat: int, min_time: float) -> List[Dict[str, Any]]:
+    """Every module's copy of `function_name`, per call, over the same corpus"""
+    results = []
+    for module_name in modules:
+        function = getattr(importlib.import_module(module_name), function_name)
+        samples = measure(lambda: [function(text) for text in corpus], len(corpus), repeat, min_time)
+        results.append(summarize(f"{function_name}[{module_name}]", samples))
+    return results
+
+
+def bench_history_append(db, lengths: Sequence[int], repeat: int, appends: int = 20) -> List[Dict[str, Any]]:
+    """update_product_prices on a product whose price_history already has `length` entries"""
+    from db_d import Product, add_product_to_db, update_product_prices
+
+    results = []
+    for length in lengths:
+        url = f"https://www.croma.com/p/bench-history-{uuid.uuid4().hex}"
+        history = [
+            {'value': 1000 + i % 2, 'currency': 'INR', 'timestamp': '2024-01-01 00:00:00'} for i in range(length)
+        ]
+        add_product_to_db(db, url, 'croma', dict(history[-1]), history)
+        price = iter(range(10 ** 9))
+
+        def append():
+            for _ in range(appends):
+                # Always a new value, so every call really appends
+                update_product_prices(db, url, {'value': 2000 + next(price)})
+
+        samples = measure(append, appends, repeat, min_time=0)
+        results.append(summarize(f"history_append[{length}]", samples))
+        db.query(Product).filter(Product.url == url).delete()
+        db.commit()
+    return results
+
+
+def bench_inserts(db, rows: int, repeat: int) -> List[Dict[str, Any]]:
+    """add_product_to_db one row at a time against one bulk_insert_mappings call, per row"""
+    from db_d import Product, add_product_to_db
+
+    def batch_urls():
+        prefix = uuid.uuid4().hex
+        return [f"https://www.croma.com/p/bench-insert-{prefix}-{i}" for i in range(rows)]
+
+    inserted: List[str] = []
+    history = [{'value': 1000, 'currency': 'INR', 'timestamp': '2024-01-01 00:00:00'}]
+
+    def single():
+        urls = batch_urls()
+        inserted.extend(urls)
+        for url in urls:
+            add_product_to_db(db, url, 'croma', dict(history[0]), history)
+
+    def bulk():
+        urls = batch_urls()
+        inserted.extend(urls)
+        db.bulk_insert_mappings(Product, [
+            {'product_id': uuid.uuid4(), 'url': url, 'retailer': 'croma',
+             'latest_prices': dict(history[0]), 'price_history': history}
+            for url in urls
+        ])
+        db.commit()
+
+    try:
+        return [
+            summarize('insert_single', measure(single, rows, repeat, min_time=0)),
+            summarize('insert_bulk', measure(bulk, rows, repeat, min_time=0))
+        ]
+    finally:
+        for start in range(0, len(inserted), 500):
+            db.query(Product).filter(Product.url.in_(inserted[start:start + 500])).delete(synchronize_session=False)
+        db.commit()
+
+
+def run(
+    corpus_size: int = 20000,
+    repeat: int = 7,
+    min_time: float = 0.2,
+    history_lengths: Sequence[int] = HISTORY_LENGTHS,
+    insert_rows: int = 200,
+    only: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """Every micro-benchmark (or those whose name contains `only`) against db_d's configured database"""
+    def wanted(group: str) -> bool:
+        return not only or only in group or group in only
+
+    results = []
+    if wanted('extract_price'):
+        prices = price_corpus(corpus_size)
+        results.extend(bench_corpus('extract_price', EXTRACT_PRICE_MODULES, prices, repeat, min_time))
+    if wanted('clean_url'):
+        urls = url_corpus(corpus_size)
+        results.extend(bench_corpus('clean_url', CLEAN_URL_MODULES, urls, repeat, min_time))
+    if wanted('history_append') or wanted('insert'):
+        import db_d
+        db_d.Base.metadata.create_all(db_d.engine)
+        db = next(db_d.get_db())
+        try:
+            if wanted('history_append'):
+                results.extend(bench_history_append(db, history_lengths, repeat))
+            if wanted('insert'):
+                results.extend(bench_inserts(db, insert_rows, repeat))
+        finally:
+            db.close()
+    return [result for result in results if not only or only in result['name']]
+
+
+def compare(results: List[Dict[str, Any]], baseline: Dict[str, Any],
+            threshold: float = REGRESSION_THRESHOLD) -> List[Dict[str, Any]]:
+    """Median change per benchmark against the baseline; 'regressed' when slower by more than `threshold`"""
+    rows = []
+    for result in results:
+        previous = baseline.get('results', {}).get(result['name'])
+        if not previous:
+            rows.append({'name': result['name'], 'baseline_us': None, 'median_us': result['median_us'],
+                         'change': None, 'regressed': False})
+            continue
+        change = (result['median_us'] - previous['median_us']) / previous['median_us']
+        rows.append({'name': result['name'], 'baseline_us': previous['median_us'], 'median_us': result['median_us'],
+                     'change': change, 'regressed': change > threshold})
+    return rows
+
+
+def save_baseline(path: str, results: List[Dict[str, Any]], config: Dict[str, Any]) -> None:
+    baseline = {'config': config, 'results': {}}
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            baseline['results'] = json.load(f).get('results', {})
+    for result in results:
+        baseline['results'][result['name']] = result
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Micro-benchmarks for price parsing, URL cleaning and product writes",
+        epilog="Baselines are only comparable on the machine that recorded them; re-record with --save-baseline."
+    )
+    parser.add_argument('--only', help="Run only benchmarks whose name contains this")
+    parser.add_argument('--corpus-size', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=7)
+    parser.add_argument('--min-time', type=float, default=0.2, help="Seconds per timed run for parsing benchmarks")
+    parser.add_argument('--history-lengths', type=int, nargs='+', default=list(HISTORY_LENGTHS))
+    parser.add_argument('--insert-rows', type=int, default=200)
+    parser.add_argument('--database-url', help="Database to write to instead of a temporary SQLite file")
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--check', action='store_true', help="Exit 1 if any median regressed past --threshold")
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD)
+    args = parser.parse_args()
+
+    from log_setup import configure_logging
+    # The parsers log every string they reject; keep that I/O out of the timings
+    configure_logging(level='ERROR')
+
+    with tempfile.TemporaryDirectory(prefix='price-micro-') as directory:
+        # db_d builds its engine from POSTGRES_URL on first use
+        os.environ['POSTGRES_URL'] = args.database_url or f"sqlite:///{os.path.join(directory, 'micro.db')}"
+        started = time.perf_counter()
+        results = run(args.corpus_size, args.repeat, args.min_time, args.history_lengths, args.insert_rows, args.only)
+        elapsed = time.perf_counter() - started
+        import db_d
+        db_d.engine.dispose()
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+    rows = {row['name']: row for row in compare(results, baseline, args.threshold)}
+
+    print(f"{'benchmark':<28} {'median us':>11} {'iqr us':>9} {'stdev us':>9} {'baseline':>10} {'change':>8}")
+    for result in results:
+        row = rows[result['name']]
+        change = f"{row['change']:+.1%}" if row['change'] is not None else '-'
+        flag = "  REGRESSED" if row['regressed'] else ""
+        baseline_us = f"{row['baseline_us']:.3f}" if row['baseline_us'] is not None else '-'
+        print(f"{result['name']:<28} {result['median_us']:>11.3f} {result['iqr_us']:>9.3f} "
+              f"{result['stdev_us']:>9.3f} {baseline_us:>10} {change:>8}{flag}")
+    print(f"{len(results)} benchmarks in {elapsed:.1f}s")
+
+    if args.save_baseline:
+        config = {'corpus_size': args.corpus_size, 'repeat': args.repeat, 'insert_rows': args.insert_rows,
+                  'python': platform.python_version(), 'platform': sys.platform}
+        save_baseline(args.baseline, results, config)
+        print(f"Baseline written to {args.baseline}")
+
+    regressed = [row['name'] for row in rows.values() if row['regressed']]
+    if args.check and regressed:
+        print(f"Slower than baseline by more than {args.threshold:.0%}: {', '.join(regressed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
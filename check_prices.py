@@ -1,34 +1,111 @@
 import os
+import argparse
 import asyncio
+import time
+from contextlib import nullcontext
 from datetime import datetime, timedelta
 from typing import List, Optional, Dict, Any
 from dotenv import load_dotenv
 import logging
-from db_d import get_db, update_product_prices
+from log_setup import configure_logging
+from db_d import get_db, get_engine, update_product_prices_bulk, get_subscriptions
 from scrap_f import scrape_product_data,init_driver
-from notify_c import DiscordNotifier
+from sinks import NotificationFanout
 from db_d import Product
+from subscriptions import SubscriptionMatcher
+from drop_rules import PRICE_DROP_THRESHOLD, MIN_ABSOLUTE_DROP
+from events import bus, PriceChangeEvent, PriceChangeStats, PostgresNotifyBridge
+from scheduler import RefreshScheduler, SCHEDULER_STATE_PATH
+from deadline import Deadline
+from rate_limit import limiters, classify_result
+from checkpoint import CycleCheckpoint
+import metrics
+import tracing
+from tracing import tracer
+from circuit_breaker import breakers
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
-# Configuration
-PRICE_DROP_THRESHOLD = 0.05  # 5% minimum drop to alert
-MIN_ABSOLUTE_DROP = 500      # ₹500 minimum absolute drop
+# Configuration (drop thresholds live in drop_rules so batch re-evaluation uses the same values)
 MAX_HISTORY_DAYS = 30        # Only compare prices from last 30 days
 ALERT_COOLDOWN_HOURS = 24    # Don't re-alert for same product within 24h
+PRODUCT_DEADLINE_SECONDS = float(os.getenv("PRODUCT_DEADLINE_SECONDS", 45))  # Total budget per product
+CYCLE_DEADLINE_SECONDS = float(os.getenv("CYCLE_DEADLINE_SECONDS", 0)) or None  # Whole run; unset = no limit
+TIMED_OUT_RETRY_SECONDS = 30 * 60
+# How often --scheduled runs re-read the catalogue (added/removed products) and subscriptions
+SCHEDULE_SYNC_SECONDS = float(os.getenv("SCHEDULE_SYNC_SECONDS", 300))
+SCHEDULE_SYNC_BATCH = 1000  # New URLs loaded per query
+
+@tracing.traced()
+def scrape_url(driver, product_url: str, deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+    """Scrape a tracked product URL with the retailer-specific scraper
+
+    Goes through the retailer's circuit breaker and rate limit; a result with
+    'skipped' set means the breaker is open and the page was never loaded.
+    """
+    breaker = breakers.for_url(product_url)
+    if not breaker.allow():
+        metrics.SCRAPES.labels(breaker.name, 'circuit_open').inc()
+        return {'error': f"{breaker.name} circuit open", 'skipped': True, 'retry_in': breaker.retry_in()}
+    limiter = limiters.get(breaker.name)
+    with tracer.span('rate_limit_wait', retailer=limiter.name) as span:
+        acquired = limiter.acquire(deadline.remaining() if deadline else None)
+        if span:
+            span.set(acquired=acquired)
+    if not acquired:
+        breaker.cancel()  # Our own budget ran out; says nothing about the site
+        return {'error': f"No {limiter.name} rate limit slot before the deadline", 'timed_out': True}
+
+    started = time.perf_counter()
+    data = None
+    outcome = 'error'
+    try:
+        data = scrape_product_data(
+            driver=driver,
+            amazon_url=product_url if 'amazon.' in product_url else None,
+            flipkart_url=product_url if 'flipkart.' in product_url else None,
+            croma_url=product_url if 'croma.' in product_url else None,
+            deadline=deadline
+        )
+        outcome = classify_result(data, time.perf_counter() - started)
+        tracing.annotate(retailer=breaker.name, outcome=outcome)
+        return data
+    finally:
+        metrics.SCRAPES.labels(breaker.name, outcome).inc()
+        limiter.release(outcome)
+        breaker = breakers.get((data or {}).get('retailer') or breaker.name)
+        if outcome == 'expired':
+            breaker.cancel()  # As with a missed rate limit slot: our budget, not the site
+        else:
+            breaker.record(outcome == 'ok')
 
 class PriceMonitor:
     def __init__(self):
         load_dotenv()
-        self.notifier = DiscordNotifier()
+        self.notifier = NotificationFanout.from_env()
+        self.notifier.on_undelivered = self.on_alert_undelivered
         self.last_alert_times: Dict[str, datetime] = {}
+        self.subscriptions = SubscriptionMatcher()
+        self.product_names: Dict[str, str] = {}
+        self.stats = PriceChangeStats()
+        self.scheduler = RefreshScheduler(state_path=SCHEDULER_STATE_PATH)
+        self.timed_out: List[str] = []
+        self.skipped: Dict[str, float] = {}  # Short-circuited URL -> seconds until its retailer is probed again
+        self.stop_requested = False
+        self.closed = False
+        self.profiler = None  # profiling.ProfileSession when run with --profile
+        self.schedule_synced_at: Optional[float] = None  # time.monotonic() of the last sync_schedule
         self.driver = init_driver(headless=True) 
 
+        # React to price changes published by db_d instead of re-reading the table
+        bus.subscribe(self.on_price_change)
+        bus.subscribe(self.stats)
+        bus.subscribe(self.scheduler.on_price_change)
+        self.notify_bridge = None
+        if os.getenv("PG_NOTIFY_EVENTS", "").lower() in ("1", "true", "yes"):
+            self.notify_bridge = PostgresNotifyBridge(get_engine())
+            bus.subscribe(self.notify_bridge.forward)
+
     def is_significant_drop(self, current: float, previous: float) -> bool:
         """Check if price drop meets both percentage and absolute thresholds"""
         drop_amount = previous - current
@@ -39,88 +116,414 @@ class PriceMonitor:
         
         return absolute_ok and percentage_ok
 
-    def should_alert(self, product_url: str) -> bool:
-        """Check if we should send alert (cooldown period)"""
-        last_alert = self.last_alert_times.get(product_url)
+    def load_subscriptions(self, db_session=None) -> None:
+        """(Re)build the subscription index; every entry point must call this before checking"""
+        own_session = db_session is None
+        if own_session:
+            db_session = next(get_db())
+        try:
+            matcher = SubscriptionMatcher()
+            matcher.load(get_subscriptions(db_session))
+            self.subscriptions = matcher
+        finally:
+            if own_session:
+                db_session.close()
+
+    def should_alert(self, key: str) -> bool:
+        """Check if we should send alert (cooldown period)
+
+        Keyed by product URL for shared alerts and by subscription_id for user alerts.
+        """
+        last_alert = self.last_alert_times.get(key)
         if not last_alert:
             return True
         return (datetime.now() - last_alert) > timedelta(hours=ALERT_COOLDOWN_HOURS)
 
-    async def check_product(self, product_url: str) -> None:
-        """Check price for a single product"""
+    def on_alert_undelivered(self, alert: Dict[str, Any]) -> None:
+        """No sink delivered the alert: lift its cooldown so the next drop alerts again"""
+        key = alert.get('subscription_id') or alert['url']
+        if self.last_alert_times.pop(key, None) is not None:
+            logger.warning("Alert for %s was not delivered; cooldown lifted", key)
+
+    async def check_product(self, product_url: str, deadline: Optional[Deadline] = None) -> bool:
+        """Check price for a single product; True if a price was scraped and stored
+
+        The scrape gets PRODUCT_DEADLINE_SECONDS, capped by `deadline` (the cycle budget).
+        A TRACE_SAMPLE_RATE share of checks is traced end to end.
+        """
+        profiled = self.profiler.product(product_url) if self.profiler else nullcontext()
+        with tracer.trace('check_product', url=product_url) as span, profiled as record:
+            ok = await self._check_product(product_url, deadline)
+            if span:
+                span.set(ok=ok)
+            if record:
+                record['ok'] = ok
+            return ok
+
+    async def _check_product(self, product_url: str, deadline: Optional[Deadline]) -> bool:
         db_session = next(get_db())
         try:
             product = db_session.query(Product).filter(Product.url == product_url).first()
-            if not product or not product.price_history:
-                logger.info(f"No history found for {product_url}")
-                return
+            if not product:
+                logger.info("%s is not tracked", product_url)
+                return False
+            if not product.price_history:
+                logger.info("First scrape of imported product %s", product_url)
 
-            latest_price = product.price_history[-1]['value']
+            product_deadline = (deadline or Deadline()).child(PRODUCT_DEADLINE_SECONDS)
+            # Scrape in a worker thread so the event loop stays free for signals, alerts and bridges
+            if self.profiler:
+                scraped_data = await asyncio.to_thread(self.profiler.runcall, scrape_url, self.driver, product_url, product_deadline)
+            else:
+                scraped_data = await asyncio.to_thread(scrape_url, self.driver, product_url, product_deadline)
             
-            # Fixed scraper call
-            scraped_data = scrape_product_data(
-                driver=self.driver,  # Add this line
-                amazon_url=product_url if 'amazon.' in product_url else None,
-                flipkart_url=product_url if 'flipkart.' in product_url else None,
-                croma_url=product_url if 'croma.' in product_url else None
-            )
-            
-            if not scraped_data or 'price' not in scraped_data:
-                logger.warning(f"Failed to scrape {product_url}")
-                return
+            if scraped_data and scraped_data.get('skipped'):
+                self.skipped[product_url] = scraped_data.get('retry_in') or 0.0
+                logger.info("Skipped %s: %s", product_url, scraped_data['error'])
+                return False
 
-            current_price = scraped_data['price']
-            update_product_prices(
-                db_session,
-                product_url,
-                {'value': current_price, 'currency': 'INR'}
-            )
+            if scraped_data and scraped_data.get('timed_out'):
+                self.timed_out.append(product_url)
+                logger.warning("Timed out checking %s", product_url)
+                return False
+
+            if scraped_data and scraped_data.get('outcome') in ('not_found', 'out_of_stock'):
+                logger.info("No price for %s: product is %s", product_url, scraped_data['outcome'])
+                return False
 
-            if self.is_significant_drop(current_price, latest_price):
-                if self.should_alert(product_url):
-                    await self.notifier.send_alert(
-                        product_name=scraped_data.get('name', 'Unknown Product'),
-                        old_price=latest_price,
-                        new_price=current_price,
-                        url=product_url,
-                        retailer=scraped_data.get('retailer', 'unknown')
-                    )
-                    self.last_alert_times[product_url] = datetime.now()
+            if not scraped_data or not scraped_data.get('price'):
+                logger.warning("Failed to scrape %s", product_url)
+                return False
+
+            self.product_names[product_url] = scraped_data.get('name') or 'Unknown Product'
+            events = update_product_prices_bulk(db_session, [(product_url, scraped_data['price'])], publish=False)
+            if events is None:
+                return False
+            for event in events:
+                # Alert right after the commit instead of whenever the cycle next yields;
+                # the other consumers (stats, scheduler, caches, bridge) still get it from the bus
+                bus.publish(event, exclude=(self.on_price_change,))
+                await self.on_price_change(event)
+            return True
 
         except Exception as e:
-            logger.error(f"Error checking {product_url}: {str(e)}")
+            logger.error("Error checking %s: %s", product_url, e)
+            return False
         finally:
             db_session.close()
 
-    async def check_all_products(self) -> None:
-        """Check prices for all tracked products"""
+    async def on_price_change(self, event: PriceChangeEvent) -> None:
+        """Alerting consumer for price change events
+
+        Matched subscriptions are alerted on their own users' destinations with a
+        cooldown per subscription; the global drop rules feed the shared sinks
+        with the per-product cooldown. Neither cooldown suppresses the other.
+        """
+        if event.old_value is None:
+            return
+
+        product_name = self.product_names.get(event.url, 'Unknown Product')
+        retailer = event.retailer or 'unknown'
+
+        matched = self.subscriptions.match(event.url, event.old_value, event.new_value)
+        if matched:
+            logger.info("%s subscriptions matched for %s", len(matched), event.url)
+        for subscription in matched:
+            if self.should_alert(subscription.subscription_id):
+                self.last_alert_times[subscription.subscription_id] = datetime.now()
+                await self.notifier.send_user_alert(
+                    subscription,
+                    product_name=product_name,
+                    old_price=event.old_value,
+                    new_price=event.new_value,
+                    url=event.url,
+                    retailer=retailer
+                )
+
+        if self.is_significant_drop(event.new_value, event.old_value) and self.should_alert(event.url):
+            # Claim the cooldown before awaiting so concurrent events can't double-alert
+            self.last_alert_times[event.url] = datetime.now()
+            await self.notifier.send_alert(
+                product_name=product_name,
+                old_price=event.old_value,
+                new_price=event.new_value,
+                url=event.url,
+                retailer=retailer
+            )
+
+    async def check_all_products(self, resume: bool = True) -> None:
+        """Check prices for all tracked products
+
+        Progress is checkpointed, so a run that dies or is stopped part-way
+        resumes with the products it had not finished (resume=False starts over).
+        """
         db_session = next(get_db())
+        checkpoint = CycleCheckpoint.load_or_start() if resume else CycleCheckpoint()
+        finished = False
         try:
             products = db_session.query(Product).all()
             if not products:
                 logger.info("No products found in database")
+                finished = True
                 return
 
-            for product in products:
-                await self.check_product(product.url)
+            self.load_subscriptions(db_session)
+
+            pending = [product for product in products if str(product.product_id) not in checkpoint.completed]
+            if checkpoint.resumed:
+                logger.info("Skipping %s products already checked in this cycle", len(products) - len(pending))
+
+            cycle_deadline = Deadline(CYCLE_DEADLINE_SECONDS)
+            for i, product in enumerate(pending):
+                if cycle_deadline.expired:
+                    logger.warning("Cycle deadline reached; %s products left unchecked", len(pending) - i)
+                    break
+                if self.stop_requested:
+                    logger.info("Stop requested; %s products left unchecked", len(pending) - i)
+                    break
+                ok = await self.check_product(product.url, cycle_deadline)
+                checkpoint.mark(str(product.product_id), ok)
+            else:
+                finished = True
 
         except Exception as e:
-            logger.error(f"Fatal error in price check: {str(e)}")
+            logger.error("Fatal error in price check: %s", e)
         finally:
             db_session.close()
-            await self.notifier.close()
+            if finished:
+                checkpoint.finish()
+            else:
+                checkpoint.save()
+            await bus.drain()
+            logger.info("Price changes this run: %s", self.stats.summary())
+            logger.info("Retailer rate limits: %s", limiters.snapshot())
+            if self.skipped:
+                logger.warning("%s products skipped by open circuit breakers: %s",
+                               len(self.skipped), breakers.snapshot())
+
+    async def check_all_products_pipelined(self, scrape_threads: int = 4, pool=None, resume: bool = True) -> Dict[str, Any]:
+        """Check every product through the staged scrape/persist/notify pipeline
+
+        Pass a started DriverPool to keep its browsers warm across cycles; otherwise
+        one is created for this call and closed afterwards. Checkpointed like
+        check_all_products.
+        """
+        from pipeline import DriverPool, PricePipeline
+
+        checkpoint = CycleCheckpoint.load_or_start() if resume else CycleCheckpoint()
+        db_session = next(get_db())
+        try:
+            self.load_subscriptions(db_session)
+            product_ids = {
+                url: str(product_id)
+                for product_id, url in db_session.query(Product.product_id, Product.url).yield_per(1000)
+                if str(product_id) not in checkpoint.completed
+            }
+        finally:
+            db_session.close()
+        if not product_ids:
+            logger.info("No products left to check")
+            checkpoint.finish()
+            return {}
+
+        own_pool = pool is None
+        if own_pool:
+            pool = DriverPool(scrape_threads, lambda: init_driver(headless=True), seed=[self.driver])
+        pipeline = PricePipeline(
+            self, pool,
+            deadline=Deadline(CYCLE_DEADLINE_SECONDS),
+            on_result=lambda url, ok: checkpoint.mark(product_ids[url], ok)
+        )
+        stats = None
+        try:
+            stats = await pipeline.run(product_ids)
+            return stats
+        finally:
+            if stats and not stats['skipped'] and not self.stop_requested:
+                checkpoint.finish()
+            else:
+                checkpoint.save()
+            if own_pool:
+                pool.close(keep=[self.driver])
+            logger.info("Price changes this run: %s", self.stats.summary())
+            logger.info("Retailer rate limits: %s", limiters.snapshot())
+
+    def sync_schedule(self, force: bool = False) -> None:
+        """Bring the scheduler in line with the products table, at most every SCHEDULE_SYNC_SECONDS
+
+        Only URLs are scanned; rows are loaded (url, retailer, latest_prices)
+        for products the scheduler hasn't seen, and known ones keep their
+        learned state. Subscriptions are reloaded on the same interval.
+        """
+        now = time.monotonic()
+        if not force and self.schedule_synced_at is not None and now - self.schedule_synced_at < SCHEDULE_SYNC_SECONDS:
+            return
+        db_session = next(get_db())
+        try:
+            self.load_subscriptions(db_session)
+            tracked = {url for (url,) in db_session.query(Product.url).yield_per(5000)}
+            removed = [url for url in self.scheduler.states if url not in tracked]
+            for url in removed:
+                self.scheduler.remove(url)
+            new = sorted(tracked.difference(self.scheduler.states))
+            for start in range(0, len(new), SCHEDULE_SYNC_BATCH):
+                rows = db_session.query(Product.url, Product.retailer, Product.latest_prices).filter(
+                    Product.url.in_(new[start:start + SCHEDULE_SYNC_BATCH]))
+                self.scheduler.add_products(rows)
+            self.scheduler.set_interest(self.subscriptions.interest)
+        finally:
+            db_session.close()
+        self.schedule_synced_at = now
+        logger.info("Schedule synced: %s new, %s removed, %s tracked", len(new), len(removed), len(tracked))
+
+    async def check_due_products(self, limit: Optional[int] = None) -> List[str]:
+        """Check only the products the scheduler says are due, within the page budget"""
+        self.sync_schedule()
+        due = self.scheduler.due(limit)
+        logger.info("%s of %s products due for a check", len(due), len(self.scheduler))
+        try:
+            cycle_deadline = Deadline(CYCLE_DEADLINE_SECONDS)
+            for url in due:
+                if cycle_deadline.expired or self.stop_requested:
+                    self.scheduler.defer(url, 0)
+                    continue
+                await self.check_product(url, cycle_deadline)
+                if url in self.skipped:
+                    # Retry once the breaker lets probes through, not after a full interval
+                    self.scheduler.defer(url, self.skipped.pop(url))
+                elif self.timed_out and self.timed_out[-1] == url:
+                    self.scheduler.defer(url, TIMED_OUT_RETRY_SECONDS)
+                else:
+                    self.scheduler.record(url)
+        finally:
+            await bus.drain()
+            try:
+                self.scheduler.save_state()
+            except OSError as e:
+                logger.error("Could not save scheduler state: %s", e)
+        return due
+
+    def request_stop(self) -> None:
+        """Finish the product in flight, then stop the current cycle early"""
+        self.stop_requested = True
+
+    async def __aenter__(self):
+        return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        """Clean up resources"""
+        await self.aclose()
+
+    async def aclose(self):
+        """Clean up resources; safe to call more than once"""
+        if self.closed:
+            return
+        self.closed = True
+        bus.unsubscribe(self.on_price_change)
+        bus.unsubscribe(self.stats)
+        bus.unsubscribe(self.scheduler.on_price_change)
+        if self.notify_bridge:
+            bus.unsubscribe(self.notify_bridge.forward)
         if hasattr(self, 'driver') and self.driver:
-            self.driver.quit()
+            try:
+                self.driver.quit()
+            except Exception as e:
+                logger.warning("Error closing driver: %s", e)
         await self.notifier.close()
 
-async def main():
-    monitor = PriceMonitor()
-    await monitor.check_all_products()
+def run_sharded(workers: int, resume: bool = True) -> None:
+    """Split the catalogue across worker processes, each with its own driver and DB connection
 
-if __name__ == "__main__":
+    The supervisor owns the cycle checkpoint, so an interrupted sharded run resumes too.
+    """
+    from sharding import ShardSupervisor
+
+    checkpoint = CycleCheckpoint.load_or_start() if resume else CycleCheckpoint()
+    db_session = next(get_db())
+    try:
+        product_ids = {
+            url: str(product_id) for product_id, url in db_session.query(Product.product_id, Product.url)
+            if str(product_id) not in checkpoint.completed
+        }
+    finally:
+        db_session.close()
+    if not product_ids:
+        logger.info("No products left to check")
+        checkpoint.finish()
+        return
+
+    stats = None
+    try:
+        stats = ShardSupervisor(workers).run(
+            list(product_ids), on_result=lambda url, ok: checkpoint.mark(product_ids[url], ok)
+        )
+    finally:
+        if stats and not stats['skipped']:
+            checkpoint.finish()
+        else:
+            checkpoint.save()
+    logger.info("Sharded run finished: %s", stats)
+
+async def main(args):
+    metrics.start_from_env()
+    profiler = None
+    if args.profile:
+        from profiling import ProfileSession
+
+        profiler = ProfileSession(memory=args.profile_memory, top=args.profile_top)
+        profiler.start()
+    try:
+        async with PriceMonitor() as monitor:
+            monitor.profiler = profiler
+            if args.scheduled:
+                await monitor.check_due_products(args.limit)
+            elif args.pipeline:
+                await monitor.check_all_products_pipelined(args.pipeline, resume=not args.fresh)
+            else:
+                await monitor.check_all_products(resume=not args.fresh)
+    finally:
+        metrics.dump_from_env()
+        tracing.dump_from_env()
+        if profiler:
+            profiler.stop()
+            profiler.write(args.profile)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Check tracked product prices and send drop alerts")
+    parser.add_argument('--scheduled', action='store_true',
+                        help="Only check products that are due according to their observed volatility")
+    parser.add_argument('--limit', type=int, default=None, help="Maximum products to check in scheduled mode")
+    parser.add_argument('--pipeline', type=int, default=0, metavar='THREADS',
+                        help="Run the staged pipeline with this many concurrent browser threads")
+    parser.add_argument('--fresh', action='store_true',
+                        help="Ignore any checkpoint from an interrupted run and check every product")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Shard products by URL hash across this many worker processes")
+    parser.add_argument('--profile', nargs='?', const='check_prices.profile.txt', default=None, metavar='REPORT',
+                        help="Run under cProfile and write a slowest-products/functions report (raw stats to REPORT.prof)")
+    parser.add_argument('--profile-memory', action='store_true',
+                        help="With --profile, also trace memory and report peak allocation sites")
+    parser.add_argument('--profile-top', type=int, default=20, metavar='N', help="Rows per section of the profile report")
+    args = parser.parse_args(argv)
+    if args.workers > 1 and (args.scheduled or args.pipeline):
+        # Scheduler state and the driver pool live in one process; refuse rather than silently drop the flag
+        parser.error("--workers cannot be combined with --scheduled or --pipeline")
+    if args.profile and (args.workers > 1 or args.pipeline):
+        # Per-product attribution needs products checked one at a time in this process
+        parser.error("--profile works with the sequential and --scheduled modes only")
+    if args.profile_memory and not args.profile:
+        parser.error("--profile-memory needs --profile")
+    return args
+
+def run(argv=None):
+    """Command-line entry point"""
     if os.name == 'nt':
         asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
-    asyncio.run(main())
\ No newline at end of file
+    args = parse_args(argv)
+    if args.workers > 1:
+        run_sharded(args.workers, resume=not args.fresh)
+    else:
+        asyncio.run(main(args))
+
+if __name__ == "__main__":
+    configure_logging()
+    run()
\ No newline at end of file
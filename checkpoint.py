@@ -0,0 +1,98 @@
+import json
+import os
+import time
+import uuid
+from typing import Iterable, List, Optional, Set
+import logging
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_PATH = os.getenv("CHECKPOINT_PATH", "check_cycle.checkpoint.json")
+CHECKPOINT_EVERY = int(os.getenv("CHECKPOINT_EVERY", 25))                 # Products between writes
+CHECKPOINT_MAX_AGE_HOURS = float(os.getenv("CHECKPOINT_MAX_AGE_HOURS", 12))  # Older ones start a new cycle
+
+
+class CycleCheckpoint:
+    """Progress of one check cycle, persisted so an interrupted run can resume
+
+    Completed product ids are skipped on resume; failed and unstarted ones are
+    checked again. The file is rewritten atomically every `every` products and
+    removed once the cycle finishes, so its presence means "resume me".
+    """
+
+    def __init__(self, path: str = CHECKPOINT_PATH, every: int = CHECKPOINT_EVERY,
+                 cycle_id: Optional[str] = None, started_at: Optional[float] = None):
+        self.path = path
+        self.every = max(1, every)
+        self.cycle_id = cycle_id or uuid.uuid4().hex
+        self.started_at = started_at or time.time()
+        self.completed: Set[str] = set()
+        self.failed: Set[str] = set()
+        self.resumed = False
+        self._since_save = 0
+
+    @classmethod
+    def load_or_start(cls, path: str = CHECKPOINT_PATH, every: int = CHECKPOINT_EVERY,
+                      max_age_hours: float = CHECKPOINT_MAX_AGE_HOURS) -> 'CycleCheckpoint':
+        """Resume the checkpoint at `path` if there is a recent one, else start a new cycle"""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return cls(path, every)
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable checkpoint %s: %s", path, e)
+            return cls(path, every)
+
+        age_hours = (time.time() - state.get('started_at', 0)) / 3600
+        if age_hours > max_age_hours:
+            logger.info("Checkpoint %s is %.1fh old; starting a new cycle", state.get('cycle_id'), age_hours)
+            return cls(path, every)
+
+        checkpoint = cls(path, every, cycle_id=state['cycle_id'], started_at=state['started_at'])
+        checkpoint.completed = set(state.get('completed', []))
+        checkpoint.failed = set(state.get('failed', [])) - checkpoint.completed
+        checkpoint.resumed = True
+        logger.info(
+            "Resuming cycle %s: %s done, %s failed and will be retried",
+            checkpoint.cycle_id, len(checkpoint.completed), len(checkpoint.failed)
+        )
+        return checkpoint
+
+    def pending(self, product_ids: Iterable[str]) -> List[str]:
+        return [product_id for product_id in product_ids if product_id not in self.completed]
+
+    def mark(self, product_id: str, ok: bool) -> None:
+        if ok:
+            self.completed.add(product_id)
+            self.failed.discard(product_id)
+        else:
+            self.failed.add(product_id)
+        self._since_save += 1
+        if self._since_save >= self.every:
+            self.save()
+
+    def save(self) -> None:
+        state = {
+            'cycle_id': self.cycle_id,
+            'started_at': self.started_at,
+            'saved_at': time.time(),
+            'completed': sorted(self.completed),
+            'failed': sorted(self.failed)
+        }
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        # Readers see either the old checkpoint or the new one, never half a file
+        os.replace(tmp_path, self.path)
+        self._since_save = 0
+
+    def finish(self) -> None:
+        """The cycle ran to the end: the next run starts fresh"""
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+        logger.info("Cycle %s finished: %s done, %s failed", self.cycle_id, len(self.completed), len(self.failed))
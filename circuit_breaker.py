@@ -0,0 +1,149 @@
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Optional
+import logging
+
+from rate_limit import retailer_for_url
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+BREAKER_FAILURE_RATE = float(os.getenv("BREAKER_FAILURE_RATE", 0.5))  # Share of recent scrapes that may fail
+BREAKER_WINDOW = int(os.getenv("BREAKER_WINDOW", 20))                  # Recent scrapes considered
+BREAKER_MIN_CALLS = int(os.getenv("BREAKER_MIN_CALLS", 5))             # Don't judge a retailer on fewer
+BREAKER_OPEN_SECONDS = float(os.getenv("BREAKER_OPEN_SECONDS", 300))   # Wait before probing again
+
+
+class CircuitBreaker:
+    """Closed / open / half-open breaker over a rolling window of scrape outcomes
+
+    Closed: every scrape goes through; once at least `min_calls` of the last
+    `window` results are in and the failure rate reaches `failure_rate`, the
+    breaker opens. Open: scrapes are refused until `open_seconds` have passed.
+    Half-open: up to `probes` scrapes go through; a success closes the breaker,
+    a failure re-opens it for another `open_seconds`.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_rate: float = BREAKER_FAILURE_RATE,
+        window: int = BREAKER_WINDOW,
+        min_calls: int = BREAKER_MIN_CALLS,
+        open_seconds: float = BREAKER_OPEN_SECONDS,
+        probes: int = 1,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.probes = probes
+        self.clock = clock
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.short_circuited = 0
+        self._results = deque(maxlen=window)
+        self._probes_in_flight = 0
+        self._lock = threading.Lock()
+
+    def _failure_rate(self) -> float:
+        return self._results.count(False) / len(self._results) if self._results else 0.0
+
+    def _open(self) -> None:
+        self.state = OPEN
+        self.opened_at = self.clock()
+        self._probes_in_flight = 0
+        logger.warning(
+            "Circuit for %s opened (failure rate %.0f%%); skipping scrapes for %.0fs",
+            self.name, self._failure_rate() * 100, self.open_seconds
+        )
+
+    def allow(self) -> bool:
+        """Whether a scrape may go ahead; every allowed scrape must be followed by record() or cancel()"""
+        with self._lock:
+            if self.state == OPEN:
+                if self.clock() - self.opened_at < self.open_seconds:
+                    self.short_circuited += 1
+                    return False
+                self.state = HALF_OPEN
+                logger.info("Circuit for %s half-open; probing", self.name)
+            if self.state == HALF_OPEN:
+                if self._probes_in_flight >= self.probes:
+                    self.short_circuited += 1
+                    return False
+                self._probes_in_flight += 1
+            return True
+
+    def record(self, success: bool) -> None:
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+                if success:
+                    self.state = CLOSED
+                    self._results.clear()
+                    logger.info("Circuit for %s closed again", self.name)
+                else:
+                    self._open()
+                return
+            if self.state == OPEN:
+                return  # Late result from before the breaker opened
+            self._results.append(success)
+            if len(self._results) >= self.min_calls and self._failure_rate() >= self.failure_rate:
+                self._open()
+
+    def cancel(self) -> None:
+        """An allowed scrape never reached the site: free a half-open probe slot, record nothing"""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+
+    def retry_in(self) -> float:
+        """Seconds until this breaker will let a probe through (0 when closed)"""
+        with self._lock:
+            if self.state != OPEN:
+                return 0.0
+            return max(0.0, self.open_seconds - (self.clock() - self.opened_at))
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'state': self.state,
+                'failure_rate': round(self._failure_rate(), 3),
+                'calls': len(self._results),
+                'short_circuited': self.short_circuited
+            }
+
+
+class BreakerRegistry:
+    """One CircuitBreaker per retailer, keyed like scrap_f's `retailer` field"""
+
+    def __init__(self, **defaults):
+        self.defaults = defaults
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def get(self, retailer: Optional[str]) -> CircuitBreaker:
+        retailer = (retailer or 'other').lower()
+        with self._lock:
+            breaker = self._breakers.get(retailer)
+            if breaker is None:
+                breaker = self._breakers[retailer] = CircuitBreaker(retailer, **self.defaults)
+            return breaker
+
+    def for_url(self, url: str) -> CircuitBreaker:
+        return self.get(retailer_for_url(url))
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            breakers = dict(self._breakers)
+        return {name: breaker.snapshot() for name, breaker in breakers.items()}
+
+
+# Process-wide registry shared by every scrape thread
+breakers = BreakerRegistry()
@@ -0,0 +1,121 @@
+import argparse
+import importlib
+import os
+import sys
+import logging
+
+from log_setup import configure_logging
+
+logger = logging.getLogger(__name__)
+
+# Everything heavy (Selenium, SQLAlchemy, aiohttp) is imported inside the command that needs it,
+# so `--help` and the light commands start in tens of milliseconds; tests/test_cli.py holds the budget
+
+# Subcommands handed to an existing entry point together with all of their arguments
+FORWARDED = {
+    'check': ('check_prices', 'run', "Check tracked products and send drop alerts"),
+    'daemon': ('daemon', 'main', "Check prices continuously with warm browsers"),
+    'queue': ('work_queue', 'main', "Distributed scrape job queue (enqueue / requeue / worker)"),
+    'rules': ('drop_rules', 'main', "Re-run or backtest drop alert rules against stored prices"),
+    'import': ('product_import', 'main', "Import product URLs from CSV/NDJSON for their first scrape"),
+    'export': ('history_export', 'main', "Stream price history to CSV/NDJSON, optionally gzipped"),
+    'api': ('price_api', 'main', "Serve the read-only price history API"),
+}
+
+# Options of cli.py itself; they are only understood before COMMAND
+GLOBAL_OPTIONS = ('--log-level',)
+
+
+def list_products(args) -> int:
+    from db_d import Product, get_db
+
+    db = next(get_db())
+    try:
+        query = db.query(Product.url, Product.retailer, Product.latest_prices).order_by(Product.url)
+        if args.retailer:
+            query = query.filter(Product.retailer == args.retailer)
+        for url, retailer, latest_prices in query.limit(args.limit):
+            price = (latest_prices or {}).get('value')
+            print(f"{retailer or '-':<9} {price if price is not None else '-':>10}  {url}")
+    finally:
+        db.close()
+    return 0
+
+
+def send_test_alert(args) -> int:
+    import asyncio
+
+    from sinks import NotificationFanout, sink_for_destination
+
+    async def send() -> bool:
+        sinks = [sink_for_destination(args.destination)] if args.destination else None
+        notifier = NotificationFanout(sinks) if sinks else NotificationFanout.from_env()
+        try:
+            return await notifier.deliver_alert(
+                product_name="Price tracker test alert",
+                old_price=1000.0,
+                new_price=800.0,
+                url="https://www.amazon.in/dp/TESTALERT",
+                retailer="test",
+                force=True
+            )
+        finally:
+            await notifier.close()
+
+    if os.name == 'nt':
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+    delivered = asyncio.run(send())
+    print("Test alert delivered" if delivered else "Test alert was not delivered")
+    return 0 if delivered else 1
+
+
+def init_database(args) -> int:
+    from db_d import init_db
+
+    init_db()
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='cli.py', description="Price tracker commands")
+    parser.add_argument('--log-level', default=None, help="Overrides LOG_LEVEL")
+    sub = parser.add_subparsers(dest='command', required=True, metavar='COMMAND')
+
+    for name, (_, _, help_text) in FORWARDED.items():
+        # No own options: --help and everything else go to the command itself
+        sub.add_parser(name, help=help_text, add_help=False)
+
+    products = sub.add_parser('products', help="List tracked products with their latest price")
+    products.add_argument('--retailer', default=None)
+    products.add_argument('--limit', type=int, default=50)
+    products.set_defaults(handler=list_products)
+
+    alert = sub.add_parser('test-alert', help="Send a test drop alert to the configured sinks")
+    alert.add_argument('--destination', default=None,
+                       help="Webhook URL to send to instead of the DISCORD_/JSON_WEBHOOK_URLS sinks")
+    alert.set_defaults(handler=send_test_alert)
+
+    init = sub.add_parser('init-db', help="Create missing tables and columns")
+    init.set_defaults(handler=init_database)
+    return parser
+
+
+def main(argv=None) -> int:
+    parser = build_parser()
+    args, rest = parser.parse_known_args(sys.argv[1:] if argv is None else argv)
+    misplaced = [arg for arg in rest if arg.split('=', 1)[0] in GLOBAL_OPTIONS]
+    if misplaced:
+        option = misplaced[0].split('=', 1)[0]
+        parser.error(f"{option} must come before the command, e.g. cli.py {option} ... {args.command}")
+    configure_logging(level=args.log_level)
+    if args.command in FORWARDED:
+        module_name, function_name, _ = FORWARDED[args.command]
+        getattr(importlib.import_module(module_name), function_name)(rest)
+        return 0
+    if rest:
+        parser.error(f"unrecognized arguments: {' '.join(rest)}")
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
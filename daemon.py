@@ -0,0 +1,177 @@
+import os
+import argparse
+import asyncio
+import signal
+import time
+from typing import Optional
+import logging
+
+from log_setup import configure_logging
+import metrics
+import tracing
+
+logger = logging.getLogger(__name__)
+
+DAEMON_INTERVAL_SECONDS = float(os.getenv("DAEMON_INTERVAL_SECONDS", 3600))  # Between full cycles
+SCHEDULED_POLL_SECONDS = 60  # Upper bound on sleeps in scheduled mode
+
+
+def driver_alive(driver) -> bool:
+    """Cheap round trip to the browser; False if the session or Chrome itself is gone"""
+    try:
+        driver.current_url
+        return True
+    except Exception:
+        return False
+
+
+class PriceDaemon:
+    """Run price check cycles forever in one process
+
+    The PriceMonitor (its driver, notifier HTTP session and learned scheduler
+    state), the DB engine's connection pool and, in pipeline mode, the driver
+    pool all live across cycles, so a cycle only pays for the scraping itself.
+    SIGTERM/SIGINT stop feeding new products, let in-flight ones finish
+    persisting and alerting, then close everything; a second signal aborts.
+    """
+
+    def __init__(
+        self,
+        interval: float = DAEMON_INTERVAL_SECONDS,
+        scheduled: bool = False,
+        pipeline_threads: int = 0,
+        limit: Optional[int] = None,
+        max_cycles: Optional[int] = None
+    ):
+        self.interval = interval
+        self.scheduled = scheduled
+        self.pipeline_threads = pipeline_threads
+        self.limit = limit
+        self.max_cycles = max_cycles
+        self.cycles = 0
+        self.monitor = None
+        self.pool = None
+        self.stopping = asyncio.Event()
+        self._signals = 0
+
+    def stop(self) -> None:
+        self.stopping.set()
+        if self.monitor:
+            self.monitor.request_stop()
+
+    def _on_signal(self, task: asyncio.Task, signame: str) -> None:
+        self._signals += 1
+        if self._signals == 1:
+            logger.info("Received %s; draining in-flight work before shutdown", signame)
+            self.stop()
+        else:
+            logger.warning("Received %s again; aborting", signame)
+            task.cancel()
+
+    def _install_signal_handlers(self) -> None:
+        loop = asyncio.get_running_loop()
+        task = asyncio.current_task()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            try:
+                loop.add_signal_handler(sig, self._on_signal, task, sig.name)
+            except (NotImplementedError, RuntimeError):
+                # Windows event loops have no add_signal_handler
+                signal.signal(sig, lambda signum, frame, name=sig.name: loop.call_soon_threadsafe(self._on_signal, task, name))
+
+    def _prepare_cycle(self) -> None:
+        self.monitor.timed_out.clear()
+        if not self.scheduled:
+            self.monitor.skipped.clear()
+        if self.pool:
+            replaced = self.pool.refresh(driver_alive)
+            if replaced:
+                logger.warning("Replaced %s dead browser(s) in the driver pool", replaced)
+        elif not driver_alive(self.monitor.driver):
+            from scrap_f import init_driver
+
+            logger.warning("Browser died; starting a new one")
+            self.monitor.driver = init_driver(headless=True)
+
+    async def run_cycle(self) -> None:
+        self._prepare_cycle()
+        started = time.perf_counter()
+        if self.scheduled:
+            await self.monitor.check_due_products(self.limit)
+        elif self.pool:
+            await self.monitor.check_all_products_pipelined(self.pipeline_threads, pool=self.pool)
+        else:
+            await self.monitor.check_all_products()
+        self.cycles += 1
+        logger.info("Cycle %s finished in %.1fs", self.cycles, time.perf_counter() - started)
+        metrics.dump_from_env()
+        tracing.dump_from_env(part=f"cycle{self.cycles}")
+
+    def _sleep_for(self) -> float:
+        if self.scheduled:
+            next_due = self.monitor.scheduler.next_due_in()
+            # Due products may still be held back by the page budget, so never spin
+            return min(SCHEDULED_POLL_SECONDS, max(1.0, next_due if next_due is not None else SCHEDULED_POLL_SECONDS))
+        return self.interval
+
+    async def run(self) -> None:
+        from check_prices import PriceMonitor
+
+        self._install_signal_handlers()
+        metrics_server = metrics.start_from_env()
+        loop = asyncio.get_running_loop()
+        async with PriceMonitor() as monitor:
+            self.monitor = monitor
+            if self.stopping.is_set():
+                monitor.request_stop()
+            try:
+                if self.pipeline_threads:
+                    from pipeline import DriverPool
+                    from scrap_f import init_driver
+
+                    self.pool = DriverPool(self.pipeline_threads, lambda: init_driver(headless=True), seed=[monitor.driver])
+                    await loop.run_in_executor(None, self.pool.start)
+
+                logger.info("Price daemon started")
+                while not self.stopping.is_set():
+                    await self.run_cycle()
+                    if self.max_cycles and self.cycles >= self.max_cycles:
+                        break
+                    try:
+                        await asyncio.wait_for(self.stopping.wait(), max(0.0, self._sleep_for()))
+                    except asyncio.TimeoutError:
+                        pass
+            finally:
+                if self.pool:
+                    self.pool.close(keep=[monitor.driver])
+                if metrics_server:
+                    metrics_server.shutdown()
+        logger.info("Price daemon stopped after %s cycles", self.cycles)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Check prices continuously with warm browsers")
+    parser.add_argument('--interval', type=float, default=DAEMON_INTERVAL_SECONDS,
+                        help="Seconds between full cycles")
+    parser.add_argument('--scheduled', action='store_true',
+                        help="Check products as the volatility scheduler makes them due")
+    parser.add_argument('--limit', type=int, default=None, help="Maximum products per scheduled pass")
+    parser.add_argument('--pipeline', type=int, default=0, metavar='THREADS',
+                        help="Run cycles through the staged pipeline with this many browser threads")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if os.name == 'nt':
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+    daemon = PriceDaemon(interval=args.interval, scheduled=args.scheduled,
+                         pipeline_threads=args.pipeline, limit=args.limit)
+    try:
+        asyncio.run(daemon.run())
+    except asyncio.CancelledError:
+        pass
+
+
+if __name__ == "__main__":
+    configure_logging()
+    main()
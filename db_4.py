@@ -7,11 +7,8 @@ import uuid
 import os
 import logging
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
+from log_setup import configure_logging
+
 logger = logging.getLogger(__name__)
 
 # Load environment variables
@@ -55,7 +52,7 @@ def add_product_to_db(db, url, retailer, latest_prices=None, price_history=None)
         return product
     except Exception as e:
         db.rollback()
-        logger.error(f"Database error: {str(e)}")
+        logger.error("Database error: %s", e)
         return None
 
 def migrate_database():
@@ -88,8 +85,9 @@ def initialize_db():
         Base.metadata.create_all(engine)  # Creates any missing tables
         logger.info("✅ Database initialization complete")
     except Exception as e:
-        logger.error(f"❌ Database initialization failed: {str(e)}")
+        logger.error("❌ Database initialization failed: %s", e)
         raise
 
 if __name__ == "__main__":
+    configure_logging()
     initialize_db()
\ No newline at end of file
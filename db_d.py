@@ -1,28 +1,51 @@
-from sqlalchemy import create_engine, Column, String, JSON, text
+from sqlalchemy import create_engine, Column, String, JSON, Float, Integer, DateTime, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID, insert as pg_insert
 from sqlalchemy.exc import IntegrityError
 from dotenv import load_dotenv
 import uuid
 import os
 import logging
 import json
+import threading
 import time
+from events import bus, make_event
+from log_setup import configure_logging
+from metrics import DB_COMMIT_SECONDS
+from tracing import traced
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
-load_dotenv()
-DATABASE_URL = os.getenv("POSTGRES_URL")
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)  # Bound by get_engine()
 Base = declarative_base()
 
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """The process's engine, created from POSTGRES_URL on first use rather than at import"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                load_dotenv()
+                database_url = os.getenv("POSTGRES_URL")
+                if not database_url:
+                    raise RuntimeError("POSTGRES_URL is not set")
+                engine = create_engine(database_url)
+                SessionLocal.configure(bind=engine)
+                _engine = engine
+    return _engine
+
+
+def __getattr__(name):
+    # Keeps `db_d.engine` working without connecting at import
+    if name == 'engine':
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 class Product(Base):
     __tablename__ = 'products'
     
@@ -34,7 +57,36 @@ class Product(Base):
     latest_prices = Column('latest_prices', JSON)
     price_history = Column('price_history', JSON)
 
+class Subscription(Base):
+    __tablename__ = 'subscriptions'
+
+    subscription_id = Column('subscription_id', PG_UUID(as_uuid=True),
+                             primary_key=True,
+                             default=uuid.uuid4)
+    user_id = Column('user_id', String(100), index=True)
+    product_url = Column('product_url', String(500), index=True)
+    target_price = Column('target_price', Float, nullable=True)
+    drop_percentage = Column('drop_percentage', Float, nullable=True)
+    webhook_url = Column('webhook_url', String(500), nullable=True)  # Where this user's alerts go
+
+class ScrapeJob(Base):
+    __tablename__ = 'scrape_jobs'
+
+    job_id = Column('job_id', PG_UUID(as_uuid=True),
+                    primary_key=True,
+                    default=uuid.uuid4)
+    # One job row per product, so a product can never be claimed twice at once
+    product_url = Column('product_url', String(500), unique=True, nullable=False)
+    status = Column('status', String(20), nullable=False, default='queued', index=True)  # queued/claimed/done/failed
+    attempts = Column('attempts', Integer, nullable=False, default=0)
+    claimed_by = Column('claimed_by', String(100), nullable=True)
+    available_at = Column('available_at', DateTime, nullable=False, index=True)  # UTC
+    lease_expires_at = Column('lease_expires_at', DateTime, nullable=True)       # UTC
+    heartbeat_at = Column('heartbeat_at', DateTime, nullable=True)               # UTC
+    last_error = Column('last_error', String(500), nullable=True)
+
 def get_db():
+    get_engine()
     db = SessionLocal()
     try:
         yield db
@@ -57,6 +109,7 @@ def add_product_to_db(db, url, retailer, latest_prices=None, price_history=None)
             existing_product.latest_prices = latest_prices or existing_product.latest_prices
             
             # Append new price history if different from last entry
+            event = None
             if price_history and isinstance(price_history, list):
                 if not existing_product.price_history:
                     existing_product.price_history = []
@@ -64,10 +117,17 @@ def add_product_to_db(db, url, retailer, latest_prices=None, price_history=None)
                 # Only add if price changed or no history exists
                 if (not existing_product.price_history or 
                     price_history[-1]['value'] != existing_product.price_history[-1].get('value')):
-                    existing_product.price_history.extend(price_history)
+                    old_value = existing_product.price_history[-1].get('value') if existing_product.price_history else None
+                    # Assign a new list: in-place mutation of a JSON column is not tracked
+                    existing_product.price_history = existing_product.price_history + price_history
+                    event = make_event(existing_product, old_value, price_history[-1]['value'],
+                                       price_history[-1].get('timestamp'))
             
-            db.commit()
+            with DB_COMMIT_SECONDS.labels('add_product').time():
+                db.commit()
             db.refresh(existing_product)
+            if event:
+                bus.publish(event)
             return existing_product
         else:
             # Add new product
@@ -83,13 +143,17 @@ def add_product_to_db(db, url, retailer, latest_prices=None, price_history=None)
                 price_history=price_history or []
             )
             db.add(product)
-            db.commit()
+            with DB_COMMIT_SECONDS.labels('add_product').time():
+                db.commit()
             db.refresh(product)
+            if product.price_history:
+                latest = product.price_history[-1]
+                bus.publish(make_event(product, None, latest['value'], latest.get('timestamp')))
             return product
             
     except IntegrityError as e:
         db.rollback()
-        logger.error(f"Database integrity error: {str(e)}")
+        logger.error("Database integrity error: %s", e)
         # Try to get the existing product if unique constraint failed
         existing = db.query(Product).filter(Product.url == url).first()
         if existing:
@@ -97,47 +161,161 @@ def add_product_to_db(db, url, retailer, latest_prices=None, price_history=None)
         return None
     except Exception as e:
         db.rollback()
-        logger.error(f"Database error: {str(e)}")
+        logger.error("Database error: %s", e)
         return None
 
+def _record_price(product, value, timestamp):
+    """Set latest price and append history if it changed; returns the change event or None"""
+    # Update latest prices
+    product.latest_prices = {
+        'value': value,
+        'currency': 'INR',
+        'timestamp': timestamp
+    }
+    
+    # Add to price history if price changed
+    if (not product.price_history or 
+        product.price_history[-1]['value'] != value):
+        
+        history_entry = {
+            'value': value,
+            'currency': 'INR',
+            'timestamp': timestamp
+        }
+        
+        old_value = product.price_history[-1]['value'] if product.price_history else None
+        # Assign a new list: in-place mutation of a JSON column is not tracked
+        product.price_history = (product.price_history or []) + [history_entry]
+        return make_event(product, old_value, value, timestamp)
+    return None
+
 def update_product_prices(db, url, new_price_data):
     try:
         product = db.query(Product).filter(Product.url == url).first()
         if product:
             timestamp = time.strftime('%Y-%m-%d %H:%M:%S')
+            event = _record_price(product, new_price_data['value'], timestamp)
             
-            # Update latest prices
-            product.latest_prices = {
-                'value': new_price_data['value'],
-                'currency': 'INR',
-                'timestamp': timestamp
-            }
-            
-            # Add to price history if price changed
-            if (not product.price_history or 
-                product.price_history[-1]['value'] != new_price_data['value']):
-                
-                history_entry = {
-                    'value': new_price_data['value'],
-                    'currency': 'INR',
-                    'timestamp': timestamp
-                }
-                
-                if not product.price_history:
-                    product.price_history = [history_entry]
-                else:
-                    product.price_history.append(history_entry)
-            
-            db.commit()
+            with DB_COMMIT_SECONDS.labels('update_price').time():
+                db.commit()
             db.refresh(product)
+            if event:
+                bus.publish(event)
             return product
         return None
     except Exception as e:
         db.rollback()
-        logger.error(f"Error updating product prices: {str(e)}")
+        logger.error("Error updating product prices: %s", e)
         return None
 
-if __name__ == "__main__":
+@traced('update_product_prices')
+def update_product_prices_bulk(db, updates, publish=True):
+    """Apply many (url, price) updates with one SELECT and one commit
+
+    Returns the PriceChangeEvents for prices that moved (None on failure); with
+    publish=False the caller is responsible for putting them on the bus.
+    """
+    prices = dict(updates)
+    if not prices:
+        return []
+    try:
+        timestamp = time.strftime('%Y-%m-%d %H:%M:%S')
+        products = db.query(Product).filter(Product.url.in_(list(prices))).all()
+        events = [
+            event for event in (_record_price(product, prices[product.url], timestamp) for product in products)
+            if event
+        ]
+        with DB_COMMIT_SECONDS.labels('update_prices_bulk').time():
+            db.commit()
+        if publish:
+            for event in events:
+                bus.publish(event)
+        return events
+    except Exception as e:
+        db.rollback()
+        logger.error("Error in bulk price update: %s", e)
+        return None
+
+def add_pending_products(db, products):
+    """Insert (url, retailer) pairs as products pending their first scrape, skipping URLs already tracked
+
+    Pending products have no latest price and an empty history; the next
+    check cycle (or the scheduler, which treats them as due) scrapes them.
+    Returns how many were added. One statement and one commit per call, so
+    callers pass batches.
+    """
+    rows = [
+        {'product_id': uuid.uuid4(), 'url': url[:500], 'retailer': retailer[:50],
+         'latest_prices': {}, 'price_history': []}
+        for url, retailer in dict(products).items()
+    ]
+    if not rows:
+        return 0
+    if db.bind.dialect.name == 'postgresql':
+        result = db.execute(pg_insert(Product.__table__).values(rows).on_conflict_do_nothing(index_elements=['url']))
+        added = result.rowcount
+    else:
+        # Portable fallback (SQLite for local tests)
+        existing = {url for (url,) in db.query(Product.url).filter(Product.url.in_([row['url'] for row in rows]))}
+        new_rows = [row for row in rows if row['url'] not in existing]
+        db.bulk_insert_mappings(Product, new_rows)
+        added = len(new_rows)
+    with DB_COMMIT_SECONDS.labels('add_pending_products').time():
+        db.commit()
+    return added
+
+def add_subscription(db, user_id, product_url, target_price=None, drop_percentage=None, webhook_url=None):
+    """Watch a product for a user, by target price and/or per-change drop percentage
+
+    Matches are sent to `webhook_url` (Discord or JSON webhook) when set, else
+    to the shared sinks.
+    """
+    if target_price is None and drop_percentage is None:
+        raise ValueError("A subscription needs a target_price or a drop_percentage")
+    try:
+        subscription = Subscription(
+            user_id=user_id[:100],
+            product_url=product_url[:500],
+            target_price=target_price,
+            drop_percentage=drop_percentage,
+            webhook_url=webhook_url[:500] if webhook_url else None
+        )
+        db.add(subscription)
+        with DB_COMMIT_SECONDS.labels('add_subscription').time():
+            db.commit()
+        db.refresh(subscription)
+        return subscription
+    except Exception as e:
+        db.rollback()
+        logger.error("Error adding subscription: %s", e)
+        return None
+
+def remove_subscription(db, subscription_id):
+    try:
+        deleted = db.query(Subscription).filter(Subscription.subscription_id == subscription_id).delete()
+        with DB_COMMIT_SECONDS.labels('remove_subscription').time():
+            db.commit()
+        return deleted > 0
+    except Exception as e:
+        db.rollback()
+        logger.error("Error removing subscription: %s", e)
+        return False
+
+def get_subscriptions(db, batch_size=10000):
+    """Stream all subscriptions without materialising the whole table"""
+    return db.query(Subscription).yield_per(batch_size)
+
+def init_db():
+    """Create missing tables and columns"""
+    engine = get_engine()
     # This will create tables if they don't exist
     Base.metadata.create_all(engine)
-    logger.info("✅ Database tables verified")
\ No newline at end of file
+    # create_all doesn't add columns to existing tables (SQLite test databases are always fresh)
+    if engine.dialect.name == 'postgresql':
+        with engine.begin() as connection:
+            connection.execute(text("ALTER TABLE subscriptions ADD COLUMN IF NOT EXISTS webhook_url VARCHAR(500)"))
+    logger.info("✅ Database tables verified")
+
+if __name__ == "__main__":
+    configure_logging()
+    init_db()
\ No newline at end of file
@@ -0,0 +1,49 @@
+import math
+import time
+from typing import Callable, Optional
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a product or cycle has used up its time budget"""
+
+
+class Deadline:
+    """Absolute time budget on the monotonic clock
+
+    A child deadline never outlives its parent, so a per-product budget
+    created from a per-cycle one is capped by whatever the cycle has left.
+    """
+
+    __slots__ = ('expires_at', 'clock')
+
+    def __init__(self, seconds: Optional[float] = None, parent: Optional['Deadline'] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.clock = clock
+        expires_at = clock() + seconds if seconds is not None else math.inf
+        if parent is not None:
+            expires_at = min(expires_at, parent.expires_at)
+        self.expires_at = expires_at
+
+    def child(self, seconds: Optional[float]) -> 'Deadline':
+        return Deadline(seconds, parent=self, clock=self.clock)
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - self.clock())
+
+    @property
+    def expired(self) -> bool:
+        return self.clock() >= self.expires_at
+
+    def check(self) -> None:
+        if self.expired:
+            raise DeadlineExceeded("deadline exceeded")
+
+    def timeout(self, default: float) -> float:
+        """Cap a wait/timeout at the time left; raises if nothing is left"""
+        self.check()
+        return min(default, self.remaining())
+
+
+def wait_timeout(deadline: Optional[Deadline], default: float) -> float:
+    """Timeout for a single wait, respecting an optional deadline"""
+    return deadline.timeout(default) if deadline else default
@@ -0,0 +1,189 @@
+import argparse
+import json
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from log_setup import configure_logging
+
+logger = logging.getLogger(__name__)
+
+# Alert thresholds (shared with check_prices.PriceMonitor.is_significant_drop)
+PRICE_DROP_THRESHOLD = 0.05  # 5% minimum drop to alert
+MIN_ABSOLUTE_DROP = 500      # ₹500 minimum absolute drop
+
+
+def detect_drops(
+    previous: Sequence[float],
+    current: Sequence[float],
+    retailers: Optional[Sequence[str]] = None,
+    all_time_low: Optional[Sequence[float]] = None,
+    pct_threshold: float = PRICE_DROP_THRESHOLD,
+    abs_threshold: float = MIN_ABSOLUTE_DROP,
+    retailer_overrides: Optional[Dict[str, Dict[str, float]]] = None,
+    require_all_time_low: bool = False
+) -> np.ndarray:
+    """Return indices of (previous, current) pairs that should alert
+
+    Same rule as PriceMonitor.is_significant_drop, evaluated over whole arrays:
+    the drop must meet both the percentage and the absolute threshold.
+    retailer_overrides maps a retailer to {'pct': ..., 'abs': ...}; with
+    require_all_time_low the current price must also be below all_time_low
+    (the lowest price seen before this change). Missing prices (None/NaN)
+    never alert.
+    """
+    prev = np.asarray(previous, dtype=np.float64)
+    cur = np.asarray(current, dtype=np.float64)
+    if prev.shape != cur.shape:
+        raise ValueError("previous and current must have the same length")
+
+    pct = np.full(prev.shape, pct_threshold, dtype=np.float64)
+    absolute = np.full(prev.shape, abs_threshold, dtype=np.float64)
+    if retailer_overrides:
+        if retailers is None:
+            raise ValueError("retailer_overrides needs the retailers array")
+        names = np.asarray(retailers)
+        for retailer, override in retailer_overrides.items():
+            mask = names == retailer
+            if 'pct' in override:
+                pct[mask] = override['pct']
+            if 'abs' in override:
+                absolute[mask] = override['abs']
+
+    drop = prev - cur
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pct_drop = np.where(prev > 0, drop / prev, 0.0)
+
+    # NaN comparisons are False, so missing prices drop out here
+    alert = (drop >= absolute) & (pct_drop >= pct)
+
+    if require_all_time_low:
+        if all_time_low is None:
+            raise ValueError("require_all_time_low needs the all_time_low array")
+        low = np.asarray(all_time_low, dtype=np.float64)
+        alert &= cur < low
+
+    return np.flatnonzero(alert)
+
+
+def _values(history: Optional[List[Dict[str, Any]]]) -> List[float]:
+    return [
+        float(entry['value']) if entry.get('value') is not None else np.nan
+        for entry in (history or [])
+    ]
+
+
+def catalogue_arrays(products: Iterable[Any]) -> Dict[str, np.ndarray]:
+    """Latest (previous, current) pair per product from products.price_history"""
+    urls, retailers, previous, current, lows = [], [], [], [], []
+    for product in products:
+        values = _values(product.price_history)
+        if len(values) < 2:
+            continue
+        urls.append(product.url)
+        retailers.append(product.retailer or '')
+        previous.append(values[-2])
+        current.append(values[-1])
+        lows.append(np.nanmin(values[:-1]))
+    return {
+        'url': np.asarray(urls, dtype=object),
+        'retailer': np.asarray(retailers, dtype=object),
+        'previous': np.asarray(previous, dtype=np.float64),
+        'current': np.asarray(current, dtype=np.float64),
+        'all_time_low': np.asarray(lows, dtype=np.float64)
+    }
+
+
+def history_arrays(products: Iterable[Any]) -> Dict[str, np.ndarray]:
+    """Every consecutive (previous, current) pair in history, for backtesting rules"""
+    urls, retailers, timestamps, previous, current, lows = [], [], [], [], [], []
+    for product in products:
+        history = product.price_history or []
+        values = np.asarray(_values(history), dtype=np.float64)
+        if len(values) < 2:
+            continue
+        n = len(values) - 1
+        urls.extend([product.url] * n)
+        retailers.extend([product.retailer or ''] * n)
+        timestamps.extend(entry.get('timestamp') for entry in history[1:])
+        previous.append(values[:-1])
+        current.append(values[1:])
+        lows.append(np.fmin.accumulate(values)[:-1])
+    if not previous:
+        empty = np.asarray([], dtype=np.float64)
+        return {'url': np.asarray([], dtype=object), 'retailer': np.asarray([], dtype=object),
+                'timestamp': np.asarray([], dtype=object), 'previous': empty, 'current': empty,
+                'all_time_low': empty}
+    return {
+        'url': np.asarray(urls, dtype=object),
+        'retailer': np.asarray(retailers, dtype=object),
+        'timestamp': np.asarray(timestamps, dtype=object),
+        'previous': np.concatenate(previous),
+        'current': np.concatenate(current),
+        'all_time_low': np.concatenate(lows)
+    }
+
+
+def evaluate(arrays: Dict[str, np.ndarray], **rules) -> List[Dict[str, Any]]:
+    """Run detect_drops over catalogue_arrays/history_arrays output and describe the hits"""
+    indices = detect_drops(
+        arrays['previous'],
+        arrays['current'],
+        retailers=arrays['retailer'],
+        all_time_low=arrays['all_time_low'],
+        **rules
+    )
+    hits = []
+    for i in indices:
+        hit = {
+            'url': arrays['url'][i],
+            'retailer': arrays['retailer'][i],
+            'previous': float(arrays['previous'][i]),
+            'current': float(arrays['current'][i])
+        }
+        if 'timestamp' in arrays:
+            hit['timestamp'] = arrays['timestamp'][i]
+        hits.append(hit)
+    return hits
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-run or backtest drop alert rules against stored prices")
+    parser.add_argument('--pct', type=float, default=PRICE_DROP_THRESHOLD, help="Minimum fractional drop, e.g. 0.05")
+    parser.add_argument('--abs', type=float, default=MIN_ABSOLUTE_DROP, help="Minimum absolute drop in INR")
+    parser.add_argument('--override', action='append', default=[],
+                        help="Per-retailer override as retailer:pct:abs, e.g. croma:0.1:1000")
+    parser.add_argument('--all-time-low', action='store_true', help="Only alert on new all-time lows")
+    parser.add_argument('--backtest', action='store_true', help="Evaluate every historical change, not just the latest")
+    args = parser.parse_args(argv)
+
+    overrides = {}
+    for spec in args.override:
+        retailer, pct, absolute = spec.split(':')
+        overrides[retailer] = {'pct': float(pct), 'abs': float(absolute)}
+
+    from db_d import get_db, Product
+
+    db = next(get_db())
+    try:
+        products = db.query(Product).yield_per(1000)
+        arrays = history_arrays(products) if args.backtest else catalogue_arrays(products)
+    finally:
+        db.close()
+
+    hits = evaluate(
+        arrays,
+        pct_threshold=args.pct,
+        abs_threshold=args.abs,
+        retailer_overrides=overrides,
+        require_all_time_low=args.all_time_low
+    )
+    for hit in hits:
+        print(json.dumps(hit))
+    logger.info("%s alerts out of %s price changes", len(hits), len(arrays['previous']))
+
+
+if __name__ == "__main__":
+    configure_logging()
+    main()
@@ -0,0 +1,228 @@
+import asyncio
+import json
+import logging
+import select
+import threading
+import time
+import uuid
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+# Identifies events published by this process, so the Postgres bridge neither
+# re-broadcasts remote events nor delivers our own NOTIFYs twice
+ORIGIN = uuid.uuid4().hex
+NOTIFY_CHANNEL = 'price_changes'
+
+
+class PriceChangeEvent(NamedTuple):
+    product_id: str
+    url: str
+    retailer: str
+    old_value: Optional[float]
+    new_value: float
+    timestamp: str
+    origin: str = ORIGIN
+
+    def to_json(self) -> str:
+        return json.dumps(self._asdict())
+
+    @classmethod
+    def from_json(cls, payload: str) -> 'PriceChangeEvent':
+        return cls(**json.loads(payload))
+
+
+class EventBus:
+    """In-process pub/sub for price changes
+
+    Plain callables run synchronously inside publish(); coroutine functions are
+    scheduled on the running event loop (and skipped with a warning if there is
+    none). A failing handler is logged and never breaks the publisher.
+    """
+
+    def __init__(self):
+        self._handlers: List[Callable[[PriceChangeEvent], Any]] = []
+        self._lock = threading.Lock()
+        self._tasks = set()
+
+    def subscribe(self, handler: Callable[[PriceChangeEvent], Any]) -> Callable[[PriceChangeEvent], Any]:
+        with self._lock:
+            if handler not in self._handlers:
+                self._handlers.append(handler)
+        return handler
+
+    def unsubscribe(self, handler: Callable[[PriceChangeEvent], Any]) -> bool:
+        """Remove a handler; returns whether it was subscribed"""
+        with self._lock:
+            if handler in self._handlers:
+                self._handlers.remove(handler)
+                return True
+            return False
+
+    def publish(self, event: PriceChangeEvent, exclude=()) -> None:
+        """Deliver to every handler except those in `exclude` (callers that handle the event themselves)"""
+        with self._lock:
+            handlers = [handler for handler in self._handlers if handler not in exclude]
+
+        for handler in handlers:
+            try:
+                if asyncio.iscoroutinefunction(handler):
+                    self._schedule(handler, event)
+                else:
+                    handler(event)
+            except Exception as e:
+                logger.error("Event handler %s failed: %s", getattr(handler, '__qualname__', handler), e)
+
+    def _schedule(self, handler, event: PriceChangeEvent) -> None:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            logger.warning("No running event loop; dropped async handler %s", handler.__qualname__)
+            return
+        task = loop.create_task(handler(event))
+        self._tasks.add(task)
+        task.add_done_callback(self._task_done)
+
+    def _task_done(self, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception():
+            logger.error("Async event handler failed: %s", task.exception())
+
+    async def drain(self) -> None:
+        """Wait for scheduled async handlers, e.g. before closing notifiers"""
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+
+# Process-wide bus used by db_d
+bus = EventBus()
+
+
+class PriceChangeStats:
+    """Running per-retailer counters, fed from the bus"""
+
+    def __init__(self):
+        self.changes: Dict[str, int] = defaultdict(int)
+        self.drops: Dict[str, int] = defaultdict(int)
+        self.rises: Dict[str, int] = defaultdict(int)
+        self.new_products: Dict[str, int] = defaultdict(int)
+
+    def __call__(self, event: PriceChangeEvent) -> None:
+        retailer = event.retailer or 'unknown'
+        self.changes[retailer] += 1
+        if event.old_value is None:
+            self.new_products[retailer] += 1
+        elif event.new_value < event.old_value:
+            self.drops[retailer] += 1
+        elif event.new_value > event.old_value:
+            self.rises[retailer] += 1
+
+    def summary(self) -> Dict[str, Dict[str, int]]:
+        return {
+            retailer: {
+                'changes': self.changes[retailer],
+                'drops': self.drops[retailer],
+                'rises': self.rises[retailer],
+                'new': self.new_products[retailer]
+            }
+            for retailer in self.changes
+        }
+
+
+class ProductVersions:
+    """Cache-invalidation consumer: a version counter per product, bumped on every change
+
+    Caches built from the products table (e.g. API responses) store the version
+    they were built at and are stale as soon as it moves; `generation` covers
+    caches that span many products.
+    """
+
+    def __init__(self):
+        self._versions: Dict[str, int] = defaultdict(int)
+        self.generation = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, event: PriceChangeEvent) -> None:
+        with self._lock:
+            self._versions[event.product_id] += 1
+            self.generation += 1
+
+    def version(self, product_id: str) -> int:
+        return self._versions.get(product_id, 0)
+
+
+# Always subscribed, so local and bridged changes both invalidate
+versions = ProductVersions()
+bus.subscribe(versions)
+
+
+class PostgresNotifyBridge:
+    """Carry bus events across processes with Postgres LISTEN/NOTIFY
+
+    Subscribe `forward` to the local bus to NOTIFY every locally published
+    event; run `listen` (usually in a thread) in another process to re-publish
+    those events on its own bus. Listening needs the psycopg2 driver.
+    """
+
+    def __init__(self, engine, event_bus: EventBus = bus, channel: str = NOTIFY_CHANNEL):
+        self.engine = engine
+        self.bus = event_bus
+        self.channel = channel
+        self._stop = threading.Event()
+
+    def forward(self, event: PriceChangeEvent) -> None:
+        if event.origin != ORIGIN:
+            return
+        with self.engine.begin() as conn:
+            conn.execute(text("SELECT pg_notify(:channel, :payload)"),
+                         {'channel': self.channel, 'payload': event.to_json()})
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def listen(self, poll_interval: float = 1.0) -> None:
+        """Block re-publishing remote events until stop() is called"""
+        raw = self.engine.raw_connection()
+        try:
+            connection = raw.driver_connection
+            connection.autocommit = True
+            with connection.cursor() as cursor:
+                cursor.execute(f'LISTEN "{self.channel}"')
+            logger.info("Listening for price changes on channel %s", self.channel)
+
+            while not self._stop.is_set():
+                ready, _, _ = select.select([connection], [], [], poll_interval)
+                if not ready:
+                    continue
+                connection.poll()
+                while connection.notifies:
+                    notify = connection.notifies.pop(0)
+                    try:
+                        event = PriceChangeEvent.from_json(notify.payload)
+                    except (ValueError, TypeError) as e:
+                        logger.warning("Ignoring malformed price change payload: %s", e)
+                        continue
+                    if event.origin != ORIGIN:
+                        self.bus.publish(event)
+        finally:
+            raw.close()
+
+    def start_listener(self, poll_interval: float = 1.0) -> threading.Thread:
+        thread = threading.Thread(target=self.listen, args=(poll_interval,), name="pg-listen", daemon=True)
+        thread.start()
+        return thread
+
+
+def make_event(product, old_value: Optional[float], new_value: float, timestamp: Optional[str] = None) -> PriceChangeEvent:
+    """Build an event from a db_d.Product row"""
+    return PriceChangeEvent(
+        product_id=str(product.product_id),
+        url=product.url,
+        retailer=product.retailer,
+        old_value=old_value,
+        new_value=new_value,
+        timestamp=timestamp or time.strftime('%Y-%m-%d %H:%M:%S')
+    )
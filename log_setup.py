@@ -0,0 +1,137 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+from datetime import datetime, timezone
+from typing import List, Optional
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")                            # text | json
+LOG_FILE = os.getenv("LOG_FILE")                                        # Also log to this file
+LOG_DEBUG_SAMPLE_RATE = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", 1.0))  # Share of DEBUG records kept
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 10000))                # Records buffered before dropping
+
+TEXT_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_listener_pid: Optional[int] = None
+_lock = threading.Lock()
+
+
+class DebugSampler(logging.Filter):
+    """Keep a `rate` share of DEBUG records; every other level always passes"""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno > logging.DEBUG or self.rate >= 1.0 or random.random() < self.rate
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, for log shippers"""
+
+    def __init__(self, tag: Optional[str] = None):
+        super().__init__()
+        self.tag = tag
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'thread': record.threadName
+        }
+        if self.tag:
+            entry['tag'] = self.tag
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that never blocks the caller: when the queue is full the record is counted and dropped"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def configure_logging(
+    level: Optional[str] = None,
+    json_format: Optional[bool] = None,
+    log_file: Optional[str] = None,
+    debug_sample_rate: Optional[float] = None,
+    tag: Optional[str] = None
+) -> logging.handlers.QueueListener:
+    """Route all logging through one queue; console/file I/O happens on the listener thread
+
+    Call once from each entry point (library modules only create loggers).
+    Logging calls then cost a level check, the sampler and a non-blocking
+    put, so a slow disk or terminal can't stall scrapers or the event loop.
+    Settings default to LOG_LEVEL, LOG_FORMAT, LOG_FILE and
+    LOG_DEBUG_SAMPLE_RATE; `tag` (e.g. "shard 3") marks every line.
+    """
+    global _listener, _listener_pid
+    with _lock:
+        _stop_listener()
+
+        json_format = LOG_FORMAT == 'json' if json_format is None else json_format
+        log_file = LOG_FILE if log_file is None else log_file
+        if json_format:
+            formatter = JsonFormatter(tag)
+        else:
+            formatter = logging.Formatter(TEXT_FORMAT.replace('%(levelname)s', f'{tag} - %(levelname)s') if tag else TEXT_FORMAT)
+
+        handlers: List[logging.Handler] = [logging.StreamHandler(sys.stderr)]
+        if log_file:
+            handlers.append(logging.FileHandler(log_file, encoding='utf-8'))
+        for handler in handlers:
+            handler.setFormatter(formatter)
+
+        log_queue: queue.Queue = queue.Queue(LOG_QUEUE_SIZE)
+        queue_handler = DroppingQueueHandler(log_queue)
+        queue_handler.addFilter(DebugSampler(LOG_DEBUG_SAMPLE_RATE if debug_sample_rate is None else debug_sample_rate))
+
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(queue_handler)
+        root.setLevel((level or LOG_LEVEL).upper())
+
+        _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        _listener_pid = os.getpid()
+        return _listener
+
+
+def _stop_listener() -> None:
+    global _listener
+    if _listener is not None and _listener_pid == os.getpid():
+        # A forked child inherits the parent's listener object but not its thread
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+    _listener = None
+
+
+def shutdown_logging() -> None:
+    """Flush what is queued and stop the listener thread"""
+    with _lock:
+        _stop_listener()
+
+
+atexit.register(shutdown_logging)
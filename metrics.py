@@ -0,0 +1,326 @@
+import json
+import math
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+METRICS_PORT = int(os.getenv("METRICS_PORT", 0))             # 0 = no /metrics endpoint
+METRICS_SNAPSHOT_PATH = os.getenv("METRICS_SNAPSHOT_PATH")   # JSON dump written at the end of each run
+
+# Seconds; spans a fast selector hit (ms) up to a page load hitting its timeout
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+
+class _Child:
+    """One label combination; updates take a per-child lock, nothing global"""
+
+    __slots__ = ('_lock', 'value')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class _HistogramChild:
+    __slots__ = ('_lock', 'buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets: Sequence[float]):
+        self._lock = threading.Lock()
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    @contextmanager
+    def time(self):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+
+class _Metric:
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+
+    def _new_child(self):
+        return _Child()
+
+    def labels(self, *values: Any):
+        """Child for these label values (positional, in labelnames order); cache it in hot loops"""
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {key}")
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def samples(self) -> Iterable[Tuple[str, Dict[str, str], float]]:
+        for key, child in list(self._children.items()):
+            yield self.name, dict(zip(self.labelnames, key)), child.value
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        return [{'labels': labels, 'value': value} for _, labels, value in self.samples()]
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._collector: Optional[Callable[[], Dict[Tuple[str, ...], float]]] = None
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+    def set_function(self, collector: Callable[[], Dict[Tuple[str, ...], float]]) -> None:
+        """Read values at scrape time instead of pushing them, e.g. from the rate limiters"""
+        self._collector = collector
+
+    def samples(self):
+        if self._collector is not None:
+            for key, value in self._collector().items():
+                self.labels(*key).set(value)
+        return super().samples()
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def time(self):
+        return self.labels().time()
+
+    def samples(self):
+        for key, child in list(self._children.items()):
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), child.counts):
+                cumulative += count
+                yield f"{self.name}_bucket", {**labels, 'le': _format_value(bound)}, cumulative
+            yield f"{self.name}_sum", labels, child.sum
+            yield f"{self.name}_count", labels, child.count
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        return [
+            {'labels': dict(zip(self.labelnames, key)), 'count': child.count, 'sum': round(child.sum, 6),
+             'buckets': dict(zip((_format_value(b) for b in self.buckets + (math.inf,)), child.counts))}
+            for key, child in list(self._children.items())
+        ]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render_prometheus(self) -> str:
+        """Prometheus text exposition format 0.0.4"""
+        lines: List[str] = []
+        for metric in list(self._metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            'timestamp': time.time(),
+            'metrics': {
+                metric.name: {'type': metric.kind, 'samples': metric.snapshot()}
+                for metric in list(self._metrics.values())
+            }
+        }
+
+    def dump_json(self, path: str) -> None:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f, indent=2)
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + '}'
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+# Process-wide registry and the metrics the scraper, DB layer and sinks record into
+registry = Registry()
+
+DRIVER_STARTUP_SECONDS = registry.histogram(
+    'price_driver_startup_seconds', "Time to start a Chrome WebDriver")
+PAGE_LOAD_SECONDS = registry.histogram(
+    'price_page_load_seconds', "driver.get latency", ('retailer', 'outcome'))
+SELECTOR_WAIT_SECONDS = registry.histogram(
+    'price_selector_wait_seconds', "Time spent waiting for a page element", ('retailer', 'field', 'outcome'))
+PARSE_FAILURES = registry.counter(
+    'price_parse_failures_total', "Price text that could not be parsed", ('retailer',))
+SCRAPES = registry.counter(
+    'price_scrapes_total', "Finished scrapes by outcome", ('retailer', 'outcome'))
+DB_COMMIT_SECONDS = registry.histogram(
+    'price_db_commit_seconds', "Database commit latency", ('operation',))
+WEBHOOK_SECONDS = registry.histogram(
+    'price_webhook_seconds', "Notification delivery latency", ('sink', 'outcome'))
+WEBHOOK_RATE_LIMITED = registry.counter(
+    'price_webhook_rate_limited_total', "HTTP 429 responses from notification sinks", ('sink',))
+RATE_LIMIT_RPS = registry.gauge(
+    'price_rate_limit_requests_per_second', "Current adaptive request rate", ('retailer',))
+RATE_LIMIT_CONCURRENCY = registry.gauge(
+    'price_rate_limit_concurrency', "Current adaptive concurrency limit", ('retailer',))
+CIRCUIT_OPEN = registry.gauge(
+    'price_circuit_open', "1 while a retailer's circuit breaker is open or half-open", ('retailer',))
+PIPELINE_QUEUE_DEPTH = registry.gauge(
+    'price_pipeline_queue_depth', "Items waiting at each pipeline stage", ('stage',))
+API_REQUEST_SECONDS = registry.histogram(
+    'price_api_request_seconds', "Read API request latency", ('endpoint', 'status'))
+API_CACHE = registry.counter(
+    'price_api_cache_total', "Read API cache lookups", ('result',))
+
+
+def _rate_limit_rates():
+    from rate_limit import limiters
+    return {(name,): state['rate'] for name, state in limiters.snapshot().items()}
+
+
+def _rate_limit_concurrency():
+    from rate_limit import limiters
+    return {(name,): state['concurrency'] for name, state in limiters.snapshot().items()}
+
+
+def _circuit_states():
+    from circuit_breaker import breakers, CLOSED
+    return {(name,): float(state['state'] != CLOSED) for name, state in breakers.snapshot().items()}
+
+
+def _pipeline_queue_depths():
+    from pipeline import queue_depths
+    return {(stage,): depth for stage, depth in queue_depths().items()}
+
+
+RATE_LIMIT_RPS.set_function(_rate_limit_rates)
+RATE_LIMIT_CONCURRENCY.set_function(_rate_limit_concurrency)
+CIRCUIT_OPEN.set_function(_circuit_states)
+PIPELINE_QUEUE_DEPTH.set_function(_pipeline_queue_depths)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = registry
+
+    def do_GET(self):
+        path = self.path.split('?', 1)[0]
+        if path == '/metrics':
+            body = self.registry.render_prometheus().encode('utf-8')
+            content_type = 'text/plain; version=0.0.4; charset=utf-8'
+        elif path == '/metrics.json':
+            body = json.dumps(self.registry.snapshot()).encode('utf-8')
+            content_type = 'application/json'
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug("metrics %s " + format, self.address_string(), *args)
+
+
+def start_http_server(port: int, addr: str = '127.0.0.1') -> ThreadingHTTPServer:
+    """Serve /metrics (Prometheus text) and /metrics.json from a daemon thread"""
+    server = ThreadingHTTPServer((addr, port), _MetricsHandler)
+    thread = threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True)
+    thread.start()
+    logger.info("Serving metrics on http://%s:%s/metrics", addr, server.server_address[1])
+    return server
+
+
+def start_from_env() -> Optional[ThreadingHTTPServer]:
+    return start_http_server(METRICS_PORT) if METRICS_PORT else None
+
+
+def dump_from_env() -> None:
+    if METRICS_SNAPSHOT_PATH:
+        registry.dump_json(METRICS_SNAPSHOT_PATH)
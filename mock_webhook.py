@@ -0,0 +1,139 @@
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import random
+from collections import Counter
+from typing import Optional
+
+from aiohttp import web
+
+from log_setup import configure_logging
+
+logger = logging.getLogger(__name__)
+
+# Windows-specific setup
+if platform.system() == 'Windows':
+    asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+
+
+class MockWebhookServer:
+    """Local stand-in for a Discord webhook
+
+    Every POST sleeps for `latency` (+ up to `jitter`) seconds and then answers
+    429 with `retry_after`, a 5xx error, or 204, according to the given ratios.
+    """
+
+    def __init__(
+        self,
+        host: str = '127.0.0.1',
+        port: int = 0,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        rate_limit_ratio: float = 0.0,
+        error_ratio: float = 0.0,
+        retry_after: float = 0.5,
+        seed: Optional[int] = None
+    ):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit_ratio = rate_limit_ratio
+        self.error_ratio = error_ratio
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.received = 0
+        self.responses: Counter = Counter()
+        self.runner = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}/api/webhooks/mock/token"
+
+    async def handle(self, request: web.Request) -> web.Response:
+        await request.read()
+        self.received += 1
+
+        delay = self.latency + (self.random.uniform(0, self.jitter) if self.jitter else 0.0)
+        if delay:
+            await asyncio.sleep(delay)
+
+        roll = self.random.random()
+        if roll < self.rate_limit_ratio:
+            status = 429
+            body = {"message": "You are being rate limited.", "retry_after": self.retry_after, "global": False}
+            response = web.json_response(body, status=status, headers={"Retry-After": str(self.retry_after)})
+        elif roll < self.rate_limit_ratio + self.error_ratio:
+            status = self.random.choice([500, 502, 503])
+            response = web.Response(status=status, text=json.dumps({"message": "Mock upstream error"}))
+        else:
+            status = 204
+            response = web.Response(status=status)
+
+        self.responses[status] += 1
+        return response
+
+    async def start(self) -> str:
+        app = web.Application()
+        app.router.add_post('/api/webhooks/{webhook_id}/{token}', self.handle)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, self.host, self.port)
+        await site.start()
+        # Resolve the real port when an ephemeral one (0) was requested
+        self.port = self.runner.addresses[0][1]
+        logger.info("Mock webhook listening on %s", self.url)
+        return self.url
+
+    async def stop(self):
+        if self.runner:
+            await self.runner.cleanup()
+            self.runner = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.stop()
+
+
+async def serve_forever(server: MockWebhookServer):
+    async with server:
+        while True:
+            await asyncio.sleep(3600)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local mock Discord webhook")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--latency', type=float, default=0.0, help="Base response latency in seconds")
+    parser.add_argument('--jitter', type=float, default=0.0, help="Extra random latency in seconds")
+    parser.add_argument('--rate-limit', type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument('--errors', type=float, default=0.0, help="Fraction of requests answered with 5xx")
+    parser.add_argument('--retry-after', type=float, default=0.5)
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    server = MockWebhookServer(
+        host=args.host,
+        port=args.port,
+        latency=args.latency,
+        jitter=args.jitter,
+        rate_limit_ratio=args.rate_limit,
+        error_ratio=args.errors,
+        retry_after=args.retry_after,
+        seed=args.seed
+    )
+    try:
+        asyncio.run(serve_forever(server))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    configure_logging()
+    main()
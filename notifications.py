@@ -6,11 +6,8 @@ import logging
 from typing import Optional, Dict, Any
 from urllib.parse import urlparse
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
+from log_setup import configure_logging
+
 logger = logging.getLogger(__name__)
 
 load_dotenv()
@@ -64,7 +61,8 @@ class PriceAlert:
         drop_percentage = self._calculate_drop(old_price, new_price)
         
         if drop_percentage < self.min_drop_percentage:
-            logger.info(f"Price drop {drop_percentage:.1f}% below threshold {self.min_drop_percentage}% - not sending alert")
+            logger.info("Price drop %.1f%% below threshold %s%% - not sending alert",
+                        drop_percentage, self.min_drop_percentage)
             return False
         
         clean_url = self._clean_url(url)
@@ -97,16 +95,16 @@ class PriceAlert:
             async with aiohttp.ClientSession() as session:
                 async with session.post(self.webhook_url, json=message) as response:
                     if response.status == 204:
-                        logger.info(f"Successfully sent Discord alert for {product_name}")
+                        logger.info("Successfully sent Discord alert for %s", product_name)
                         return True
                     else:
                         error_text = await response.text()
                         logger.error(
-                            f"Failed to send Discord alert. Status: {response.status}, Error: {error_text}"
+                            "Failed to send Discord alert. Status: %s, Error: %s", response.status, error_text
                         )
                         return False
         except Exception as e:
-            logger.error(f"Error sending Discord notification: {str(e)}")
+            logger.error("Error sending Discord notification: %s", e)
             return False
     
     def _get_retailer_icon(self, retailer: str) -> str:
@@ -160,4 +158,5 @@ async def example_usage():
         )
 
 if __name__ == "__main__":
+    configure_logging()
     asyncio.run(example_usage())
\ No newline at end of file
@@ -7,11 +7,6 @@ import platform
 from typing import Optional, Dict
 from urllib.parse import urlparse
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
 # Windows-specific setup
@@ -64,7 +59,7 @@ class DiscordNotifier:
         try:
             drop_pct = ((old_price - new_price) / old_price) * 100
             if drop_pct < self.min_drop:
-                logger.info(f"Price drop {drop_pct:.1f}% below threshold {self.min_drop}%")
+                logger.info("Price drop %.1f%% below threshold %s%%", drop_pct, self.min_drop)
                 return False
 
             # Build the Discord message embed
@@ -94,15 +89,15 @@ class DiscordNotifier:
             # Send the notification
             async with self.session.post(self.webhook_url, json=message) as response:
                 if response.status == 204:
-                    logger.info(f"Successfully sent alert for {product_name}")
+                    logger.info("Successfully sent alert for %s", product_name)
                     return True
                 
                 error_text = await response.text()
-                logger.error(f"Discord API error: {response.status} - {error_text}")
+                logger.error("Discord API error: %s - %s", response.status, error_text)
                 return False
 
         except Exception as e:
-            logger.error(f"Failed to send notification: {str(e)}")
+            logger.error("Failed to send notification: %s", e)
             return False
         finally:
             # Don't close session here to allow reuse
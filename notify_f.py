@@ -6,11 +6,6 @@ import logging
 import platform
 from typing import Optional
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
 # Windows-specific setup
@@ -53,7 +48,7 @@ class DiscordNotifier:
 
         drop_pct = ((old_price - new_price) / old_price) * 100
         if drop_pct < self.min_drop:
-            logger.info(f"Price drop {drop_pct:.1f}% below threshold {self.min_drop}%")
+            logger.info("Price drop %.1f%% below threshold %s%%", drop_pct, self.min_drop)
             return False
 
         message = {
@@ -74,10 +69,10 @@ class DiscordNotifier:
         try:
             async with self.session.post(self.webhook_url, json=message) as response:
                 if response.status == 204:
-                    logger.info(f"Alert sent for {product_name}")
+                    logger.info("Alert sent for %s", product_name)
                     return True
-                logger.error(f"Discord response: {response.status}")
+                logger.error("Discord response: %s", response.status)
                 return False
         except Exception as e:
-            logger.error(f"Notification error: {str(e)}")
+            logger.error("Notification error: %s", e)
             return False
\ No newline at end of file
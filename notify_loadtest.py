@@ -0,0 +1,148 @@
+import argparse
+import asyncio
+import json
+import logging
+import math
+import platform
+import time
+from typing import Any, Dict, List
+
+from mock_webhook import MockWebhookServer
+from notifications import PriceAlert
+from notify_c import DiscordNotifier
+from sinks import DiscordWebhookSink, NotificationFanout
+
+logger = logging.getLogger(__name__)
+
+# Windows-specific setup
+if platform.system() == 'Windows':
+    asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+
+TARGETS = ('price_alert', 'discord_notifier', 'fanout')
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an unsorted list"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def _make_sender(target: str, webhook_url: str):
+    """Return (notifier, send coroutine factory) for the notifier under test"""
+    if target == 'price_alert':
+        notifier = PriceAlert()
+        notifier.webhook_url = webhook_url
+        notifier.min_drop_percentage = 0.0
+        return notifier, notifier.send_discord_alert
+    if target == 'discord_notifier':
+        notifier = DiscordNotifier()
+        notifier.webhook_url = webhook_url
+        notifier.min_drop = 0.0
+        return notifier, notifier.send_alert
+    if target == 'fanout':
+        notifier = NotificationFanout([DiscordWebhookSink(webhook_url, max_concurrency=64)], min_drop=0.0)
+        return notifier, notifier.deliver_alert  # send_alert only queues
+    raise ValueError(f"Unknown target: {target}")
+
+
+async def run_load(target: str, webhook_url: str, alerts: int, concurrency: int = 50) -> Dict[str, Any]:
+    """Push `alerts` notifications through `target` and report throughput, latency and loss"""
+    notifier, send = _make_sender(target, webhook_url)
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    delivered = 0
+
+    async def one(i: int):
+        nonlocal delivered
+        async with semaphore:
+            start = time.perf_counter()
+            ok = await send(
+                product_name=f"Load test product {i}",
+                old_price=1000.0,
+                new_price=800.0,
+                url=f"https://www.amazon.in/dp/LOADTEST{i:06d}",
+                retailer="amazon"
+            )
+            latencies.append(time.perf_counter() - start)
+            if ok:
+                delivered += 1
+
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(one(i) for i in range(alerts)))
+    finally:
+        if hasattr(notifier, 'close'):
+            await notifier.close()
+        elif notifier.session:
+            await notifier.session.close()
+    elapsed = time.perf_counter() - started
+
+    return {
+        'target': target,
+        'alerts': alerts,
+        'concurrency': concurrency,
+        'delivered': delivered,
+        'lost': alerts - delivered,
+        'loss_rate': (alerts - delivered) / alerts if alerts else 0.0,
+        'elapsed_s': elapsed,
+        'throughput_per_s': alerts / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000
+    }
+
+
+async def run_benchmark(args) -> List[Dict[str, Any]]:
+    server = MockWebhookServer(
+        latency=args.latency,
+        jitter=args.jitter,
+        rate_limit_ratio=args.rate_limit,
+        error_ratio=args.errors,
+        seed=args.seed
+    )
+    reports = []
+    async with server:
+        for target in args.targets:
+            report = await run_load(target, server.url, args.alerts, args.concurrency)
+            report['server_responses'] = dict(server.responses)
+            server.responses.clear()
+            reports.append(report)
+    return reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline load test of the notification path")
+    parser.add_argument('--alerts', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--targets', nargs='+', choices=TARGETS, default=list(TARGETS))
+    parser.add_argument('--latency', type=float, default=0.01)
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--rate-limit', type=float, default=0.0)
+    parser.add_argument('--errors', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', action='store_true', help="Print the reports as JSON")
+    args = parser.parse_args()
+
+    # Per-alert success logging would dominate the measurement
+    logging.getLogger().setLevel(logging.WARNING)
+    for name in ('notifications', 'notify_c', 'sinks', 'mock_webhook'):
+        logging.getLogger(name).setLevel(logging.CRITICAL)
+
+    reports = asyncio.run(run_benchmark(args))
+
+    if args.json:
+        print(json.dumps(reports, indent=2))
+        return
+
+    for r in reports:
+        print(
+            f"{r['target']:<17} {r['alerts']} alerts in {r['elapsed_s']:.2f}s | "
+            f"{r['throughput_per_s']:.0f}/s | p50 {r['p50_ms']:.1f}ms | p99 {r['p99_ms']:.1f}ms | "
+            f"loss {r['loss_rate']:.2%} | responses {r['server_responses']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
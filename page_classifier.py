@@ -0,0 +1,170 @@
+from typing import NamedTuple, Optional
+from urllib.parse import urlparse
+import logging
+
+logger = logging.getLogger(__name__)
+
+OK = 'ok'
+BLOCKED = 'blocked'
+NOT_FOUND = 'not_found'
+OUT_OF_STOCK = 'out_of_stock'
+
+MIN_PAGE_BYTES = 1500   # Real product pages are far larger; bot walls and error stubs are not
+TEXT_SAMPLE_CHARS = 5000
+
+# Lower-case markers, checked against the URL, title and the start of the visible text
+# (no bare 'blocked' here: it matches product slugs such as /unblocked-phone-case)
+BLOCKED_URL_MARKERS = ('captcha', '/errors/validate', '/sorry/')
+BLOCKED_TEXT_MARKERS = (
+    'robot check',
+    'enter the characters you see below',
+    'type the characters you see in this image',
+    'are you a human',
+    'are you human',
+    'verify you are human',
+    'unusual traffic',
+    'access denied',
+    'request blocked',
+    '503 service unavailable',
+    'service unavailable',
+    'too many requests',
+)
+NOT_FOUND_TEXT_MARKERS = (
+    'page not found',
+    '404 not found',
+    'not a functioning page',
+    'looking for something?',
+    'the page you are looking for has been moved or deleted',
+    "we couldn't find",
+    'this product is no longer available',
+)
+# Only trusted inside the availability / buy-box element: elsewhere they turn up in nav
+# bars, "similar products" carousels and colour swatches of perfectly buyable pages
+OUT_OF_STOCK_TEXT_MARKERS = (
+    'currently unavailable',
+    'out of stock',
+    'sold out',
+    'coming soon',
+)
+AVAILABILITY_SELECTORS = ', '.join((
+    '#availability',             # Amazon
+    '#outOfStock',               # Amazon
+    '#buybox',                   # Amazon
+    '[class*="availability"]',
+    '[class*="out-of-stock"]',   # Croma
+    '[class*="outOfStock"]',
+    '[class*="sold-out"]',
+))
+
+# One round trip instead of five: title, final URL, a slice of the visible text, the
+# availability / buy-box text and the page size
+SNAPSHOT_SCRIPT = """
+var availability = Array.prototype.map.call(
+    document.querySelectorAll(arguments[1]), function (el) { return el.innerText || ''; }
+).join(' ');
+return {
+    title: document.title || '',
+    url: window.location.href,
+    text: document.body ? document.body.innerText.slice(0, arguments[0]) : '',
+    availability: availability.slice(0, arguments[0]),
+    size: document.documentElement ? document.documentElement.outerHTML.length : 0
+};
+"""
+
+
+class PageSnapshot(NamedTuple):
+    requested_url: str
+    final_url: str
+    title: str
+    text: str
+    size: int
+    availability: str = ''  # Text of the availability / buy-box elements only
+
+
+class PageVerdict(NamedTuple):
+    outcome: str
+    reason: str = ''
+
+    @property
+    def ok(self) -> bool:
+        return self.outcome == OK
+
+
+def _find(markers, *haystacks) -> Optional[str]:
+    for haystack in haystacks:
+        for marker in markers:
+            if marker in haystack:
+                return marker
+    return None
+
+
+def _redirected_home(requested_url: str, final_url: str) -> bool:
+    """Retailers bounce removed products to the home page instead of returning a 404"""
+    requested, final = urlparse(requested_url), urlparse(final_url)
+    return bool(final.netloc) and requested.path.strip('/') != '' and final.path.strip('/') == ''
+
+
+def classify_snapshot(snapshot: PageSnapshot) -> PageVerdict:
+    """Classify a loaded page; blocked beats not-found beats out-of-stock"""
+    title = snapshot.title.lower()
+    text = snapshot.text.lower()
+    final_url = snapshot.final_url.lower()
+
+    marker = _find(BLOCKED_URL_MARKERS, final_url) or _find(BLOCKED_TEXT_MARKERS, title, text)
+    if marker:
+        return PageVerdict(BLOCKED, marker)
+
+    marker = _find(NOT_FOUND_TEXT_MARKERS, title, text)
+    if marker:
+        return PageVerdict(NOT_FOUND, marker)
+    if _redirected_home(snapshot.requested_url, snapshot.final_url):
+        return PageVerdict(NOT_FOUND, f"redirected to {snapshot.final_url}")
+
+    if snapshot.size < MIN_PAGE_BYTES:
+        # Interstitials that carry no recognisable text still give themselves away by size
+        return PageVerdict(BLOCKED, f"page is only {snapshot.size} bytes")
+
+    marker = _find(OUT_OF_STOCK_TEXT_MARKERS, snapshot.availability.lower())
+    if marker:
+        return PageVerdict(OUT_OF_STOCK, marker)
+    return PageVerdict(OK)
+
+
+def sold_out_verdict(snapshot: PageSnapshot) -> Optional[PageVerdict]:
+    """Out-of-stock verdict from anywhere on the page; only for pages where no price was found"""
+    marker = _find(OUT_OF_STOCK_TEXT_MARKERS, snapshot.availability.lower(), snapshot.text.lower())
+    return PageVerdict(OUT_OF_STOCK, marker) if marker else None
+
+
+def take_snapshot(driver, requested_url: str) -> PageSnapshot:
+    page = driver.execute_script(SNAPSHOT_SCRIPT, TEXT_SAMPLE_CHARS, AVAILABILITY_SELECTORS)
+    if not isinstance(page, dict):
+        raise ValueError(f"unexpected snapshot result {page!r}")
+    return PageSnapshot(
+        requested_url=requested_url,
+        final_url=page.get('url') or driver.current_url or '',
+        title=page.get('title') or '',
+        text=page.get('text') or '',
+        size=int(page.get('size') or 0),
+        availability=page.get('availability') or ''
+    )
+
+
+def classify_page(driver, requested_url: str) -> PageVerdict:
+    """Classify the page currently loaded in `driver`; never raises"""
+    try:
+        return classify_snapshot(take_snapshot(driver, requested_url))
+    except Exception as e:
+        # A classifier failure must not stop the scrape; let the selectors decide
+        logger.debug("Page classification failed for %s: %s", requested_url, e)
+        return PageVerdict(OK, 'unclassified')
+
+
+
+def explain_missing_price(driver, requested_url: str) -> Optional[PageVerdict]:
+    """After the price selectors came up empty: OUT_OF_STOCK if the page says so, else None; never raises"""
+    try:
+        return sold_out_verdict(take_snapshot(driver, requested_url))
+    except Exception as e:
+        logger.debug("Sold-out check failed for %s: %s", requested_url, e)
+        return None
@@ -0,0 +1,281 @@
+import asyncio
+import logging
+import queue
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from db_d import get_db, update_product_prices_bulk
+from deadline import Deadline
+from events import bus, PriceChangeEvent
+from tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()  # End-of-stream marker passed between stages
+STAGES = ('scrape', 'persist', 'notify')
+
+_running: "weakref.WeakSet[PricePipeline]" = weakref.WeakSet()
+
+
+def queue_depths() -> Dict[str, int]:
+    """Items waiting at each stage, summed over the pipelines currently running"""
+    depths = dict.fromkeys(STAGES, 0)
+    for pipeline in list(_running):
+        for stage, depth in pipeline.queue_depths().items():
+            depths[stage] += depth
+    return depths
+
+
+class DriverPool:
+    """Fixed set of WebDriver instances shared by the scrape threads"""
+
+    def __init__(self, size: int, factory: Callable[[], Any], seed: Optional[List[Any]] = None):
+        self.size = size
+        self.factory = factory
+        self._drivers: List[Any] = list(seed or [])[:size]
+        self._idle: "queue.Queue[Any]" = queue.Queue()
+        for driver in self._drivers:
+            self._idle.put(driver)
+
+    def start(self) -> None:
+        """Create the missing drivers up front so startup cost isn't paid mid-cycle"""
+        while len(self._drivers) < self.size:
+            driver = self.factory()
+            self._drivers.append(driver)
+            self._idle.put(driver)
+
+    @contextmanager
+    def acquire(self):
+        driver = self._idle.get()
+        try:
+            yield driver
+        finally:
+            self._idle.put(driver)
+
+    def refresh(self, is_alive: Callable[[Any], bool]) -> int:
+        """Replace drivers that fail `is_alive`; call between cycles only. Returns how many were replaced"""
+        replaced = 0
+        for i, driver in enumerate(self._drivers):
+            if is_alive(driver):
+                continue
+            try:
+                driver.quit()
+            except Exception:
+                pass
+            self._drivers[i] = self.factory()
+            replaced += 1
+        if replaced:
+            self._idle = queue.Queue()
+            for driver in self._drivers:
+                self._idle.put(driver)
+        return replaced
+
+    def close(self, keep: Optional[List[Any]] = None) -> None:
+        keep_ids = {id(driver) for driver in keep or []}
+        for driver in self._drivers:
+            if id(driver) not in keep_ids:
+                try:
+                    driver.quit()
+                except Exception as e:
+                    logger.warning("Error closing driver: %s", e)
+        self._drivers = [driver for driver in self._drivers if id(driver) in keep_ids]
+
+
+class PricePipeline:
+    """scrape -> persist -> notify, connected by bounded asyncio queues
+
+    Scraping runs in a thread pool sized to the driver pool, persistence
+    commits in batches from a worker thread, and alerts are sent by several
+    concurrent notifier tasks. A full queue blocks the stage before it, so the
+    cycle runs at the pace of the slowest stage instead of the sum of all of
+    them.
+    """
+
+    def __init__(
+        self,
+        monitor,
+        driver_pool: DriverPool,
+        queue_size: int = 100,
+        batch_size: int = 20,
+        batch_timeout: float = 2.0,
+        notify_workers: int = 5,
+        deadline: Optional[Deadline] = None,
+        product_budget: Optional[float] = None,
+        on_result: Optional[Callable[[str, bool], None]] = None
+    ):
+        self.monitor = monitor
+        self.on_result = on_result or (lambda url, ok: None)
+        self.deadline = deadline or Deadline()
+        self.product_budget = product_budget
+        self.driver_pool = driver_pool
+        self.batch_size = batch_size
+        self.batch_timeout = batch_timeout
+        self.notify_workers = notify_workers
+        self.scrape_q: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.persist_q: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.notify_q: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.scrape_executor = ThreadPoolExecutor(max_workers=driver_pool.size, thread_name_prefix="scrape")
+        self.persist_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="persist")
+        self.stats = {'queued': 0, 'scraped': 0, 'scrape_failed': 0, 'not_found': 0,
+                      'out_of_stock': 0, 'timed_out': 0, 'skipped': 0, 'circuit_open': 0,
+                      'persisted': 0, 'persist_failed': 0, 'changes': 0, 'batches': 0}
+
+    def queue_depths(self) -> Dict[str, int]:
+        return {
+            'scrape': self.scrape_q.qsize(),
+            'persist': self.persist_q.qsize(),
+            'notify': self.notify_q.qsize()
+        }
+
+    def _scrape(self, url: str) -> Dict[str, Any]:
+        from check_prices import scrape_url, PRODUCT_DEADLINE_SECONDS
+
+        # Stages run in separate executors, so each product's trace covers its scrape stage
+        with tracer.trace('pipeline_scrape', url=url) as span:
+            waiting_since = time.perf_counter()
+            with self.driver_pool.acquire() as driver:
+                if span:
+                    span.set(driver_wait_seconds=round(time.perf_counter() - waiting_since, 3))
+                # The product budget starts once a driver is free, not while queued
+                budget = self.product_budget or PRODUCT_DEADLINE_SECONDS
+                return scrape_url(driver, url, self.deadline.child(budget))
+
+    def _persist(self, batch: List[Tuple[str, float]]) -> Optional[List[PriceChangeEvent]]:
+        db = next(get_db())
+        try:
+            return update_product_prices_bulk(db, batch, publish=False)
+        finally:
+            db.close()
+
+    async def _feed(self, urls: Iterable[str]) -> None:
+        for url in urls:
+            if self.monitor.stop_requested:
+                # Stop feeding; what is already queued or in flight drains through the later stages
+                logger.info("Stop requested; no more products fed to the pipeline")
+                break
+            await self.scrape_q.put(url)
+            self.stats['queued'] += 1
+        for _ in range(self.driver_pool.size):
+            await self.scrape_q.put(_DONE)
+
+    async def _scrape_worker(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            url = await self.scrape_q.get()
+            if url is _DONE:
+                return
+            if self.deadline.expired:
+                self.stats['skipped'] += 1
+                continue
+            try:
+                data = await loop.run_in_executor(self.scrape_executor, self._scrape, url)
+            except Exception as e:
+                logger.error("Error scraping %s: %s", url, e)
+                data = None
+            if data and data.get('skipped'):
+                self.stats['circuit_open'] += 1
+                self.monitor.skipped[url] = data.get('retry_in') or 0.0
+                self.on_result(url, False)
+                continue
+            if data and data.get('timed_out'):
+                self.stats['timed_out'] += 1
+                self.monitor.timed_out.append(url)
+                logger.warning("Timed out checking %s", url)
+                self.on_result(url, False)
+                continue
+            if data and data.get('outcome') in ('not_found', 'out_of_stock'):
+                self.stats[data['outcome']] += 1
+                logger.info("No price for %s: product is %s", url, data['outcome'])
+                self.on_result(url, False)
+                continue
+            if not data or not data.get('price'):
+                self.stats['scrape_failed'] += 1
+                logger.warning("Failed to scrape %s", url)
+                self.on_result(url, False)
+                continue
+            self.stats['scraped'] += 1
+            self.monitor.product_names[url] = data.get('name') or 'Unknown Product'
+            await self.persist_q.put((url, data['price']))
+
+    async def _persist_worker(self) -> None:
+        loop = asyncio.get_running_loop()
+        done = False
+        while not done:
+            batch: List[Tuple[str, float]] = []
+            deadline = loop.time() + self.batch_timeout
+            while len(batch) < self.batch_size:
+                try:
+                    item = await asyncio.wait_for(self.persist_q.get(), max(0.0, deadline - loop.time()))
+                except asyncio.TimeoutError:
+                    break
+                if item is _DONE:
+                    done = True
+                    break
+                batch.append(item)
+            if not batch:
+                continue
+
+            events = await loop.run_in_executor(self.persist_executor, self._persist, batch)
+            self.stats['batches'] += 1
+            for url, _ in batch:
+                self.on_result(url, events is not None)
+            if events is None:
+                self.stats['persist_failed'] += len(batch)
+                continue
+            self.stats['persisted'] += len(batch)
+            self.stats['changes'] += len(events)
+            for event in events:
+                # Other consumers (stats, scheduler, bridges) see the event on the bus as usual;
+                # alerting is routed through notify_q so it gets backpressure too
+                bus.publish(event)
+                await self.notify_q.put(event)
+
+        for _ in range(self.notify_workers):
+            await self.notify_q.put(_DONE)
+
+    async def _notify_worker(self) -> None:
+        while True:
+            event = await self.notify_q.get()
+            if event is _DONE:
+                return
+            try:
+                await self.monitor.on_price_change(event)
+            except Exception as e:
+                logger.error("Error notifying for %s: %s", event.url, e)
+
+    async def run(self, urls: Iterable[str]) -> Dict[str, Any]:
+        started = time.perf_counter()
+        # While the pipeline runs, alerting goes through notify_q instead of the bus subscription
+        was_subscribed = bus.unsubscribe(self.monitor.on_price_change)
+        loop = asyncio.get_running_loop()
+        tasks: List[asyncio.Task] = []
+        _running.add(self)
+        try:
+            await loop.run_in_executor(None, self.driver_pool.start)
+            scrapers = [asyncio.create_task(self._scrape_worker()) for _ in range(self.driver_pool.size)]
+            persister = asyncio.create_task(self._persist_worker())
+            notifiers = [asyncio.create_task(self._notify_worker()) for _ in range(self.notify_workers)]
+            tasks = scrapers + [persister] + notifiers
+
+            await self._feed(urls)
+            await asyncio.gather(*scrapers)
+            await self.persist_q.put(_DONE)
+            await persister
+            await asyncio.gather(*notifiers)
+            await bus.drain()
+        finally:
+            _running.discard(self)
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+            if was_subscribed:
+                bus.subscribe(self.monitor.on_price_change)
+            self.scrape_executor.shutdown(wait=False)
+            self.persist_executor.shutdown(wait=True)
+
+        self.stats['seconds'] = time.perf_counter() - started
+        logger.info("Pipeline finished: %s", self.stats)
+        return dict(self.stats)
@@ -0,0 +1,459 @@
+import argparse
+import asyncio
+import base64
+import bisect
+import hashlib
+import json
+import logging
+import os
+import platform
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+from aiohttp import web
+
+from events import versions
+from history_export import parse_bound
+from metrics import API_CACHE, API_REQUEST_SECONDS
+from scheduler import TIMESTAMP_FORMAT
+
+logger = logging.getLogger(__name__)
+
+# Windows-specific setup
+if platform.system() == 'Windows':
+    asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+
+API_DATABASE_URL = os.getenv("API_DATABASE_URL")              # A read replica; default: POSTGRES_URL
+API_CACHE_TTL = float(os.getenv("API_CACHE_TTL", 30))         # Seconds a cached product/response is served
+API_DROPS_TTL = float(os.getenv("API_DROPS_TTL", 60))         # Top drops scan the whole table: cache longer
+API_CACHE_SIZE = int(os.getenv("API_CACHE_SIZE", 10000))      # Entries per cache before LRU eviction
+API_DB_CONCURRENCY = int(os.getenv("API_DB_CONCURRENCY", 4))  # Queries in flight against the database
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+MAX_DROP_HOURS = 24 * 30
+MISSING = object()  # Cached "no such product", so unknown ids and URLs don't reach the database each time
+
+
+class TTLCache:
+    """LRU map whose entries expire after `ttl` seconds or when their version moves
+
+    Versions come from events.versions, so on a node that sees price change
+    events (locally or through PostgresNotifyBridge) entries are invalidated
+    as soon as the product changes; the TTL bounds staleness otherwise.
+    """
+
+    def __init__(self, ttl: float = API_CACHE_TTL, max_entries: int = API_CACHE_SIZE,
+                 clock: Callable[[], float] = time.monotonic):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries: 'OrderedDict[Hashable, Tuple[float, int, Any]]' = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, version: int = 0) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires, cached_version, value = entry
+        if expires <= self.clock() or cached_version != version:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def put(self, key: Hashable, value: Any, version: int = 0, ttl: Optional[float] = None) -> None:
+        self._entries[key] = (self.clock() + (self.ttl if ttl is None else ttl), version, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+def encode_cursor(position: int) -> str:
+    return base64.urlsafe_b64encode(str(position).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> int:
+    """History position from an opaque cursor (price_history is append-only, so positions are stable)"""
+    try:
+        position = int(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode())
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Bad cursor")
+    if position < 0:
+        raise ValueError("Bad cursor")
+    return position
+
+
+def top_drops(rows, since: str, limit: int, retailer: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Biggest percentage drops from the price at `since` (or the first price after it) to the latest price
+
+    `rows` yields (product_id, url, retailer, price_history); only products
+    whose latest change is at or after `since` can appear.
+    """
+    drops = []
+    for product_id, url, product_retailer, history in rows:
+        if not history or (retailer and product_retailer != retailer):
+            continue
+        latest = history[-1]
+        if (latest.get('timestamp') or '') < since:
+            continue
+        timestamps = [entry.get('timestamp') or '' for entry in history]
+        start = bisect.bisect_right(timestamps, since) - 1
+        reference = history[max(start, 0)]
+        old, new = reference.get('value'), latest.get('value')
+        if not old or new is None or new >= old:
+            continue
+        drops.append({
+            'product_id': str(product_id), 'url': url, 'retailer': product_retailer,
+            'old_price': old, 'new_price': new, 'drop': old - new, 'drop_pct': round((old - new) / old * 100, 2),
+            'since': reference.get('timestamp'), 'timestamp': latest.get('timestamp'),
+        })
+    drops.sort(key=lambda drop: drop['drop_pct'], reverse=True)
+    return drops[:limit]
+
+
+class PriceAPI:
+    """Read-only JSON API over the products table
+
+    Product rows are cached per product (TTLCache, keyed by version) and
+    serialized responses per URL, so hot products are served without
+    touching the database. Responses carry an ETag and honour If-None-Match.
+    Database reads run in worker threads, at most `db_concurrency` at once,
+    and concurrent misses for the same key share one query. Unknown products
+    are cached too, and the full-table /drops scan runs at most once per
+    `drops_ttl` for each query string.
+    """
+
+    def __init__(
+        self,
+        session_factory: Optional[Callable[[], Any]] = None,
+        host: str = '127.0.0.1',
+        port: int = 0,
+        ttl: float = API_CACHE_TTL,
+        drops_ttl: float = API_DROPS_TTL,
+        cache_size: int = API_CACHE_SIZE,
+        db_concurrency: int = API_DB_CONCURRENCY
+    ):
+        self.session_factory = session_factory
+        self.host = host
+        self.port = port
+        self.ttl = ttl
+        self.drops_ttl = drops_ttl
+        self.products = TTLCache(ttl, cache_size)
+        self.responses = TTLCache(ttl, cache_size)
+        self.db_concurrency = db_concurrency
+        self._db_slots: Optional[asyncio.Semaphore] = None
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.runner = None
+        self.bridge = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    @staticmethod
+    def default_session_factory():
+        """Sessions on API_DATABASE_URL (a read replica) if set, else on the scraper's database"""
+        from sqlalchemy import create_engine
+        from sqlalchemy.orm import sessionmaker
+
+        import db_d
+        engine = create_engine(API_DATABASE_URL) if API_DATABASE_URL else db_d.get_engine()
+        return sessionmaker(bind=engine)
+
+    async def _query(self, key: Hashable, load: Callable[[Any], Any]) -> Any:
+        """Run load(session) in a worker thread; callers waiting on the same key share the result"""
+        pending = self._inflight.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            async with self._db_slots:
+                result = await asyncio.to_thread(self._run, load)
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # Retrieved here so an unshared failure is not logged as unhandled
+            raise
+        finally:
+            del self._inflight[key]
+
+    def _run(self, load: Callable[[Any], Any]) -> Any:
+        session = self.session_factory()
+        try:
+            return load(session)
+        finally:
+            session.close()
+
+    async def get_product(self, product_id: str) -> Optional[Dict[str, Any]]:
+        product = self.products.get(product_id, versions.version(product_id))
+        if product is not None:
+            API_CACHE.labels('hit').inc()
+            return None if product is MISSING else product
+        API_CACHE.labels('miss').inc()
+        version = versions.version(product_id)  # Read before loading, so a change mid-query is not cached over
+
+        def load(session):
+            from db_d import Product
+
+            return session.query(Product.product_id, Product.url, Product.retailer, Product.latest_prices,
+                                 Product.price_history).filter(Product.product_id == uuid.UUID(product_id)).first()
+
+        row = await self._query(('product', product_id), load)
+        if row is None:
+            # Until the TTL ends or the product's first price event moves its version
+            self.products.put(product_id, MISSING, version)
+            return None
+        history = row.price_history or []
+        product = {
+            'product_id': product_id, 'url': row.url, 'retailer': row.retailer,
+            'latest_prices': row.latest_prices or {}, 'history': history,
+            'timestamps': [entry.get('timestamp') or '' for entry in history],
+        }
+        self.products.put(product_id, product, version)
+        return product
+
+    def _respond(self, request: web.Request, body: bytes, etag: str, max_age: float) -> web.Response:
+        headers = {'ETag': etag, 'Cache-Control': f"max-age={int(max_age)}"}
+        if_none_match = request.headers.get('If-None-Match', '')
+        if if_none_match.strip() == '*' or etag in (tag.strip().lstrip('W/') for tag in if_none_match.split(',')):
+            return web.Response(status=304, headers=headers)
+        return web.Response(body=body, content_type='application/json', headers=headers)
+
+    async def cached(
+        self,
+        request: web.Request,
+        version: int,
+        build: Callable[[], Awaitable[Optional[Any]]],
+        ttl: Optional[float] = None
+    ) -> web.Response:
+        """Serve request.path_qs from the response cache, building and caching the JSON on a miss"""
+        key = request.path_qs
+        entry = self.responses.get(key, version)
+        if entry is None:
+            payload = await build()
+            if payload is None:
+                return web.json_response({'error': 'not found'}, status=404)
+            body = json.dumps(payload, separators=(',', ':')).encode()
+            entry = (body, '"%s"' % hashlib.blake2b(body, digest_size=12).hexdigest())
+            self.responses.put(key, entry, version, ttl)
+        return self._respond(request, entry[0], entry[1], self.ttl if ttl is None else ttl)
+
+    @staticmethod
+    def _product_id(request: web.Request) -> str:
+        product_id = request.match_info['product_id']
+        try:
+            return str(uuid.UUID(product_id))
+        except ValueError:
+            raise web.HTTPNotFound(text=json.dumps({'error': 'not found'}), content_type='application/json')
+
+    @staticmethod
+    def _int_param(request: web.Request, name: str, default: int, low: int, high: int) -> int:
+        try:
+            value = int(request.query.get(name, default))
+        except ValueError:
+            value = low - 1
+        if not low <= value <= high:
+            raise web.HTTPBadRequest(text=json.dumps({'error': f"{name} must be an integer in [{low}, {high}]"}),
+                                     content_type='application/json')
+        return value
+
+    async def product_summary(self, product_id: str) -> Optional[Dict[str, Any]]:
+        product = await self.get_product(product_id)
+        if product is None:
+            return None
+        return {
+            'product_id': product_id, 'url': product['url'], 'retailer': product['retailer'],
+            'latest_prices': product['latest_prices'], 'history_length': len(product['history']),
+            'first_seen': product['timestamps'][0] if product['history'] else None,
+        }
+
+    async def handle_lookup(self, request: web.Request) -> web.Response:
+        """GET /products?url=...: the product tracked at a URL"""
+        url = request.query.get('url')
+        if not url:
+            return web.json_response({'error': 'url is required'}, status=400)
+
+        # A URL's product id never changes, so the mapping is only evicted by TTL or size
+        product_id = self.products.get(('url', url))
+        if product_id is None:
+            def load(session):
+                from db_d import Product
+
+                return session.query(Product.product_id).filter(Product.url == url).scalar()
+
+            product_id = await self._query(('lookup', url), load)
+            product_id = MISSING if product_id is None else str(product_id)
+            self.products.put(('url', url), product_id)
+        if product_id is MISSING:
+            return web.json_response({'error': 'not found'}, status=404)
+        return await self.cached(request, versions.version(product_id), lambda: self.product_summary(product_id))
+
+    async def handle_product(self, request: web.Request) -> web.Response:
+        """GET /products/{id}: URL, retailer, latest price and history size"""
+        product_id = self._product_id(request)
+        return await self.cached(request, versions.version(product_id), lambda: self.product_summary(product_id))
+
+    async def handle_latest(self, request: web.Request) -> web.Response:
+        """GET /products/{id}/latest: the latest price only"""
+        product_id = self._product_id(request)
+
+        async def build():
+            product = await self.get_product(product_id)
+            return None if product is None else dict(product['latest_prices'], product_id=product_id)
+        return await self.cached(request, versions.version(product_id), build)
+
+    async def handle_history(self, request: web.Request) -> web.Response:
+        """GET /products/{id}/history?since=&until=&limit=&cursor=: oldest first, cursor-paginated"""
+        product_id = self._product_id(request)
+        limit = self._int_param(request, 'limit', DEFAULT_PAGE_SIZE, 1, MAX_PAGE_SIZE)
+        try:
+            since, until = parse_bound(request.query.get('since')), parse_bound(request.query.get('until'))
+            cursor = decode_cursor(request.query['cursor']) if request.query.get('cursor') else 0
+        except ValueError as e:
+            return web.json_response({'error': str(e)}, status=400)
+
+        async def build():
+            product = await self.get_product(product_id)
+            if product is None:
+                return None
+            timestamps = product['timestamps']
+            # History is appended in time order, so the range is found by bisection
+            start = max(bisect.bisect_left(timestamps, since) if since else 0, cursor)
+            end = bisect.bisect_left(timestamps, until) if until else len(timestamps)
+            page_end = min(start + limit, end)
+            return {
+                'product_id': product_id,
+                'history': product['history'][start:page_end],
+                'next_cursor': encode_cursor(page_end) if page_end < end else None,
+            }
+        return await self.cached(request, versions.version(product_id), build)
+
+    async def handle_drops(self, request: web.Request) -> web.Response:
+        """GET /drops?hours=24&limit=20&retailer=: biggest drops over the last `hours` hours"""
+        hours = self._int_param(request, 'hours', 24, 1, MAX_DROP_HOURS)
+        limit = self._int_param(request, 'limit', 20, 1, MAX_PAGE_SIZE)
+        retailer = request.query.get('retailer') or None
+
+        async def build():
+            since = time.strftime(TIMESTAMP_FORMAT, time.localtime(time.time() - hours * 3600))
+
+            def load(session):
+                from db_d import Product
+
+                rows = session.query(Product.product_id, Product.url, Product.retailer, Product.price_history)
+                if retailer:
+                    rows = rows.filter(Product.retailer == retailer)
+                return top_drops(rows.execution_options(stream_results=True, yield_per=1000), since, limit)
+
+            return {'hours': hours, 'since': since,
+                    'drops': await self._query(('drops', hours, limit, retailer), load)}
+        # Spans every product, and during a scrape cycle some product changes almost every second:
+        # expire by TTL only, so the full scan runs at most once per drops_ttl per query
+        return await self.cached(request, 0, build, self.drops_ttl)
+
+    async def handle_health(self, request: web.Request) -> web.Response:
+        return web.json_response({'status': 'ok', 'cached_products': len(self.products)})
+
+    @web.middleware
+    async def timed(self, request: web.Request, handler) -> web.StreamResponse:
+        started = time.perf_counter()
+        status = 500
+        try:
+            response = await handler(request)
+            status = response.status
+            return response
+        except web.HTTPException as e:
+            status = e.status
+            raise
+        finally:
+            endpoint = request.match_info.route.name or 'unmatched'
+            API_REQUEST_SECONDS.labels(endpoint, str(status)).observe(time.perf_counter() - started)
+
+    def make_app(self) -> web.Application:
+        app = web.Application(middlewares=[self.timed])
+        app.router.add_get('/products', self.handle_lookup, name='lookup')
+        app.router.add_get('/products/{product_id}', self.handle_product, name='product')
+        app.router.add_get('/products/{product_id}/latest', self.handle_latest, name='latest')
+        app.router.add_get('/products/{product_id}/history', self.handle_history, name='history')
+        app.router.add_get('/drops', self.handle_drops, name='drops')
+        app.router.add_get('/health', self.handle_health, name='health')
+        return app
+
+    def _start_bridge(self) -> None:
+        """Invalidate cached products as soon as any process records a change (Postgres only)
+
+        LISTEN goes to the primary: NOTIFY is not replicated to read replicas.
+        """
+        import db_d
+        from events import PostgresNotifyBridge
+
+        engine = db_d.get_engine()
+        if engine.dialect.name != 'postgresql':
+            logger.info("No change notifications on %s; cached responses live up to %ss",
+                        engine.dialect.name, self.ttl)
+            return
+        self.bridge = PostgresNotifyBridge(engine)
+        self.bridge.start_listener()
+
+    async def start(self) -> str:
+        self._db_slots = asyncio.Semaphore(self.db_concurrency)
+        if self.session_factory is None:
+            self.session_factory = self.default_session_factory()
+            self._start_bridge()
+        self.runner = web.AppRunner(self.make_app(), access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, self.host, self.port)
+        await site.start()
+        # Resolve the real port when an ephemeral one (0) was requested
+        self.port = self.runner.addresses[0][1]
+        logger.info("Price API listening on %s", self.url)
+        return self.url
+
+    async def stop(self):
+        if self.bridge:
+            self.bridge.stop()
+            self.bridge = None
+        if self.runner:
+            await self.runner.cleanup()
+            self.runner = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.stop()
+
+
+async def serve_forever(api: PriceAPI):
+    async with api:
+        while True:
+            await asyncio.sleep(3600)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve a read-only JSON API over tracked prices")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8088)
+    parser.add_argument('--ttl', type=float, default=API_CACHE_TTL, help="Seconds to cache products and responses")
+    args = parser.parse_args(argv)
+
+    try:
+        asyncio.run(serve_forever(PriceAPI(host=args.host, port=args.port, ttl=args.ttl)))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    from log_setup import configure_logging
+    configure_logging()
+    main()
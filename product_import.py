@@ -0,0 +1,166 @@
+import argparse
+import csv
+import gzip
+import io
+import json
+import os
+import re
+import sys
+import time
+from typing import Dict, Iterable, Iterator, Optional, TextIO
+from urllib.parse import urlparse
+import logging
+
+from product_urls import clean_url
+from rate_limit import retailer_for_url
+
+logger = logging.getLogger(__name__)
+
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", 1000))  # URLs per INSERT and commit
+MAX_URL_LENGTH = 500  # products.url column
+HOST_PATTERN = re.compile(r'[a-z0-9-]+(\.[a-z0-9-]+)+')
+
+def canonical_url(raw: str) -> Optional[str]:
+    """The stored form of a product URL (product_urls.clean_url), or None if it isn't one
+
+    Only validates and adds a missing https:// here. Everything else is
+    clean_url's job, so imported URLs match rows the scrapers stored.
+    """
+    url = (raw or '').strip()
+    if not url:
+        return None
+    if '://' not in url:
+        url = f"https://{url}"
+    try:
+        parsed = urlparse(url)
+        host = (parsed.hostname or '').lower()
+    except ValueError:
+        return None
+    if parsed.scheme.lower() not in ('http', 'https') or not HOST_PATTERN.fullmatch(host):
+        return None
+    return clean_url(url)
+
+
+def detect_format(path: str) -> str:
+    name = path[:-3] if path.endswith('.gz') else path
+    return 'ndjson' if name.endswith(('.ndjson', '.jsonl', '.json')) else 'csv'
+
+
+def open_text(path: str) -> TextIO:
+    """The input as a text stream: '-' is stdin, *.gz is decompressed on the fly"""
+    if path == '-':
+        return io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8', newline='')
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    return open(path, 'r', encoding='utf-8', newline='')
+
+
+def read_urls(stream: TextIO, fmt: str = 'csv', column: str = 'url') -> Iterator[str]:
+    """Raw URLs from a CSV (the `column` column, or the first one when there is no such header)
+    or NDJSON file (objects with a `column` key, or bare strings), one row at a time
+    """
+    if fmt == 'ndjson':
+        for line_number, line in enumerate(stream, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                logger.warning("Skipping line %s: not JSON", line_number)
+                continue
+            value = record.get(column) if isinstance(record, dict) else record
+            if isinstance(value, str):
+                yield value
+        return
+
+    reader = csv.reader(stream)
+    header = next(reader, None)
+    if header is None:
+        return
+    names = [name.strip().lower() for name in header]
+    if column.lower() in names:
+        index = names.index(column.lower())
+    else:
+        # No header row: the first row is already data
+        index = 0
+        if header and header[0].strip():
+            yield header[0]
+    for row in reader:
+        if len(row) > index:
+            yield row[index]
+
+
+def import_urls(db, urls: Iterable[str], batch_size: int = IMPORT_BATCH_SIZE) -> Dict[str, int]:
+    """Canonicalize, deduplicate and store URLs as pending products, `batch_size` at a time
+
+    Only the canonical URLs seen so far are kept in memory, never the input.
+    With db=None nothing is written (a dry run).
+    """
+    if db is not None:
+        from db_d import add_pending_products
+
+    stats = {'read': 0, 'invalid': 0, 'unsupported': 0, 'duplicate': 0, 'existing': 0, 'added': 0}
+    seen = set()
+    batch: Dict[str, str] = {}
+    started = time.perf_counter()
+
+    def flush():
+        added = len(batch) if db is None else add_pending_products(db, batch.items())
+        stats['added'] += added
+        stats['existing'] += len(batch) - added
+        batch.clear()
+        logger.info("Imported %s of %s URLs read (%.0f/s)",
+                    stats['added'], stats['read'], stats['read'] / max(time.perf_counter() - started, 1e-9))
+
+    for raw in urls:
+        stats['read'] += 1
+        url = canonical_url(raw)
+        if url is None or len(url) > MAX_URL_LENGTH:
+            stats['invalid'] += 1
+            continue
+        retailer = retailer_for_url(url)
+        if retailer == 'other':
+            stats['unsupported'] += 1
+            continue
+        if url in seen:
+            stats['duplicate'] += 1
+            continue
+        seen.add(url)
+        batch[url] = retailer
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Import product URLs from CSV or NDJSON as products pending their first scrape"
+    )
+    parser.add_argument('path', help="CSV or NDJSON file (optionally .gz); '-' reads stdin")
+    parser.add_argument('--format', choices=('csv', 'ndjson'), default=None, help="Default: from the file extension")
+    parser.add_argument('--column', default='url', help="CSV column / NDJSON key holding the URL")
+    parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE)
+    parser.add_argument('--dry-run', action='store_true', help="Canonicalize and count without writing")
+    args = parser.parse_args(argv)
+
+    fmt = args.format or detect_format(args.path)
+    db = None
+    if not args.dry_run:
+        from db_d import get_db
+        db = next(get_db())
+    try:
+        with open_text(args.path) as stream:
+            stats = import_urls(db, read_urls(stream, fmt, args.column), args.batch_size)
+    finally:
+        if db is not None:
+            db.close()
+    print(json.dumps(stats))
+
+
+if __name__ == "__main__":
+    from log_setup import configure_logging
+    configure_logging()
+    main()
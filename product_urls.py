@@ -0,0 +1,37 @@
+from urllib.parse import parse_qs, urlparse, urlunparse
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Query parameters that identify the product; everything else is tracking
+KEEP_PARAMS = {
+    'amazon.': {'dp', 'product'},
+    'flipkart.': {'pid', 'lid'},
+    'croma.': {'p'},
+}
+
+
+def clean_url(url):
+    """Remove tracking parameters from URLs
+
+    The one canonical form of a product URL: the scrapers clean with it before
+    storing, and product_import dedupes against stored rows with it. The kept
+    parameters stay in their original order and the fragment is dropped.
+    """
+    if not url:
+        return url
+
+    try:
+        parsed = urlparse(url)
+        keep_params = next((keep for marker, keep in KEEP_PARAMS.items() if marker in parsed.netloc), set())
+        query = parse_qs(parsed.query)
+        clean_query = {k: v for k, v in query.items() if k in keep_params}
+        return urlunparse(
+            parsed._replace(
+                query='&'.join(f"{k}={v[0]}" for k, v in clean_query.items()),
+                fragment=''
+            )
+        )
+    except Exception as e:
+        logger.warning("URL cleaning failed: %s", e)
+        return url
@@ -0,0 +1,149 @@
+import cProfile
+import io
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+import logging
+
+from rate_limit import retailer_for_url
+
+logger = logging.getLogger(__name__)
+
+PROFILE_TOP_N = 20
+MEMORY_FRAMES = 10  # Traceback depth tracemalloc keeps per allocation
+# From 3.12 cProfile runs on sys.monitoring: only one profiler may be active, and it sees every thread
+SINGLE_PROFILER = sys.version_info >= (3, 12)
+
+
+class ProfileSession:
+    """cProfile (and optionally tracemalloc) over a check run, attributed per product
+
+    Before 3.12 cProfile only sees the thread it was enabled in, so the event
+    loop thread is profiled as a whole and every scrape that runs in a worker
+    thread goes through runcall(), which profiles it separately and folds the
+    result in. From 3.12 the one session profiler already covers the worker
+    threads (and a second one can't be enabled), so runcall() just calls.
+    Products are timed and, with memory on, get the peak traced memory reached
+    while they were checked; the allocation sites are taken from a snapshot
+    at the highest peak of the run. Attribution assumes products are checked
+    one at a time, which is how the sequential and scheduled modes run.
+    """
+
+    def __init__(self, memory: bool = False, top: int = PROFILE_TOP_N):
+        self.memory = memory
+        self.top = top
+        self.products: List[Dict[str, Any]] = []
+        self.peak_bytes = 0
+        self.peak_snapshot: Optional[tracemalloc.Snapshot] = None
+        self.started = 0.0
+        self.elapsed = 0.0
+        self._main = cProfile.Profile()
+        self._threads: List[cProfile.Profile] = []
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        if self.memory:
+            tracemalloc.start(MEMORY_FRAMES)
+        self.started = time.perf_counter()
+        self._main.enable()
+
+    def stop(self) -> None:
+        self._main.disable()
+        self.elapsed = time.perf_counter() - self.started
+        if self.memory:
+            tracemalloc.stop()
+
+    def runcall(self, func: Callable, *args, **kwargs):
+        """Run `func` under its own profiler (for worker threads) and keep the result"""
+        if SINGLE_PROFILER:
+            return func(*args, **kwargs)
+        profiler = cProfile.Profile()
+        try:
+            return profiler.runcall(func, *args, **kwargs)
+        finally:
+            with self._lock:
+                self._threads.append(profiler)
+
+    @contextmanager
+    def product(self, url: str):
+        """Time one product check (and its memory peak) for the slowest-products report"""
+        record = {'url': url, 'retailer': retailer_for_url(url), 'seconds': 0.0, 'ok': False, 'peak_kb': None}
+        if self.memory:
+            tracemalloc.reset_peak()
+            baseline, _ = tracemalloc.get_traced_memory()
+        started = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record['seconds'] = time.perf_counter() - started
+            if self.memory:
+                _, peak = tracemalloc.get_traced_memory()
+                record['peak_kb'] = round((peak - baseline) / 1024, 1)
+                if peak > self.peak_bytes:
+                    # Only taken when the run reaches a new high, so this stays rare
+                    self.peak_bytes = peak
+                    self.peak_snapshot = tracemalloc.take_snapshot()
+            self.products.append(record)
+
+    def stats(self) -> pstats.Stats:
+        stats = pstats.Stats(self._main, stream=io.StringIO())
+        with self._lock:
+            for profiler in self._threads:
+                stats.add(profiler)
+        return stats
+
+    def retailer_summary(self) -> List[Dict[str, Any]]:
+        by_retailer: Dict[str, List[float]] = defaultdict(list)
+        for record in self.products:
+            by_retailer[record['retailer']].append(record['seconds'])
+        summary = [
+            {'retailer': retailer, 'products': len(times), 'total_s': sum(times),
+             'mean_s': sum(times) / len(times), 'max_s': max(times)}
+            for retailer, times in by_retailer.items()
+        ]
+        return sorted(summary, key=lambda row: row['total_s'], reverse=True)
+
+    def report(self) -> str:
+        lines = [f"Profiled {len(self.products)} products in {self.elapsed:.1f}s", ""]
+
+        lines.append(f"Slowest {self.top} products")
+        for record in sorted(self.products, key=lambda r: r['seconds'], reverse=True)[:self.top]:
+            memory = f"  peak +{record['peak_kb']:.0f} KiB" if record['peak_kb'] is not None else ""
+            status = 'ok' if record['ok'] else 'failed'
+            lines.append(f"  {record['seconds']:8.2f}s  {record['retailer']:<8} {status:<6}{memory}  {record['url']}")
+        lines.append("")
+
+        lines.append("Retailers by total time")
+        for row in self.retailer_summary():
+            lines.append(
+                f"  {row['retailer']:<8} {row['products']:5d} products  total {row['total_s']:8.1f}s  "
+                f"mean {row['mean_s']:6.2f}s  max {row['max_s']:6.2f}s"
+            )
+        lines.append("")
+
+        lines.append(f"Top {self.top} functions by cumulative time (event loop + scrape threads)")
+        stream = io.StringIO()
+        stats = self.stats()
+        stats.stream = stream
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(self.top)
+        lines.extend("  " + line for line in stream.getvalue().strip().splitlines())
+
+        if self.peak_snapshot is not None:
+            lines.append("")
+            lines.append(f"Peak traced memory {self.peak_bytes / 1024 / 1024:.1f} MiB; top {self.top} allocation sites at the peak")
+            for stat in self.peak_snapshot.statistics('lineno')[:self.top]:
+                frame = stat.traceback[0]
+                lines.append(f"  {stat.size / 1024:10.1f} KiB  {stat.count:7d} blocks  {frame.filename}:{frame.lineno}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str) -> None:
+        """Write the text report to `path` and the raw stats to `path`.prof (for snakeviz/pstats)"""
+        self.stats().dump_stats(f"{path}.prof")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(self.report())
+        logger.info("Profile report written to %s (raw stats in %s.prof)", path, path)
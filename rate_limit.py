@@ -0,0 +1,199 @@
+import math
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+from urllib.parse import urlparse
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Starting points per retailer; the limiter adapts from here
+RETAILER_LIMITS = {
+    'amazon': {'rate': 0.5, 'concurrency': 2},
+    'flipkart': {'rate': 1.0, 'concurrency': 3},
+    'croma': {'rate': 1.0, 'concurrency': 3},
+}
+DEFAULT_LIMITS = {'rate': 0.5, 'concurrency': 1}
+SLOW_RESPONSE_SECONDS = 20.0
+
+# Outcomes that mean the site wants us to slow down ('expired' is our own deadline: neither good nor bad)
+BACKOFF_OUTCOMES = {'blocked', 'throttled', 'slow'}
+BLOCK_MARKERS = ('captcha', 'robot', 'are you human', 'access denied', 'service unavailable', 'too many requests')
+# A 429/503 status, not any 503 inside a price, product ID or URL in the error text
+BLOCK_STATUS = re.compile(r'\b(?:http|status|code|error)\b[\s:=/#-]*(?:429|503)\b')
+
+
+def retailer_for_url(url: Optional[str]) -> str:
+    netloc = urlparse(url or '').netloc.lower()
+    for retailer in ('amazon', 'flipkart', 'croma'):
+        if f'{retailer}.' in netloc:
+            return retailer
+    return 'other'
+
+
+def classify_result(result: Optional[Dict[str, Any]], latency: float,
+                    slow_threshold: float = SLOW_RESPONSE_SECONDS) -> str:
+    """Map a scrape result to a limiter outcome: ok / slow / blocked / expired / error"""
+    outcome = (result or {}).get('outcome')
+    if outcome == 'blocked':
+        return 'blocked'
+    if outcome in ('not_found', 'out_of_stock'):
+        # The site answered quickly and honestly; nothing to back off from
+        return 'ok'
+    error = ((result or {}).get('error') or '').lower()
+    if any(marker in error for marker in BLOCK_MARKERS) or BLOCK_STATUS.search(error):
+        return 'blocked'
+    if (result or {}).get('timed_out'):
+        # The caller's deadline ran out; that says nothing about how the site is coping
+        return 'expired'
+    if latency > slow_threshold:
+        return 'slow'
+    if result and result.get('price'):
+        return 'ok'
+    return 'error'
+
+
+class AdaptiveLimiter:
+    """Token bucket plus AIMD concurrency limit for one retailer
+
+    Successful, fast responses raise the request rate additively and the
+    concurrency limit by about one per window of successes. Slow responses,
+    captcha pages and 503s cut both multiplicatively, at most once per
+    cooldown so a burst of failures from one window counts as one signal.
+    Thread-safe: acquire() blocks the calling scrape thread.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        rate: float = 1.0,
+        concurrency: int = 2,
+        min_rate: float = 0.05,
+        max_rate: float = 5.0,
+        min_concurrency: int = 1,
+        max_concurrency: int = 8,
+        rate_step: float = 0.05,
+        decrease_factor: float = 0.5,
+        cooldown: float = 10.0,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.name = name
+        self.rate = rate
+        self.concurrency = float(concurrency)
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.rate_step = rate_step
+        self.decrease_factor = decrease_factor
+        self.cooldown = cooldown
+        self.clock = clock
+        self.in_flight = 0
+        self.tokens = 1.0
+        self.increases = 0
+        self.decreases = 0
+        self._refilled_at = clock()
+        self._last_decrease = -math.inf
+        self._cond = threading.Condition()
+
+    @property
+    def limit(self) -> int:
+        return max(self.min_concurrency, int(self.concurrency))
+
+    def _refill(self) -> None:
+        now = self.clock()
+        burst = max(1.0, self.rate)
+        self.tokens = min(burst, self.tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """Wait for a token and a concurrency slot; False if `timeout` runs out first"""
+        give_up_at = self.clock() + timeout if timeout is not None else math.inf
+        with self._cond:
+            while True:
+                self._refill()
+                if self.in_flight < self.limit and self.tokens >= 1.0:
+                    self.tokens -= 1.0
+                    self.in_flight += 1
+                    return True
+                remaining = give_up_at - self.clock()
+                if remaining <= 0:
+                    return False
+                # Sleep until the next token is due (or a slot frees up and notifies us)
+                token_wait = (1.0 - self.tokens) / self.rate if self.tokens < 1.0 else 1.0
+                self._cond.wait(min(remaining, max(token_wait, 0.01)))
+
+    def release(self, outcome: str = 'ok') -> None:
+        with self._cond:
+            self.in_flight = max(0, self.in_flight - 1)
+            if outcome == 'ok':
+                self.rate = min(self.max_rate, self.rate + self.rate_step)
+                self.concurrency = min(float(self.max_concurrency), self.concurrency + 1.0 / max(1.0, self.concurrency))
+                self.increases += 1
+            elif outcome in BACKOFF_OUTCOMES:
+                now = self.clock()
+                if now - self._last_decrease >= self.cooldown:
+                    self._last_decrease = now
+                    self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+                    self.concurrency = max(float(self.min_concurrency), self.concurrency * self.decrease_factor)
+                    self.decreases += 1
+                    logger.warning(
+                        "%s: %s response, backing off to %.2f req/s, concurrency %s",
+                        self.name, outcome, self.rate, self.limit
+                    )
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, timeout: Optional[float] = None):
+        """with limiter.slot() as outcome: ...; set outcome['value'] to report how it went"""
+        if not self.acquire(timeout):
+            raise TimeoutError(f"{self.name}: no rate limit slot within {timeout}s")
+        outcome = {'value': 'error'}
+        try:
+            yield outcome
+        finally:
+            self.release(outcome['value'])
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                'rate': round(self.rate, 3),
+                'concurrency': self.limit,
+                'in_flight': self.in_flight,
+                'increases': self.increases,
+                'decreases': self.decreases
+            }
+
+
+class LimiterRegistry:
+    """One AdaptiveLimiter per retailer, created on first use"""
+
+    def __init__(self, limits: Optional[Dict[str, Dict[str, float]]] = None):
+        self.limits = limits or RETAILER_LIMITS
+        self._limiters: Dict[str, AdaptiveLimiter] = {}
+        self._lock = threading.Lock()
+
+    def get(self, retailer: str) -> AdaptiveLimiter:
+        with self._lock:
+            limiter = self._limiters.get(retailer)
+            if limiter is None:
+                # Any other AdaptiveLimiter argument (max_rate, cooldown...) may be given per retailer
+                config = dict(self.limits.get(retailer, DEFAULT_LIMITS))
+                config['concurrency'] = int(config['concurrency'])
+                limiter = AdaptiveLimiter(retailer, **config)
+                self._limiters[retailer] = limiter
+            return limiter
+
+    def for_url(self, url: str) -> AdaptiveLimiter:
+        return self.get(retailer_for_url(url))
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            limiters = dict(self._limiters)
+        return {name: limiter.snapshot() for name, limiter in limiters.items()}
+
+
+# Process-wide registry shared by every scrape thread
+limiters = LimiterRegistry()
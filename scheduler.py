@@ -0,0 +1,260 @@
+import heapq
+import itertools
+import json
+import logging
+import math
+import os
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Relative cost of one product page per retailer (Amazon pages are heavier and better defended)
+RETAILER_COST = {'amazon': 1.5, 'flipkart': 1.0, 'croma': 1.0}
+DEFAULT_PAGES_PER_HOUR = 600
+MIN_INTERVAL = 15 * 60             # Never re-check a product more often than every 15 minutes
+MAX_INTERVAL = 7 * 24 * 3600       # ...or less often than weekly
+DEFAULT_CHANGE_RATE = 1 / 24.0     # Assume a daily change until we have observations
+CHECKS_PER_CHANGE = 2              # Aim to look twice per expected price change
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+# Learned rates and the page budget survive restarts here, so cron-style --scheduled runs
+# keep what earlier runs learned instead of starting from defaults with a full bucket
+SCHEDULER_STATE_PATH = os.getenv("SCHEDULER_STATE_PATH", "scheduler_state.json")
+
+
+def parse_timestamp(value: Optional[str]) -> Optional[float]:
+    """Epoch seconds from the '%Y-%m-%d %H:%M:%S' local timestamps db_d writes"""
+    if not value:
+        return None
+    try:
+        return time.mktime(time.strptime(value, TIMESTAMP_FORMAT))
+    except (ValueError, TypeError):
+        return None
+
+
+def estimate_change_rate(history: Optional[List[Dict[str, Any]]]) -> float:
+    """Observed price changes per hour over the span of price_history"""
+    stamps = [t for t in (parse_timestamp(entry.get('timestamp')) for entry in history or []) if t]
+    if len(stamps) < 2:
+        return DEFAULT_CHANGE_RATE
+    span_hours = (max(stamps) - min(stamps)) / 3600
+    if span_hours <= 0:
+        return DEFAULT_CHANGE_RATE
+    return (len(stamps) - 1) / span_hours
+
+
+class ProductState:
+    __slots__ = ('url', 'retailer', 'change_rate', 'interest', 'last_checked', 'next_check', 'changed')
+
+    def __init__(self, url: str, retailer: str, change_rate: float, interest: int, last_checked: Optional[float]):
+        self.url = url
+        self.retailer = retailer
+        self.change_rate = change_rate
+        self.interest = interest
+        self.last_checked = last_checked
+        self.next_check = 0.0
+        self.changed = False
+
+
+class RefreshScheduler:
+    """Min-heap of products keyed on their next check time, drained under a pages-per-hour budget
+
+    Each product's interval is about half its expected time between price
+    changes. More subscriptions shorten it and a more expensive retailer
+    lengthens it, clamped to [min_interval, max_interval].
+    """
+
+    def __init__(
+        self,
+        pages_per_hour: Optional[float] = None,
+        min_interval: float = MIN_INTERVAL,
+        max_interval: float = MAX_INTERVAL,
+        smoothing: float = 0.3,
+        retailer_cost: Optional[Dict[str, float]] = None,
+        clock: Callable[[], float] = time.time,
+        state_path: Optional[str] = None
+    ):
+        self.pages_per_hour = pages_per_hour or float(os.getenv("SCHEDULER_PAGES_PER_HOUR", DEFAULT_PAGES_PER_HOUR))
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.smoothing = smoothing
+        self.retailer_cost = retailer_cost or RETAILER_COST
+        self.clock = clock
+        self.states: Dict[str, ProductState] = {}
+        self._heap: List[tuple] = []
+        self._seq = itertools.count()
+        # Token bucket in page units; starts full so a fresh run can spend an hour's budget
+        self._tokens = self.pages_per_hour
+        self._refilled_at = clock()
+        self.state_path = state_path
+        if state_path:
+            self.load_state()
+
+    def __len__(self) -> int:
+        return len(self.states)
+
+    def cost(self, retailer: Optional[str]) -> float:
+        return self.retailer_cost.get((retailer or '').lower(), 1.0)
+
+    def interval_for(self, state: ProductState) -> float:
+        expected_gap = 3600 / max(state.change_rate, 1e-6)
+        interval = expected_gap / CHECKS_PER_CHANGE
+        interval /= 1 + math.log1p(state.interest)
+        interval *= self.cost(state.retailer)
+        return min(self.max_interval, max(self.min_interval, interval))
+
+    def _push(self, state: ProductState, when: float) -> None:
+        state.next_check = when
+        heapq.heappush(self._heap, (when, next(self._seq), state.url))
+
+    def add(
+        self,
+        url: str,
+        retailer: Optional[str] = None,
+        change_rate: float = DEFAULT_CHANGE_RATE,
+        interest: int = 0,
+        last_checked: Optional[float] = None
+    ) -> None:
+        """Track a product; never-checked products are due immediately"""
+        if url in self.states:
+            self.states[url].interest = interest
+            return
+        state = ProductState(url, retailer or '', change_rate, interest, last_checked)
+        self.states[url] = state
+        when = last_checked + self.interval_for(state) if last_checked else self.clock()
+        self._push(state, when)
+
+    def add_products(self, products: Iterable[Any], interest: Optional[Callable[[str], int]] = None) -> None:
+        """Seed from db_d.Product rows using latest_prices timestamps (and price_history, if selected)"""
+        for product in products:
+            latest = product.latest_prices or {}
+            self.add(
+                product.url,
+                retailer=product.retailer,
+                change_rate=estimate_change_rate(getattr(product, 'price_history', None)),
+                interest=interest(product.url) if interest else 0,
+                last_checked=parse_timestamp(latest.get('timestamp'))
+            )
+
+    def remove(self, url: str) -> None:
+        # Heap entries for removed products are skipped lazily in due()
+        self.states.pop(url, None)
+
+    def set_interest(self, interest: Callable[[str], int]) -> None:
+        """Re-read every product's subscriber count, e.g. after subscriptions were reloaded"""
+        for state in self.states.values():
+            state.interest = interest(state.url)
+
+    def retain(self, urls: Iterable[str]) -> None:
+        """Forget products that are no longer tracked (e.g. restored from a stale state file)"""
+        keep = set(urls)
+        for url in [url for url in self.states if url not in keep]:
+            self.remove(url)
+
+    def save_state(self) -> None:
+        """Write the bucket and every product's learned state to `state_path` atomically"""
+        if not self.state_path:
+            return
+        state = {
+            'saved_at': self.clock(),
+            'tokens': self._tokens,
+            'refilled_at': self._refilled_at,
+            'products': [
+                [s.url, s.retailer, s.change_rate, s.last_checked, None if math.isinf(s.next_check) else s.next_check]
+                for s in self.states.values()
+            ]
+        }
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.state_path)
+
+    def load_state(self) -> bool:
+        """Restore what save_state wrote; False (and a fresh scheduler) if there is nothing usable"""
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable scheduler state %s: %s", self.state_path, e)
+            return False
+
+        self._tokens = min(self.pages_per_hour, float(state.get('tokens', self.pages_per_hour)))
+        self._refilled_at = float(state.get('refilled_at', self.clock()))
+        now = self.clock()
+        for url, retailer, change_rate, last_checked, next_check in state.get('products', []):
+            product = ProductState(url, retailer, change_rate, 0, last_checked)
+            self.states[url] = product
+            # In flight when saved (the run died mid-check): due again now
+            self._push(product, next_check if next_check is not None else now)
+        logger.info("Restored scheduler state for %s products", len(self.states))
+        return True
+
+    def _refill(self, now: float) -> None:
+        elapsed = max(0.0, now - self._refilled_at)
+        self._tokens = min(self.pages_per_hour, self._tokens + elapsed * self.pages_per_hour / 3600)
+        self._refilled_at = now
+
+    def due(self, limit: Optional[int] = None) -> List[str]:
+        """Pop products whose check time has passed, as far as the page budget allows"""
+        now = self.clock()
+        self._refill(now)
+        urls: List[str] = []
+        while self._heap and (limit is None or len(urls) < limit):
+            when, _, url = self._heap[0]
+            state = self.states.get(url)
+            if state is None or state.next_check != when:
+                heapq.heappop(self._heap)  # Stale entry
+                continue
+            if when > now:
+                break
+            cost = self.cost(state.retailer)
+            if self._tokens < cost:
+                break
+            heapq.heappop(self._heap)
+            self._tokens -= cost
+            state.next_check = math.inf  # In flight until record()/defer()
+            urls.append(url)
+        return urls
+
+    def next_due_in(self) -> Optional[float]:
+        """Seconds until the earliest scheduled product is due (None if nothing queued)"""
+        while self._heap:
+            when, _, url = self._heap[0]
+            state = self.states.get(url)
+            if state is None or state.next_check != when:
+                heapq.heappop(self._heap)
+                continue
+            return max(0.0, when - self.clock())
+        return None
+
+    def on_price_change(self, event: Any) -> None:
+        """Event bus consumer: remember that the product changed since its last check"""
+        state = self.states.get(event.url)
+        if state:
+            state.changed = True
+
+    def record(self, url: str, changed: Optional[bool] = None) -> None:
+        """Update the change-rate estimate after a check and reschedule the product"""
+        state = self.states.get(url)
+        if not state:
+            return
+        now = self.clock()
+        changed = state.changed if changed is None else changed
+        state.changed = False
+
+        if state.last_checked:
+            hours = max((now - state.last_checked) / 3600, 1e-3)
+            sample = (1.0 if changed else 0.0) / hours
+            state.change_rate = (1 - self.smoothing) * state.change_rate + self.smoothing * sample
+        state.last_checked = now
+        self._push(state, now + self.interval_for(state))
+
+    def defer(self, url: str, delay: float) -> None:
+        """Reschedule without touching the change estimate (failed or skipped checks)"""
+        state = self.states.get(url)
+        if state:
+            self._push(state, self.clock() + delay)
@@ -6,14 +6,10 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, NoSuchElementException
 import time
 import re
-from urllib.parse import urlparse, parse_qs, urlunparse
 import logging
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
+from product_urls import clean_url
+
 logger = logging.getLogger(__name__)
 
 def init_driver(headless=True):
@@ -39,39 +35,6 @@ def init_driver(headless=True):
     driver.implicitly_wait(5)
     return driver
 
-def clean_url(url):
-    """Remove tracking parameters from URLs"""
-    if not url:
-        return url
-    
-    try:
-        parsed = urlparse(url)
-        
-        # Domain-specific parameter preservation
-        if 'amazon.' in parsed.netloc:
-            keep_params = {'dp', 'product'}
-        elif 'flipkart.' in parsed.netloc:
-            keep_params = {'pid', 'lid'}
-        elif 'croma.' in parsed.netloc:
-            keep_params = {'p'}
-        else:
-            keep_params = set()
-        
-        # Filter query parameters
-        query = parse_qs(parsed.query)
-        clean_query = {k: v for k, v in query.items() if k in keep_params}
-        
-        # Rebuild URL
-        return urlunparse(
-            parsed._replace(
-                query='&'.join(f"{k}={v[0]}" for k, v in clean_query.items()),
-                fragment=''
-            )
-        )
-    except Exception as e:
-        logger.warning(f"URL cleaning failed: {str(e)}")
-        return url
-
 def extract_price(price_str):
     """Extract numeric price from string"""
     if not price_str:
@@ -92,7 +55,7 @@ def extract_price(price_str):
         
         return int(float(cleaned)) if cleaned else None
     except (ValueError, AttributeError) as e:
-        logger.warning(f"Price extraction failed: {str(e)}")
+        logger.warning("Price extraction failed: %s", e)
         return None
 
 def scrape_amazon(driver, url):
@@ -141,7 +104,7 @@ def scrape_amazon(driver, url):
             
     except Exception as e:
         result['error'] = str(e)
-        logger.error(f"Error scraping Amazon: {str(e)}")
+        logger.error("Error scraping Amazon: %s", e)
     
     return result
 
@@ -157,7 +120,7 @@ def scrape_retailer(driver, url, retailer):
     }
     
     try:
-        logger.info(f"Scraping {retailer}")
+        logger.info("Scraping %s", retailer)
         driver.get(url)
         
         # Product name selectors
@@ -196,7 +159,7 @@ def scrape_retailer(driver, url, retailer):
         
     except Exception as e:
         result['error'] = str(e)
-        logger.error(f"Error scraping {retailer}: {str(e)}")
+        logger.error("Error scraping %s: %s", retailer, e)
     
     return result
 
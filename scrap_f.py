@@ -6,17 +6,20 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, NoSuchElementException
 import time
 import re
-from urllib.parse import urlparse, parse_qs, urlunparse
 import logging
 from typing import Dict, Optional, Any
+from deadline import Deadline, DeadlineExceeded, wait_timeout
+from page_classifier import classify_page, explain_missing_price
+from rate_limit import retailer_for_url
+from product_urls import clean_url
+from metrics import DRIVER_STARTUP_SECONDS, PAGE_LOAD_SECONDS, SELECTOR_WAIT_SECONDS, PARSE_FAILURES
+from tracing import tracer, traced
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
+PAGE_LOAD_TIMEOUT = 30  # Seconds; capped further by any deadline
+IMPLICIT_WAIT = 5
+
 def init_driver(headless=True):
     """Initialize and configure Chrome WebDriver"""
     options = webdriver.ChromeOptions()
@@ -36,42 +39,89 @@ def init_driver(headless=True):
         options.add_argument('--start-maximized')
     
     service = Service()
-    driver = webdriver.Chrome(service=service, options=options)
-    driver.implicitly_wait(5)
+    with DRIVER_STARTUP_SECONDS.time():
+        driver = webdriver.Chrome(service=service, options=options)
+    driver.implicitly_wait(IMPLICIT_WAIT)
+    driver.set_page_load_timeout(PAGE_LOAD_TIMEOUT)
     return driver
 
-def clean_url(url):
-    """Remove tracking parameters from URLs"""
-    if not url:
-        return url
-    
+@traced()
+def load_page(driver, url, deadline: Optional[Deadline] = None):
+    """driver.get bounded by the deadline; a load that runs out of time is aborted with window.stop()
+
+    The pooled driver is reused for the next product, so a capped page-load timeout
+    is restored afterwards and the implicit wait is reset to IMPLICIT_WAIT without a deadline.
+    """
+    if deadline:
+        driver.set_page_load_timeout(max(1, deadline.timeout(PAGE_LOAD_TIMEOUT)))
+    retailer = retailer_for_url(url)
+    started = time.perf_counter()
     try:
-        parsed = urlparse(url)
-        
-        # Domain-specific parameter preservation
-        if 'amazon.' in parsed.netloc:
-            keep_params = {'dp', 'product'}
-        elif 'flipkart.' in parsed.netloc:
-            keep_params = {'pid', 'lid'}
-        elif 'croma.' in parsed.netloc:
-            keep_params = {'p'}
-        else:
-            keep_params = set()
-        
-        # Filter query parameters
-        query = parse_qs(parsed.query)
-        clean_query = {k: v for k, v in query.items() if k in keep_params}
-        
-        # Rebuild URL
-        return urlunparse(
-            parsed._replace(
-                query='&'.join(f"{k}={v[0]}" for k, v in clean_query.items()),
-                fragment=''
-            )
-        )
-    except Exception as e:
-        logger.warning(f"URL cleaning failed: {str(e)}")
-        return url
+        driver.get(url)
+        PAGE_LOAD_SECONDS.labels(retailer, 'ok').observe(time.perf_counter() - started)
+    except TimeoutException:
+        PAGE_LOAD_SECONDS.labels(retailer, 'timeout').observe(time.perf_counter() - started)
+        # Stop the network activity; whatever DOM has arrived may already hold the price
+        try:
+            driver.execute_script("window.stop();")
+        except Exception:
+            pass
+        if deadline:
+            deadline.check()
+        logger.warning("Page load timed out, continuing with partial page: %s", url)
+    finally:
+        if deadline:
+            driver.set_page_load_timeout(PAGE_LOAD_TIMEOUT)
+    # find_element's implicit wait must not outlive the budget either
+    driver.implicitly_wait(wait_timeout(deadline, IMPLICIT_WAIT))
+
+def wait_for_element(driver, locator, timeout: float, retailer: str, field: str):
+    """WebDriverWait for presence of `locator`, recording how long the wait took and whether it hit"""
+    started = time.perf_counter()
+    with tracer.span('wait_for_element', retailer=retailer, field=field, locator=locator[1], timeout=timeout) as span:
+        try:
+            element = WebDriverWait(driver, timeout).until(EC.presence_of_element_located(locator))
+        except TimeoutException:
+            SELECTOR_WAIT_SECONDS.labels(retailer, field, 'timeout').observe(time.perf_counter() - started)
+            if span:
+                span.set(outcome='timeout')
+            raise
+        SELECTOR_WAIT_SECONDS.labels(retailer, field, 'found').observe(time.perf_counter() - started)
+        if span:
+            span.set(outcome='found')
+        return element
+
+def parse_price(price_text, retailer: str):
+    """extract_price, counting texts that were found but could not be parsed"""
+    price = extract_price(price_text)
+    if price is None:
+        PARSE_FAILURES.labels(retailer).inc()
+    return price
+
+@traced('classify_page')
+def page_is_scrapable(driver, url, result: Dict[str, Any]) -> bool:
+    """Classify the freshly loaded page; on a bot wall, 404 or sold-out page fill in `result` and return False
+
+    Lets the scrapers return in milliseconds instead of waiting out every selector.
+    """
+    verdict = classify_page(driver, url)
+    result['outcome'] = verdict.outcome
+    if verdict.ok:
+        return True
+    result['error'] = f"{verdict.outcome}: {verdict.reason}"
+    logger.warning("%s page is %s (%s): %s", result['retailer'], verdict.outcome, verdict.reason, url)
+    return False
+
+@traced('explain_missing_price')
+def page_is_sold_out(driver, url, result: Dict[str, Any]) -> bool:
+    """No price was found: if the page says it is sold out, record that in `result` and return True"""
+    verdict = explain_missing_price(driver, url)
+    if not verdict:
+        return False
+    result['outcome'] = verdict.outcome
+    result['error'] = f"{verdict.outcome}: {verdict.reason}"
+    logger.info("%s page has no price and says %r: %s", result['retailer'], verdict.reason, url)
+    return True
 
 def extract_price(price_str):
     """Extract numeric price from string"""
@@ -93,27 +143,30 @@ def extract_price(price_str):
         
         return int(float(cleaned)) if cleaned else None
     except (ValueError, AttributeError) as e:
-        logger.warning(f"Price extraction failed: {str(e)}")
+        logger.warning("Price extraction failed: %s", e)
         return None
 
-def scrape_amazon(driver, url):
+@traced()
+def scrape_amazon(driver, url, deadline: Optional[Deadline] = None):
     """Specialized Amazon scraper"""
     result = {
         'price': None,
         'name': None,
         'retailer': 'amazon',
-        'error': None
+        'error': None,
+        'timed_out': False,
+        'outcome': None
     }
     
     try:
         logger.info("Scraping Amazon")
-        driver.get(url)
+        load_page(driver, url, deadline)
+        if not page_is_scrapable(driver, url, result):
+            return result
         
         # Product name
         try:
-            name_element = WebDriverWait(driver, 15).until(
-                EC.presence_of_element_located((By.ID, "productTitle"))
-            )
+            name_element = wait_for_element(driver, (By.ID, "productTitle"), wait_timeout(deadline, 15), 'amazon', 'name')
             result['name'] = name_element.text.strip()
         except TimeoutException:
             pass
@@ -128,37 +181,48 @@ def scrape_amazon(driver, url):
         
         for selector in price_selectors:
             try:
-                price_element = WebDriverWait(driver, 5).until(
-                    EC.presence_of_element_located((By.XPATH, selector))
-                )
+                price_element = wait_for_element(driver, (By.XPATH, selector), wait_timeout(deadline, 5), 'amazon', 'price')
                 price_text = price_element.get_attribute("textContent") or price_element.text
-                result['price'] = extract_price(price_text)
+                result['price'] = parse_price(price_text, 'amazon')
                 if result['price']:
                     break
             except (TimeoutException, NoSuchElementException):
                 continue
         
         if not result['price']:
+            if deadline:
+                deadline.check()
+            if page_is_sold_out(driver, url, result):
+                return result
             raise Exception("Could not find price element on Amazon page")
             
+    except DeadlineExceeded:
+        result['error'] = "deadline exceeded"
+        result['timed_out'] = True
+        logger.warning("Deadline exceeded scraping Amazon: %s", url)
     except Exception as e:
         result['error'] = str(e)
-        logger.error(f"Error scraping Amazon: {str(e)}")
+        logger.error("Error scraping Amazon: %s", e)
     
     return result
 
-def scrape_flipkart(driver, url):
+@traced()
+def scrape_flipkart(driver, url, deadline: Optional[Deadline] = None):
     """Specialized Flipkart scraper"""
     result = {
         'price': None,
         'name': None,
         'retailer': 'flipkart',
-        'error': None
+        'error': None,
+        'timed_out': False,
+        'outcome': None
     }
     
     try:
         logger.info("Scraping Flipkart")
-        driver.get(url)
+        load_page(driver, url, deadline)
+        if not page_is_scrapable(driver, url, result):
+            return result
         
         # Product name
         name_selectors = [
@@ -176,29 +240,45 @@ def scrape_flipkart(driver, url):
                 continue
         
         # Product price
-        price_element = WebDriverWait(driver, 15).until(
-            EC.presence_of_element_located((By.XPATH, "//div[contains(@class, '_30jeq3') or contains(text(),'₹')]"))
+        price_element = wait_for_element(
+            driver, (By.XPATH, "//div[contains(@class, '_30jeq3') or contains(text(),'₹')]"),
+            wait_timeout(deadline, 15), 'flipkart', 'price'
         )
-        result['price'] = extract_price(price_element.text)
+        result['price'] = parse_price(price_element.text, 'flipkart')
         
+    except DeadlineExceeded:
+        result['error'] = "deadline exceeded"
+        result['timed_out'] = True
+        logger.warning("Deadline exceeded scraping Flipkart: %s", url)
+    except TimeoutException as e:
+        result['timed_out'] = bool(deadline and deadline.expired)
+        if not result['timed_out'] and page_is_sold_out(driver, url, result):
+            return result
+        result['error'] = str(e) or "price element not found"
+        logger.error("Error scraping Flipkart: %s", e)
     except Exception as e:
         result['error'] = str(e)
-        logger.error(f"Error scraping Flipkart: {str(e)}")
+        logger.error("Error scraping Flipkart: %s", e)
     
     return result
 
-def scrape_croma(driver, url):
+@traced()
+def scrape_croma(driver, url, deadline: Optional[Deadline] = None):
     """Specialized Croma scraper"""
     result = {
         'price': None,
         'name': None,
         'retailer': 'croma',
-        'error': None
+        'error': None,
+        'timed_out': False,
+        'outcome': None
     }
     
     try:
         logger.info("Scraping Croma")
-        driver.get(url)
+        load_page(driver, url, deadline)
+        if not page_is_scrapable(driver, url, result):
+            return result
         
         # Product name
         name_selectors = [
@@ -216,51 +296,66 @@ def scrape_croma(driver, url):
                 continue
         
         # Product price
-        price_element = WebDriverWait(driver, 15).until(
-            EC.presence_of_element_located((By.XPATH, "//span[contains(@class, 'amount') or contains(@class, 'price')]"))
+        price_element = wait_for_element(
+            driver, (By.XPATH, "//span[contains(@class, 'amount') or contains(@class, 'price')]"),
+            wait_timeout(deadline, 15), 'croma', 'price'
         )
-        result['price'] = extract_price(price_element.text)
+        result['price'] = parse_price(price_element.text, 'croma')
         
+    except DeadlineExceeded:
+        result['error'] = "deadline exceeded"
+        result['timed_out'] = True
+        logger.warning("Deadline exceeded scraping Croma: %s", url)
+    except TimeoutException as e:
+        result['timed_out'] = bool(deadline and deadline.expired)
+        if not result['timed_out'] and page_is_sold_out(driver, url, result):
+            return result
+        result['error'] = str(e) or "price element not found"
+        logger.error("Error scraping Croma: %s", e)
     except Exception as e:
         result['error'] = str(e)
-        logger.error(f"Error scraping Croma: {str(e)}")
+        logger.error("Error scraping Croma: %s", e)
     
     return result
 
+@traced()
 def scrape_product_data(
     driver,
     amazon_url: Optional[str] = None,
     flipkart_url: Optional[str] = None,
-    croma_url: Optional[str] = None
+    croma_url: Optional[str] = None,
+    deadline: Optional[Deadline] = None
 ) -> Dict[str, Any]:
     """Scrape product data from available retailer URLs"""
     result = {
         'price': None,
         'name': None,
         'retailer': None,
-        'error': None
+        'error': None,
+        'timed_out': False,
+        'outcome': None
     }
     
     try:
-        if amazon_url:
-            amazon_result = scrape_amazon(driver, amazon_url)
-            if amazon_result['price']:
-                return amazon_result
-        
-        if flipkart_url:
-            flipkart_result = scrape_flipkart(driver, flipkart_url)
-            if flipkart_result['price']:
-                return flipkart_result
-                
-        if croma_url:
-            croma_result = scrape_croma(driver, croma_url)
-            if croma_result['price']:
-                return croma_result
+        for url, scraper in ((amazon_url, scrape_amazon), (flipkart_url, scrape_flipkart), (croma_url, scrape_croma)):
+            if not url:
+                continue
+            if deadline and deadline.expired:
+                result['timed_out'] = True
+                raise DeadlineExceeded("deadline exceeded")
+            retailer_result = scraper(driver, url, deadline)
+            if retailer_result['price']:
+                return retailer_result
+            # Keep the retailer on failures too, so per-retailer circuit breakers can count them
+            result['retailer'] = retailer_result['retailer']
+            result['outcome'] = retailer_result.get('outcome')
+            result['error'] = retailer_result['error']
+            result['timed_out'] = result['timed_out'] or retailer_result.get('timed_out', False)
                 
         raise Exception("No valid retailer URL provided or failed to scrape all")
         
     except Exception as e:
-        result['error'] = str(e)
-        logger.error(f"Error in scrape_product_data: {str(e)}")
+        result['error'] = result['error'] or str(e)
+        logger.error("Error in scrape_product_data: %s", e)
     
-    return result
\ No newline at end of file
+    return result
@@ -6,7 +6,8 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, NoSuchElementException
 import time
 import re
-from urllib.parse import urlparse, parse_qs, urlunparse
+
+from product_urls import clean_url
 
 def init_driver(headless=False):
     """Initialize and configure the Chrome WebDriver"""
@@ -30,31 +31,6 @@ def init_driver(headless=False):
     driver.implicitly_wait(5)
     return driver
 
-def clean_url(url):
-    """Remove tracking parameters from URLs"""
-    if not url:
-        return url
-    
-    try:
-        # Parse the URL
-        parsed = urlparse(url)
-        
-        # Keep only essential query parameters
-        if parsed.netloc.endswith('amazon.in'):
-            keep_params = {'dp', 'product'}
-            query = {k: v for k, v in parse_qs(parsed.query).items() if k in keep_params}
-        elif parsed.netloc.endswith('flipkart.com'):
-            keep_params = {'pid', 'lid'}
-            query = {k: v for k, v in parse_qs(parsed.query).items() if k in keep_params}
-        else:
-            query = {}
-        
-        # Rebuild the URL
-        cleaned = parsed._replace(query='&'.join(f"{k}={v[0]}" for k, v in query.items()))
-        return urlunparse(cleaned)
-    except Exception:
-        return url  # Return original if cleaning fails
-
 def extract_price(price_str):
     """Extract numeric price from string"""
     if not price_str:
@@ -0,0 +1,194 @@
+import asyncio
+import hashlib
+import logging
+import multiprocessing as mp
+import os
+import time
+from multiprocessing.connection import wait
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional
+
+from log_setup import configure_logging, shutdown_logging
+
+logger = logging.getLogger(__name__)
+
+MAX_RESTARTS_PER_SHARD = 5
+MAX_CRASHES_PER_URL = 2  # A URL that takes its worker down twice is skipped for this run
+DEAD_WORKER_POLL_SECONDS = 0.2
+
+
+def canonical_key(url: str) -> str:
+    return url.strip().lower().rstrip('/')
+
+
+def shard_for(url: str, shards: int) -> int:
+    """Stable shard index for a URL (same on every run and every machine)"""
+    digest = hashlib.blake2b(canonical_key(url).encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big') % shards
+
+
+def partition(urls: List[str], shards: int) -> List[List[str]]:
+    buckets: List[List[str]] = [[] for _ in range(shards)]
+    for url in urls:
+        buckets[shard_for(url, shards)].append(url)
+    return buckets
+
+
+async def _check_shard(shard: int, urls: List[str], results) -> Dict[str, Any]:
+    import tracing
+    from check_prices import PriceMonitor
+    from events import bus
+
+    monitor = PriceMonitor()
+    try:
+        monitor.load_subscriptions()
+        for url in urls:
+            results.put(('start', shard, url, None))
+            started = time.perf_counter()
+            ok = await monitor.check_product(url)
+            results.put(('done', shard, url, {'ok': bool(ok), 'seconds': time.perf_counter() - started}))
+        await bus.drain()
+        return monitor.stats.summary()
+    finally:
+        await monitor.aclose()
+        tracing.dump_from_env(part=f"shard{shard}")
+
+
+class ShardReporter:
+    """A worker's end of its own pipe to the supervisor, with a Queue-like put()
+
+    Each shard gets a private pipe rather than sharing one multiprocessing.Queue:
+    a worker killed while writing to a shared queue can die holding its write
+    lock and hang every other shard.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def put(self, message) -> None:
+        self.connection.send(message)
+
+
+def _worker_main(shard: int, urls: List[str], results) -> None:
+    """Process entry point: own driver, own DB engine, reports back through `results`"""
+    configure_logging(tag=f"shard {shard}")
+    if os.name == 'nt':
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+    try:
+        summary = asyncio.run(_check_shard(shard, urls, results))
+        results.put(('exit', shard, None, summary))
+    finally:
+        # multiprocessing children skip atexit, so flush the listener here
+        shutdown_logging()
+
+
+class ShardSupervisor:
+    """Run check_product over N worker processes, restarting crashed shards
+
+    Each worker reports 'start'/'done' per URL, so a restarted worker only
+    receives the URLs its predecessor had not finished.
+    """
+
+    def __init__(self, workers: int, max_restarts: int = MAX_RESTARTS_PER_SHARD, target=_worker_main):
+        self.workers = workers
+        self.max_restarts = max_restarts
+        self.target = target
+        self.context = mp.get_context('spawn')
+
+    def _start(self, shard: int, urls: List[str]):
+        reader, writer = self.context.Pipe(duplex=False)
+        process = self.context.Process(target=self.target, args=(shard, urls, ShardReporter(writer)), name=f"price-shard-{shard}")
+        process.start()
+        writer.close()  # Only the child writes; EOF on `reader` then means it is gone
+        return process, reader
+
+    def run(self, urls: List[str], on_result: Optional[Callable[[str, bool], None]] = None) -> Dict[str, Any]:
+        """Check `urls` across the workers; `on_result(url, ok)` is called as each one finishes"""
+        # Insertion-ordered dicts: O(1) removal, and a restarted shard keeps the original order
+        pending: Dict[int, Dict[str, None]] = {
+            i: dict.fromkeys(bucket) for i, bucket in enumerate(partition(urls, self.workers)) if bucket
+        }
+        in_flight: Dict[int, Optional[str]] = {}
+        crashes: Dict[str, int] = defaultdict(int)
+        restarts: Dict[int, int] = defaultdict(int)
+        finished = set()
+        stats = {'products': len(urls), 'succeeded': 0, 'failed': 0, 'skipped': 0, 'restarts': 0,
+                 'seconds': 0.0, 'changes': defaultdict(lambda: defaultdict(int))}
+
+        processes = {}
+        readers = {}
+        for shard, bucket in pending.items():
+            processes[shard], readers[shard] = self._start(shard, list(bucket))
+        logger.info("Started %s shard workers for %s products", len(processes), len(urls))
+
+        def handle(message):
+            kind, shard, url, payload = message
+            if kind == 'start':
+                in_flight[shard] = url
+            elif kind == 'done':
+                in_flight[shard] = None
+                pending.get(shard, {}).pop(url, None)
+                stats['succeeded' if payload['ok'] else 'failed'] += 1
+                stats['seconds'] += payload['seconds']
+                if on_result:
+                    on_result(url, payload['ok'])
+            elif kind == 'exit':
+                finished.add(shard)
+                for retailer, counts in (payload or {}).items():
+                    for key, value in counts.items():
+                        stats['changes'][retailer][key] += value
+
+        def drain(shard) -> None:
+            reader = readers[shard]
+            try:
+                while reader.poll():
+                    handle(reader.recv())
+            except (EOFError, OSError):
+                pass  # Writer gone; everything it sent has been read
+
+        while len(finished) < len(processes):
+            # Process sentinels wake us as soon as a shard dies, however busy the others are
+            live = [shard for shard in processes if shard not in finished]
+            wait([readers[shard] for shard in live] + [processes[shard].sentinel for shard in live],
+                 timeout=DEAD_WORKER_POLL_SECONDS)
+            for shard in live:
+                drain(shard)
+
+            for shard, process in list(processes.items()):
+                if shard in finished or process.is_alive():
+                    continue
+                drain(shard)  # Anything reported between the drain above and exiting
+                if shard in finished:
+                    continue
+
+                culprit = in_flight.pop(shard, None)
+                if culprit:
+                    crashes[culprit] += 1
+                    if crashes[culprit] >= MAX_CRASHES_PER_URL:
+                        logger.error("Skipping %s: crashed its worker %s times", culprit, crashes[culprit])
+                        pending[shard].pop(culprit, None)
+                        stats['skipped'] += 1
+                        if on_result:
+                            on_result(culprit, False)
+
+                if not pending[shard]:
+                    finished.add(shard)
+                elif restarts[shard] >= self.max_restarts:
+                    logger.error("Shard %s gave up after %s restarts; %s products unchecked",
+                                 shard, restarts[shard], len(pending[shard]))
+                    stats['skipped'] += len(pending[shard])
+                    finished.add(shard)
+                else:
+                    restarts[shard] += 1
+                    stats['restarts'] += 1
+                    logger.warning("Shard %s died (exit code %s); restarting with %s products",
+                                   shard, process.exitcode, len(pending[shard]))
+                    readers[shard].close()
+                    processes[shard], readers[shard] = self._start(shard, list(pending[shard]))
+
+        for shard, process in processes.items():
+            process.join(timeout=10)
+            readers[shard].close()
+
+        stats['changes'] = {retailer: dict(counts) for retailer, counts in stats['changes'].items()}
+        return stats
@@ -0,0 +1,461 @@
+import aiohttp
+import asyncio
+import os
+import smtplib
+import time
+from collections import OrderedDict
+from email.message import EmailMessage
+from dotenv import load_dotenv
+import logging
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from urllib.parse import urlparse
+from metrics import WEBHOOK_SECONDS, WEBHOOK_RATE_LIMITED
+from tracing import traced
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+MAX_USER_SINKS = int(os.getenv("MAX_USER_SINKS", 256))  # Per-user webhook sinks kept open (LRU)
+
+RETAILER_ICONS = {
+    'amazon': 'https://upload.wikimedia.org/wikipedia/commons/a/a9/Amazon_logo.svg',
+    'flipkart': 'https://upload.wikimedia.org/wikipedia/commons/2/2f/Flipkart_logo.png',
+    'croma': 'https://www.croma.com/assets/images/croma-logo.png'
+}
+
+
+def build_alert(product_name: str, old_price: float, new_price: float, url: str, retailer: str) -> Dict[str, Any]:
+    """Normalise send_alert arguments into the dict every sink renders from"""
+    drop_pct = ((old_price - new_price) / old_price) * 100 if old_price else 0.0
+    return {
+        'product_name': (product_name or 'Unknown Product')[:200],
+        'old_price': old_price,
+        'new_price': new_price,
+        'drop_pct': drop_pct,
+        'url': url,
+        'domain': urlparse(url).netloc.replace('www.', '') if url else '',
+        'retailer': retailer or 'unknown'
+    }
+
+
+class NotificationSink:
+    """Base class for a single alert destination"""
+
+    kind = 'base'
+
+    def __init__(self, name: Optional[str] = None, max_concurrency: int = 4, timeout: float = 10.0):
+        self.name = name or self.kind
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+
+    def render(self, alert: Dict[str, Any]) -> Any:
+        """Build the payload for this sink type; called once per kind per alert"""
+        raise NotImplementedError
+
+    async def deliver(self, payload: Any, session: aiohttp.ClientSession) -> bool:
+        """Send an already rendered payload, returning True on success"""
+        raise NotImplementedError
+
+
+class DiscordWebhookSink(NotificationSink):
+    kind = 'discord'
+
+    def __init__(self, url: str, **kwargs):
+        super().__init__(**kwargs)
+        self.url = url
+
+    def render(self, alert: Dict[str, Any]) -> Any:
+        return {
+            "embeds": [{
+                "title": f"💰 Price Drop Alert! ({alert['retailer'].upper()})",
+                "description": (
+                    f"**{alert['product_name']}**\n\n"
+                    f"🔻 **{alert['drop_pct']:.1f}%** price drop!\n"
+                    f"📉 Old price: ₹{alert['old_price']:,.2f}\n"
+                    f"📈 New price: **₹{alert['new_price']:,.2f}**\n"
+                    f"🛒 [View Product]({alert['url']})"
+                ),
+                "color": 3066993,  # Green color
+                "thumbnail": {"url": RETAILER_ICONS.get(alert['retailer'].lower(), "")},
+                "footer": {"text": f"Tracked from {alert['domain']}"}
+            }]
+        }
+
+    async def deliver(self, payload: Any, session: aiohttp.ClientSession) -> bool:
+        async with session.post(self.url, json=payload) as response:
+            if response.status == 204:
+                return True
+            if response.status == 429:
+                WEBHOOK_RATE_LIMITED.labels(self.name).inc()
+            error_text = await response.text()
+            logger.error("Discord sink %s error: %s - %s", self.name, response.status, error_text)
+            return False
+
+
+class JsonWebhookSink(NotificationSink):
+    kind = 'json'
+
+    def __init__(self, url: str, headers: Optional[Dict[str, str]] = None, **kwargs):
+        super().__init__(**kwargs)
+        self.url = url
+        self.headers = headers or {}
+
+    def render(self, alert: Dict[str, Any]) -> Any:
+        return {
+            'event': 'price_drop',
+            'product_name': alert['product_name'],
+            'retailer': alert['retailer'],
+            'url': alert['url'],
+            'old_price': alert['old_price'],
+            'new_price': alert['new_price'],
+            'drop_percentage': round(alert['drop_pct'], 2),
+            'user_id': alert.get('user_id'),
+            'subscription_id': alert.get('subscription_id')
+        }
+
+    async def deliver(self, payload: Any, session: aiohttp.ClientSession) -> bool:
+        async with session.post(self.url, json=payload, headers=self.headers) as response:
+            if 200 <= response.status < 300:
+                return True
+            if response.status == 429:
+                WEBHOOK_RATE_LIMITED.labels(self.name).inc()
+            logger.error("JSON sink %s error: %s", self.name, response.status)
+            return False
+
+
+class SmtpSink(NotificationSink):
+    """Plain-text email through an SMTP relay (blocking smtplib runs in a thread)"""
+
+    kind = 'smtp'
+
+    def __init__(self, host: str, port: int, sender: str, recipients: List[str], **kwargs):
+        super().__init__(**kwargs)
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.recipients = recipients
+
+    def render(self, alert: Dict[str, Any]) -> Any:
+        subject = f"Price drop: {alert['product_name'][:80]} ({alert['drop_pct']:.1f}% off)"
+        body = (
+            f"{alert['product_name']}\n\n"
+            f"Retailer: {alert['retailer']}\n"
+            f"Old price: ₹{alert['old_price']:,.2f}\n"
+            f"New price: ₹{alert['new_price']:,.2f}\n"
+            f"Drop: {alert['drop_pct']:.1f}%\n\n"
+            f"{alert['url']}\n"
+        )
+        return subject, body
+
+    def _send(self, subject: str, body: str) -> bool:
+        message = EmailMessage()
+        message['Subject'] = subject
+        message['From'] = self.sender
+        message['To'] = ', '.join(self.recipients)
+        message.set_content(body)
+        with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+            smtp.send_message(message)
+        return True
+
+    async def deliver(self, payload: Any, session: aiohttp.ClientSession) -> bool:
+        subject, body = payload
+        sending = asyncio.ensure_future(asyncio.to_thread(self._send, subject, body))
+        try:
+            return await asyncio.shield(sending)
+        except asyncio.CancelledError:
+            # A timeout can't interrupt smtplib; don't finish (and free the slot) until it returns
+            await asyncio.wait([sending])
+            raise
+
+
+def _split_env(name: str) -> List[str]:
+    return [value.strip() for value in os.getenv(name, "").split(",") if value.strip()]
+
+
+def _sink_limits(kind: str) -> Dict[str, Any]:
+    """Per-kind concurrency/timeout, e.g. DISCORD_SINK_CONCURRENCY=2, SMTP_SINK_TIMEOUT=30"""
+    prefix = kind.upper()
+    return {
+        'max_concurrency': int(os.getenv(f"{prefix}_SINK_CONCURRENCY", 4)),
+        'timeout': float(os.getenv(f"{prefix}_SINK_TIMEOUT", 10.0))
+    }
+
+
+def sink_for_destination(url: str, **kwargs) -> NotificationSink:
+    """Sink for a user-supplied webhook URL: Discord webhooks by host, anything else gets JSON"""
+    host = urlparse(url).netloc.lower()
+    if host.endswith(('discord.com', 'discordapp.com')):
+        return DiscordWebhookSink(url, **{**_sink_limits('discord'), **kwargs})
+    return JsonWebhookSink(url, **{**_sink_limits('json'), **kwargs})
+
+
+def load_sinks_from_env() -> List[NotificationSink]:
+    """Build sinks from DISCORD_WEBHOOK_URL(S), JSON_WEBHOOK_URLS and SMTP_* settings"""
+    sinks: List[NotificationSink] = []
+
+    discord_urls = _split_env("DISCORD_WEBHOOK_URLS") or _split_env("DISCORD_WEBHOOK_URL")
+    for i, url in enumerate(discord_urls):
+        sinks.append(DiscordWebhookSink(url, name=f"discord-{i}", **_sink_limits('discord')))
+
+    for i, url in enumerate(_split_env("JSON_WEBHOOK_URLS")):
+        sinks.append(JsonWebhookSink(url, name=f"json-{i}", **_sink_limits('json')))
+
+    smtp_recipients = _split_env("SMTP_TO")
+    if os.getenv("SMTP_HOST") and smtp_recipients:
+        sinks.append(SmtpSink(
+            host=os.getenv("SMTP_HOST"),
+            port=int(os.getenv("SMTP_PORT", 25)),
+            sender=os.getenv("SMTP_FROM", "price-tracker@localhost"),
+            recipients=smtp_recipients,
+            name="smtp",
+            **_sink_limits('smtp')
+        ))
+
+    return sinks
+
+
+class NotificationFanout:
+    """Deliver each alert to every configured sink without waiting on any of them
+
+    Each sink has its own queue and worker task, so send_alert returns as soon
+    as the alert is queued and a slow sink only delays its own backlog. An
+    alert's `timeout` covers the whole trip through a sink: queueing, waiting
+    for one of its `max_concurrency` slots and the delivery itself.
+
+    Since send_alert doesn't wait, callers learn about alerts that no sink
+    delivered through `on_undelivered(alert)`, e.g. to lift a cooldown.
+
+    Drop-in replacement for notify_c.DiscordNotifier: same send_alert/close API.
+    """
+
+    def __init__(self, sinks: Iterable[NotificationSink], min_drop: Optional[float] = None):
+        self.sinks = list(sinks)
+        self.min_drop = float(os.getenv("MIN_DROP_PERCENTAGE", 5.0)) if min_drop is None else min_drop
+        self.session = None
+        self._queues: Dict[NotificationSink, asyncio.Queue] = {}
+        self._workers: List[asyncio.Task] = []
+        self._deliveries = set()
+        self._user_sinks: 'OrderedDict[str, NotificationSink]' = OrderedDict()
+        self._retired: List[asyncio.Queue] = []
+        self.on_undelivered: Optional[Callable[[Dict[str, Any]], None]] = None
+
+    @classmethod
+    def from_env(cls) -> 'NotificationFanout':
+        return cls(load_sinks_from_env())
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def close(self):
+        """Flush queued alerts (each is bounded by its sink's timeout), then clean up resources"""
+        queues = list(self._queues.values()) + self._retired
+        if queues:
+            await asyncio.gather(*(queue.join() for queue in queues))
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers.clear()
+        self._queues.clear()
+        self._retired.clear()
+        self._user_sinks.clear()
+        if self.session and not self.session.closed:
+            await self.session.close()
+
+    def render_all(self, alert: Dict[str, Any], sinks: Optional[List[NotificationSink]] = None) -> Dict[str, Any]:
+        """Render the alert once per sink kind"""
+        rendered: Dict[str, Any] = {}
+        for sink in self.sinks if sinks is None else sinks:
+            if sink.kind not in rendered:
+                rendered[sink.kind] = sink.render(alert)
+        return rendered
+
+    def _queue_for(self, sink: NotificationSink) -> asyncio.Queue:
+        queue = self._queues.get(sink)
+        if queue is None:
+            queue = self._queues[sink] = asyncio.Queue()
+            self._workers.append(asyncio.create_task(self._worker(sink, queue), name=f"sink-{sink.name}"))
+        return queue
+
+    async def _worker(self, sink: NotificationSink, queue: asyncio.Queue) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await queue.get()
+            if item is None:
+                # Retired (an evicted user sink): its backlog is done
+                queue.task_done()
+                self._retired.remove(queue)
+                self._workers.remove(asyncio.current_task())
+                return
+            payload, deadline, result = item
+            try:
+                await asyncio.wait_for(sink.semaphore.acquire(), max(0.0, deadline - loop.time()))
+            except asyncio.TimeoutError:
+                logger.error("Sink %s had no free slot within %ss; dropping alert", sink.name, sink.timeout)
+                WEBHOOK_SECONDS.labels(sink.name, 'expired').observe(sink.timeout)
+                if not result.done():
+                    result.set_result(False)
+                queue.task_done()
+                continue
+            delivery = asyncio.create_task(self._deliver(sink, payload, deadline, result, queue))
+            self._deliveries.add(delivery)
+            delivery.add_done_callback(self._deliveries.discard)
+
+    async def _deliver(self, sink: NotificationSink, payload: Any, deadline: float, result: asyncio.Future, queue: asyncio.Queue) -> None:
+        """Run one delivery in a slot the worker already acquired"""
+        started = time.perf_counter()
+        outcome = 'error'
+        delivered = False
+        attempt = asyncio.ensure_future(sink.deliver(payload, self.session))
+        try:
+            delivered = await asyncio.wait_for(asyncio.shield(attempt), max(0.0, deadline - asyncio.get_running_loop().time()))
+            outcome = 'ok' if delivered else 'rejected'
+        except asyncio.TimeoutError:
+            outcome = 'timeout'
+            attempt.cancel()
+            logger.error("Sink %s timed out after %ss", sink.name, sink.timeout)
+        except Exception as e:
+            logger.error("Sink %s failed: %s", sink.name, e)
+        finally:
+            WEBHOOK_SECONDS.labels(sink.name, outcome).observe(time.perf_counter() - started)
+            # The slot is only free once the attempt has really stopped (see SmtpSink.deliver)
+            if attempt.done():
+                sink.semaphore.release()
+            else:
+                attempt.add_done_callback(lambda _: sink.semaphore.release())
+            if not result.done():
+                result.set_result(bool(delivered))
+            queue.task_done()
+
+    def enqueue_alert(
+        self,
+        product_name: str,
+        old_price: float,
+        new_price: float,
+        url: str,
+        retailer: str,
+        force: bool = False
+    ) -> List[asyncio.Future]:
+        """Queue a price drop alert on every sink; one future per sink resolves to whether it delivered
+
+        force skips the global MIN_DROP_PERCENTAGE check, e.g. when a user
+        subscription with its own threshold matched.
+        """
+        if not self.sinks:
+            logger.warning("No notification sinks configured")
+            return []
+
+        alert = build_alert(product_name, old_price, new_price, url, retailer)
+        if not force and alert['drop_pct'] < self.min_drop:
+            logger.info("Price drop %.1f%% below threshold %s%%", alert['drop_pct'], self.min_drop)
+            return []
+
+        return self._enqueue(alert, self.sinks)
+
+    def _enqueue(self, alert: Dict[str, Any], sinks: List[NotificationSink]) -> List[asyncio.Future]:
+        rendered = self.render_all(alert, sinks)
+
+        if not self.session or self.session.closed:
+            self.session = aiohttp.ClientSession()
+
+        loop = asyncio.get_running_loop()
+        results = []
+        for sink in sinks:
+            result = loop.create_future()
+            self._queue_for(sink).put_nowait((rendered[sink.kind], loop.time() + sink.timeout, result))
+            results.append(result)
+        if self.on_undelivered and results:
+            self._watch(alert, results)
+        return results
+
+    def _watch(self, alert: Dict[str, Any], results: List[asyncio.Future]) -> None:
+        """Call on_undelivered(alert) once every sink's result is in and none delivered"""
+        pending = [len(results)]
+
+        def settled(_):
+            pending[0] -= 1
+            if pending[0] or any(not result.cancelled() and result.result() for result in results):
+                return
+            try:
+                self.on_undelivered(alert)
+            except Exception as e:
+                logger.error("on_undelivered hook failed: %s", e)
+
+        for result in results:
+            result.add_done_callback(settled)
+
+    def _user_sink(self, destination: str) -> NotificationSink:
+        sink = self._user_sinks.get(destination)
+        if sink is not None:
+            self._user_sinks.move_to_end(destination)
+            return sink
+        sink = self._user_sinks[destination] = sink_for_destination(destination, name='user')  # One label, not one per user
+        while len(self._user_sinks) > MAX_USER_SINKS:
+            _, evicted = self._user_sinks.popitem(last=False)
+            self._retire(evicted)
+        return sink
+
+    def _retire(self, sink: NotificationSink) -> None:
+        """Stop an evicted sink's worker once it has delivered what is already queued"""
+        queue = self._queues.pop(sink, None)
+        if queue is not None:
+            queue.put_nowait(None)
+            self._retired.append(queue)
+
+    @traced()
+    async def send_user_alert(
+        self,
+        subscription: Any,
+        product_name: str,
+        old_price: float,
+        new_price: float,
+        url: str,
+        retailer: str
+    ) -> bool:
+        """Queue an alert for one matched subscription on its user's own webhook
+
+        The subscription already decided the drop is worth reporting, so the
+        global MIN_DROP_PERCENTAGE doesn't apply. Without a webhook_url the
+        alert goes to the shared sinks.
+        """
+        alert = build_alert(product_name, old_price, new_price, url, retailer)
+        alert['user_id'] = subscription.user_id
+        alert['subscription_id'] = subscription.subscription_id
+        sinks = [self._user_sink(subscription.webhook_url)] if subscription.webhook_url else self.sinks
+        if not sinks:
+            logger.warning("No destination for subscription %s", subscription.subscription_id)
+            return False
+        return bool(self._enqueue(alert, sinks))
+
+    @traced()
+    async def send_alert(
+        self,
+        product_name: str,
+        old_price: float,
+        new_price: float,
+        url: str,
+        retailer: str,
+        force: bool = False
+    ) -> bool:
+        """Queue an alert for every sink and return at once; True if it was queued"""
+        return bool(self.enqueue_alert(product_name, old_price, new_price, url, retailer, force))
+
+    async def deliver_alert(
+        self,
+        product_name: str,
+        old_price: float,
+        new_price: float,
+        url: str,
+        retailer: str,
+        force: bool = False
+    ) -> bool:
+        """Like send_alert, but wait for the sinks; True if at least one delivered"""
+        results = await asyncio.gather(*self.enqueue_alert(product_name, old_price, new_price, url, retailer, force))
+        delivered = sum(1 for ok in results if ok)
+        if results:
+            logger.info("Alert for %s delivered to %s/%s sinks", product_name, delivered, len(self.sinks))
+        return delivered > 0
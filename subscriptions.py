@@ -0,0 +1,145 @@
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+import logging
+from operator import itemgetter
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class SubscriptionEntry(NamedTuple):
+    subscription_id: str
+    user_id: str
+    product_url: str
+    target_price: Optional[float] = None
+    drop_percentage: Optional[float] = None
+    webhook_url: Optional[str] = None  # The user's own alert destination; None = the shared sinks
+
+    @classmethod
+    def from_row(cls, row: Any) -> 'SubscriptionEntry':
+        """Build an entry from a db_d.Subscription row (or anything with the same attributes)"""
+        return cls(
+            subscription_id=str(row.subscription_id),
+            user_id=row.user_id,
+            product_url=row.product_url,
+            target_price=row.target_price,
+            drop_percentage=row.drop_percentage,
+            webhook_url=getattr(row, 'webhook_url', None)
+        )
+
+
+class _SortedIndex:
+    """Thresholds for one product kept sorted, with entries in a parallel list"""
+
+    __slots__ = ('keys', 'entries')
+
+    def __init__(self):
+        self.keys: List[float] = []
+        self.entries: List[SubscriptionEntry] = []
+
+    def insert(self, key: float, entry: SubscriptionEntry) -> None:
+        i = bisect_right(self.keys, key)
+        self.keys.insert(i, key)
+        self.entries.insert(i, entry)
+
+    def remove(self, key: float, subscription_id: str) -> bool:
+        lo, hi = bisect_left(self.keys, key), bisect_right(self.keys, key)
+        for i in range(lo, hi):
+            if self.entries[i].subscription_id == subscription_id:
+                del self.keys[i]
+                del self.entries[i]
+                return True
+        return False
+
+    def sort(self) -> None:
+        pairs = sorted(zip(self.keys, self.entries), key=itemgetter(0))
+        self.keys = [key for key, _ in pairs]
+        self.entries = [entry for _, entry in pairs]
+
+
+class SubscriptionMatcher:
+    """Per-product threshold index over user subscriptions
+
+    Target-price subscriptions fire when a price moves from above the target
+    to at or below it; drop-percentage subscriptions fire when a single change
+    drops the price by at least that percentage. Both are answered with bisect
+    range lookups, so a price change only touches the subscriptions it crosses.
+    """
+
+    def __init__(self):
+        self._targets: Dict[str, _SortedIndex] = defaultdict(_SortedIndex)
+        self._drops: Dict[str, _SortedIndex] = defaultdict(_SortedIndex)
+        self._by_id: Dict[str, SubscriptionEntry] = {}
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def add(self, entry: SubscriptionEntry) -> None:
+        if entry.subscription_id in self._by_id:
+            self.remove(entry.subscription_id)
+        self._by_id[entry.subscription_id] = entry
+        if entry.target_price is not None:
+            self._targets[entry.product_url].insert(float(entry.target_price), entry)
+        if entry.drop_percentage is not None:
+            self._drops[entry.product_url].insert(float(entry.drop_percentage), entry)
+
+    def load(self, entries: Iterable[Any]) -> None:
+        """Bulk-load entries (or ORM rows), sorting each product index once at the end"""
+        touched = set()
+        for entry in entries:
+            if not isinstance(entry, SubscriptionEntry):
+                entry = SubscriptionEntry.from_row(entry)
+            if entry.subscription_id in self._by_id:
+                self.remove(entry.subscription_id)
+            self._by_id[entry.subscription_id] = entry
+            if entry.target_price is not None:
+                index = self._targets[entry.product_url]
+                index.keys.append(float(entry.target_price))
+                index.entries.append(entry)
+                touched.add((True, entry.product_url))
+            if entry.drop_percentage is not None:
+                index = self._drops[entry.product_url]
+                index.keys.append(float(entry.drop_percentage))
+                index.entries.append(entry)
+                touched.add((False, entry.product_url))
+
+        for is_target, url in touched:
+            (self._targets if is_target else self._drops)[url].sort()
+        logger.info("Loaded %s subscriptions", len(self._by_id))
+
+    def remove(self, subscription_id: str) -> bool:
+        entry = self._by_id.pop(subscription_id, None)
+        if not entry:
+            return False
+        if entry.target_price is not None:
+            self._targets[entry.product_url].remove(float(entry.target_price), subscription_id)
+        if entry.drop_percentage is not None:
+            self._drops[entry.product_url].remove(float(entry.drop_percentage), subscription_id)
+        return True
+
+    def interest(self, product_url: str) -> int:
+        """Number of subscriptions watching a product"""
+        targets = self._targets.get(product_url)
+        drops = self._drops.get(product_url)
+        return (len(targets.keys) if targets else 0) + (len(drops.keys) if drops else 0)
+
+    def match(self, product_url: str, old_price: Optional[float], new_price: float) -> List[SubscriptionEntry]:
+        """Return the subscriptions crossed by a price change from old_price to new_price"""
+        if new_price is None or (old_price is not None and new_price >= old_price):
+            return []
+
+        matched: List[SubscriptionEntry] = []
+
+        targets = self._targets.get(product_url)
+        if targets and targets.keys:
+            # Targets in [new_price, old_price) were not met at the old price but are now
+            lo = bisect_left(targets.keys, new_price)
+            hi = bisect_left(targets.keys, old_price) if old_price is not None else len(targets.keys)
+            matched.extend(targets.entries[lo:hi])
+
+        drops = self._drops.get(product_url)
+        if drops and drops.keys and old_price:
+            drop_pct = (old_price - new_price) / old_price * 100
+            matched.extend(drops.entries[:bisect_right(drops.keys, drop_pct)])
+
+        return matched
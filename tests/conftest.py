@@ -0,0 +1,10 @@
+import os
+import sys
+import tempfile
+
+# Modules live at the repository root; make them importable when pytest is run as `pytest tests/`
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# db_d builds its engine from POSTGRES_URL on first use; fall back to a throwaway SQLite file when no Postgres is
+# configured (a file rather than :memory: so worker threads share the same database)
+os.environ.setdefault("POSTGRES_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'prices.db')}")
@@ -0,0 +1,79 @@
+import asyncio
+import json
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+pytest.importorskip("selenium")
+pytest.importorskip("aiohttp")
+
+import db_d
+from benchmarks import e2e
+from benchmarks.fake_retailer import format_inr
+
+
+@pytest.fixture
+def empty_products(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)  # Keep checkpoint and scheduler state out of the repo
+    db_d.Base.metadata.create_all(db_d.engine)
+    db = next(db_d.get_db())
+    db.query(db_d.Product).delete()
+    db.commit()
+    yield db
+    db.query(db_d.Product).delete()
+    db.commit()
+    db.close()
+
+
+def test_indian_digit_grouping():
+    assert format_inr(999) == "999"
+    assert format_inr(12999) == "12,999"
+    assert format_inr(12345678) == "1,23,45,678"
+
+
+def test_e2e_cycle_against_fake_site(empty_products):
+    result = asyncio.run(e2e.run_cycle(30, change_ratio=0.5))
+
+    assert result['checked'] == result['pages'] == 30 and result['failed'] == 0
+    assert 0 < result['price_changes'] < 30
+    assert result['db_commits'] >= 30
+    # The benchmark's limiter and scraper swaps are undone afterwards
+    import check_prices
+    from scrap_f import scrape_product_data
+    assert check_prices.scrape_product_data is scrape_product_data
+
+
+def test_seeding_refuses_a_database_with_products(empty_products):
+    from benchmarks.fixtures import seed_products
+
+    seed_products(empty_products, ["https://www.croma.com/p/1"])
+    with pytest.raises(ValueError):
+        seed_products(empty_products, ["https://www.croma.com/p/2"])
+
+
+def test_baseline_round_trip(tmp_path):
+    path = str(tmp_path / "baselines" / "e2e.json")
+    old = {'scraper': 'http', 'products': 100, 'cycle_s': 1.0, 'pages_per_s': 100.0,
+           'db_writes_per_s': 100.0, 'peak_rss_mb': 80.0}
+    e2e.save_baseline(path, [old], {'latency': 0.0})
+    with open(path, encoding='utf-8') as f:
+        baseline = json.load(f)
+
+    (line,) = e2e.compare([dict(old, cycle_s=1.5)], baseline)
+    assert "cycle_s 1.0 -> 1.5 (+50.0%)" in line
+    assert e2e.compare([dict(old, products=1000)], baseline) == ["http-1000: no baseline"]
+
+
+def test_micro_benchmarks_run_and_flag_regressions(empty_products):
+    from benchmarks import micro
+
+    results = micro.run(corpus_size=50, repeat=2, min_time=0, history_lengths=(5,), insert_rows=5)
+    names = [result['name'] for result in results]
+    assert 'extract_price[scrap_f]' in names and 'clean_url[product_urls]' in names
+    assert {'history_append[5]', 'insert_single', 'insert_bulk'} <= set(names)
+    assert all(result['median_us'] > 0 for result in results)
+    assert empty_products.query(db_d.Product).count() == 0  # Benchmark rows are cleaned up
+
+    baseline = {'results': {result['name']: dict(result, median_us=result['median_us'] / 2) for result in results}}
+    assert all(row['regressed'] for row in micro.compare(results, baseline, threshold=0.25))
+    assert not any(row['regressed'] for row in micro.compare(results, baseline, threshold=1.5))
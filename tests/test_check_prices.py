@@ -0,0 +1,185 @@
+import asyncio
+import uuid
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+pytest.importorskip("selenium")
+
+import check_prices
+import db_d
+
+
+class FakeDriver:
+    current_url = 'about:blank'
+
+    def quit(self):
+        pass
+
+
+class FakeNotifier:
+    def __init__(self, scraped):
+        self.scraped = scraped
+        self.alerts = []
+
+    async def send_alert(self, product_name, old_price, new_price, url, retailer, force=False):
+        # Remember how many products had been scraped when this alert went out
+        self.alerts.append((url, len(self.scraped)))
+        return True
+
+    async def send_user_alert(self, subscription, product_name, old_price, new_price, url, retailer):
+        self.alerts.append((subscription.user_id, subscription.webhook_url))
+        return True
+
+    async def close(self):
+        pass
+
+
+@pytest.fixture
+def catalogue(monkeypatch, tmp_path):
+    """Five products priced 10000 whose next scrape shows a 20% drop"""
+    monkeypatch.chdir(tmp_path)  # Keep cycle checkpoints out of the repo
+    monkeypatch.setattr(check_prices, 'init_driver', lambda headless=True: FakeDriver())
+    db_d.Base.metadata.create_all(db_d.engine)
+    db = next(db_d.get_db())
+    urls = [f"https://www.croma.com/p/{uuid.uuid4().hex}" for _ in range(5)]
+    for url in urls:
+        db_d.add_product_to_db(db, url, "croma", {"value": 10000}, [{"value": 10000, "timestamp": "t0"}])
+    db.close()
+    return urls
+
+
+def make_monitor(monkeypatch, urls, scraped, on_scrape=None):
+    def fake_scrape_url(driver, url, deadline=None):
+        scraped.append(url)
+        if on_scrape:
+            on_scrape(url)
+        if url in urls:
+            return {'price': 8000.0, 'name': 'Phone', 'retailer': 'croma'}
+        return {'price': None, 'error': 'not part of this test'}
+
+    monkeypatch.setattr(check_prices, 'scrape_url', fake_scrape_url)
+    monitor = check_prices.PriceMonitor()
+    monitor.notifier = FakeNotifier(scraped)
+    return monitor
+
+
+def test_alerts_fire_after_each_scrape_not_at_cycle_end(monkeypatch, catalogue):
+    scraped = []
+    monitor = make_monitor(monkeypatch, catalogue, scraped)
+
+    async def run():
+        async with monitor:
+            for url in catalogue:
+                await monitor.check_product(url)
+
+    asyncio.run(run())
+    assert monitor.notifier.alerts == [(url, i + 1) for i, url in enumerate(catalogue)]
+
+
+def test_sigterm_stops_real_cycle_between_blocking_scrapes(monkeypatch, catalogue):
+    import os
+    import signal
+    import time
+    from daemon import PriceDaemon
+
+    scraped = []
+
+    def blocking_scrape(url):
+        if len(scraped) == 2:
+            os.kill(os.getpid(), signal.SIGTERM)
+        time.sleep(0.05)  # Selenium blocks like this; the loop must still see the signal
+
+    real_monitor = check_prices.PriceMonitor
+
+    def monitor_factory():
+        monkeypatch.setattr(check_prices, 'PriceMonitor', real_monitor)
+        return make_monitor(monkeypatch, catalogue, scraped, on_scrape=blocking_scrape)
+
+    monkeypatch.setattr(check_prices, 'PriceMonitor', monitor_factory)
+    daemon = PriceDaemon(interval=0)
+    asyncio.run(asyncio.wait_for(daemon.run(), 30))
+
+    with db_d.SessionLocal() as db:
+        total = db.query(db_d.Product).count()
+    assert daemon.cycles == 1
+    # The scrape in flight when SIGTERM arrived finished; the rest of the cycle did not start
+    assert 2 <= len(scraped) <= 3 < total
+    assert daemon.monitor.closed
+
+
+def test_subscriptions_alert_their_own_users_despite_product_cooldown(monkeypatch, catalogue):
+    from datetime import datetime
+    from subscriptions import SubscriptionEntry
+
+    scraped = []
+    monitor = make_monitor(monkeypatch, catalogue, scraped)
+    url = catalogue[0]
+    monitor.subscriptions.load([
+        SubscriptionEntry("s1", "alice", url, target_price=9000, webhook_url="https://hooks.example/alice"),
+        SubscriptionEntry("s2", "bob", url, target_price=5000, webhook_url="https://hooks.example/bob"),
+    ])
+    monitor.last_alert_times[url] = datetime.now()  # The shared product alert is cooling down
+
+    async def run():
+        async with monitor:
+            await monitor.check_product(url)
+
+    asyncio.run(run())
+    # Only alice's target was crossed; the shared sinks stayed quiet
+    assert monitor.notifier.alerts == [("alice", "https://hooks.example/alice")]
+
+
+def test_imported_product_gets_first_price_without_alert(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(check_prices, 'init_driver', lambda headless=True: FakeDriver())
+    db_d.Base.metadata.create_all(db_d.engine)
+    url = f"https://www.croma.com/p/{uuid.uuid4().hex}"
+    db = next(db_d.get_db())
+    assert db_d.add_pending_products(db, [(url, 'croma')]) == 1
+    assert db_d.add_pending_products(db, [(url, 'croma')]) == 0
+    db.close()
+
+    scraped = []
+    monitor = make_monitor(monkeypatch, [url], scraped)
+
+    async def run():
+        async with monitor:
+            await monitor.check_product(url)
+
+    asyncio.run(run())
+    assert scraped == [url] and monitor.notifier.alerts == []
+    db = next(db_d.get_db())
+    product = db.query(db_d.Product).filter(db_d.Product.url == url).one()
+    assert product.latest_prices['value'] == 8000.0 and len(product.price_history) == 1
+    db.close()
+
+
+def test_undelivered_alert_lifts_the_cooldown(monkeypatch, catalogue):
+    monitor = make_monitor(monkeypatch, catalogue, [])
+    monitor.last_alert_times[catalogue[0]] = check_prices.datetime.now()
+    monitor.on_alert_undelivered({'url': catalogue[0]})
+    assert monitor.should_alert(catalogue[0])
+
+
+def test_schedule_sync_loads_only_new_urls_and_is_rate_limited(monkeypatch, catalogue):
+    monitor = make_monitor(monkeypatch, catalogue, [])
+    sessions = []
+    get_db = check_prices.get_db
+    monkeypatch.setattr(check_prices, 'get_db', lambda: sessions.append(1) or get_db())
+
+    monitor.sync_schedule()
+    assert set(catalogue) <= set(monitor.scheduler.states)
+    learned = monitor.scheduler.states[catalogue[0]]
+    learned.change_rate = 5.0
+
+    monitor.sync_schedule()  # Within SCHEDULE_SYNC_SECONDS: no database work
+    assert len(sessions) == 1
+
+    db = next(db_d.get_db())
+    db.query(db_d.Product).filter(db_d.Product.url == catalogue[1]).delete()
+    db.commit()
+    db.close()
+    monitor.sync_schedule(force=True)
+    assert catalogue[1] not in monitor.scheduler.states
+    assert monitor.scheduler.states[catalogue[0]] is learned and learned.change_rate == 5.0
@@ -0,0 +1,41 @@
+import json
+import time
+
+from checkpoint import CycleCheckpoint
+
+
+def test_resume_skips_completed_and_retries_failed(tmp_path):
+    path = str(tmp_path / 'cycle.json')
+    products = [f"p{i}" for i in range(10)]
+
+    first = CycleCheckpoint.load_or_start(path, every=3)
+    assert not first.resumed
+    for i, product_id in enumerate(products[:7]):
+        first.mark(product_id, ok=(i != 4))
+    # Crash: only the writes made every 3 products survive (p0..p5, with p4 failed)
+
+    second = CycleCheckpoint.load_or_start(path, every=3)
+    assert second.resumed and second.cycle_id == first.cycle_id
+    assert second.failed == {'p4'}
+    assert second.pending(products) == ['p4', 'p6', 'p7', 'p8', 'p9']
+
+    for product_id in second.pending(products):
+        second.mark(product_id, ok=True)
+    second.finish()
+    assert not (tmp_path / 'cycle.json').exists()
+    assert not CycleCheckpoint.load_or_start(path).resumed
+
+
+def test_stale_or_corrupt_checkpoint_starts_new_cycle(tmp_path):
+    path = tmp_path / 'cycle.json'
+    path.write_text(json.dumps({'cycle_id': 'old', 'started_at': time.time() - 48 * 3600, 'completed': ['p1']}))
+    assert not CycleCheckpoint.load_or_start(str(path), max_age_hours=12).resumed
+
+    path.write_text('{"cycle_id": "trunc')
+    checkpoint = CycleCheckpoint.load_or_start(str(path))
+    assert not checkpoint.resumed and not checkpoint.completed
+
+    checkpoint.mark('p1', ok=True)
+    checkpoint.save()
+    assert json.loads(path.read_text())['completed'] == ['p1']
+    assert not (tmp_path / 'cycle.json.tmp').exists()
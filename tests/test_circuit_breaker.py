@@ -0,0 +1,98 @@
+import pytest
+
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, BreakerRegistry, CircuitBreaker
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_breaker(clock):
+    return CircuitBreaker('croma', failure_rate=0.5, window=10, min_calls=4, open_seconds=60, clock=clock)
+
+
+def test_opens_on_failure_rate_and_short_circuits():
+    clock = FakeClock()
+    breaker = make_breaker(clock)
+    for success in (True, False, False):
+        assert breaker.allow()
+        breaker.record(success)
+    assert breaker.state == CLOSED  # Below min_calls
+
+    assert breaker.allow()
+    breaker.record(False)
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    assert breaker.retry_in() == 60
+    assert breaker.snapshot()['short_circuited'] == 1
+
+
+def test_half_open_probe_closes_or_reopens():
+    clock = FakeClock()
+    breaker = make_breaker(clock)
+    for _ in range(4):
+        breaker.allow()
+        breaker.record(False)
+    assert breaker.state == OPEN
+
+    clock.now += 60
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()  # Only one probe at a time
+    breaker.record(False)
+    assert breaker.state == OPEN and breaker.retry_in() == 60
+
+    clock.now += 60
+    assert breaker.allow()
+    breaker.record(True)
+    assert breaker.state == CLOSED
+    assert breaker.allow()
+
+
+def test_registry_keys_on_retailer_field():
+    registry = BreakerRegistry(min_calls=1)
+    assert registry.get('Croma') is registry.for_url('https://www.croma.com/p/123')
+    assert registry.get(None).name == 'other'
+    registry.get('croma').record(False)
+    assert registry.snapshot()['croma']['state'] == OPEN
+
+
+def test_cancelled_probe_neither_closes_nor_reopens():
+    clock = FakeClock()
+    breaker = make_breaker(clock)
+    for _ in range(4):
+        breaker.allow()
+        breaker.record(False)
+    clock.now += 60
+
+    assert breaker.allow()
+    breaker.cancel()  # e.g. the rate limiter slot never came
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow()  # The probe slot is free again
+    breaker.record(False)
+    assert breaker.state == OPEN
+
+
+def test_scrape_url_limiter_timeout_does_not_close_half_open_circuit(monkeypatch):
+    pytest.importorskip("selenium")
+    import check_prices
+    from deadline import Deadline
+    from rate_limit import LimiterRegistry
+
+    clock = FakeClock()
+    registry = BreakerRegistry(min_calls=1, open_seconds=60, clock=clock)
+    registry.get('croma').record(False)
+    clock.now += 60
+    limiters = LimiterRegistry()
+    busy = limiters.get('croma')
+    assert busy.acquire(0)  # Only slot is taken
+    monkeypatch.setattr(check_prices, 'breakers', registry)
+    monkeypatch.setattr(check_prices, 'limiters', limiters)
+
+    result = check_prices.scrape_url(None, 'https://www.croma.com/p/1', Deadline(0.05))
+    assert result['timed_out']
+    assert registry.get('croma').state == HALF_OPEN
@@ -0,0 +1,71 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ('selenium', 'sqlalchemy', 'aiohttp', 'numpy')
+CLI_IMPORT_BUDGET_US = 100_000  # `import cli` measures ~35ms; the old import-everything start took seconds
+
+
+def run_python(code, *options, env=None):
+    return subprocess.run(
+        [sys.executable, *options, '-c', code],
+        cwd=ROOT, capture_output=True, text=True, check=True, timeout=60, env=env or dict(os.environ)
+    )
+
+
+def import_times(code):
+    """Cumulative microseconds per module from `python -X importtime`"""
+    times = {}
+    for line in run_python(code, '-X', 'importtime').stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def top_level_modules(code):
+    output = run_python(code + "\nimport sys; print(' '.join(sys.modules))").stdout
+    return {name.split('.')[0] for name in output.splitlines()[-1].split()}
+
+
+def test_cli_import_budget():
+    times = import_times("import cli; cli.build_parser()")
+    assert not [name for name in times if name.split('.')[0] in HEAVY_MODULES]
+    assert times['cli'] < CLI_IMPORT_BUDGET_US
+
+
+def test_db_d_import_does_not_connect():
+    env = {key: value for key, value in os.environ.items() if key != 'POSTGRES_URL'}
+    output = run_python("import db_d; print(db_d._engine)", env=env).stdout
+    assert output.strip() == "None"
+
+
+def test_light_commands_only_import_what_they_use():
+    pytest.importorskip("sqlalchemy")
+    import db_d
+    db_d.Base.metadata.create_all(db_d.engine)
+
+    products = top_level_modules("import cli; cli.main(['products', '--limit', '1'])")
+    assert 'sqlalchemy' in products
+    assert not {'selenium', 'aiohttp'} & products
+
+    alert = top_level_modules("import cli; cli.main(['--log-level', 'CRITICAL', 'test-alert'])")
+    assert not {'selenium', 'sqlalchemy'} & alert
+
+
+def test_forwarded_command_gets_its_own_help():
+    result = subprocess.run([sys.executable, 'cli.py', 'rules', '--help'], cwd=ROOT, capture_output=True, text=True,
+                            timeout=60)
+    assert result.returncode == 0
+    assert '--backtest' in result.stdout
+
+
+def test_global_options_after_the_command_are_rejected():
+    result = subprocess.run([sys.executable, 'cli.py', 'check', '--log-level', 'DEBUG'], cwd=ROOT,
+                            capture_output=True, text=True, timeout=60)
+    assert result.returncode == 2
+    assert '--log-level must come before the command' in result.stderr
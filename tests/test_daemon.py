@@ -0,0 +1,77 @@
+import asyncio
+import os
+import signal
+
+import check_prices
+from daemon import PriceDaemon
+
+
+class FakeDriver:
+    def __init__(self):
+        self.quit_called = False
+
+    @property
+    def current_url(self):
+        return 'about:blank'
+
+    def quit(self):
+        self.quit_called = True
+
+
+class FakeMonitor:
+    instances = []
+
+    def __init__(self):
+        self.driver = FakeDriver()
+        self.timed_out = ['stale']
+        self.skipped = {'stale': 1.0}
+        self.stop_requested = False
+        self.checked = []
+        self.closed = False
+        FakeMonitor.instances.append(self)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.closed = True
+        self.driver.quit()
+
+    def request_stop(self):
+        self.stop_requested = True
+
+    async def check_all_products(self):
+        assert not self.timed_out and not self.skipped  # Per-cycle state reset by the daemon
+        for i in range(5):
+            if self.stop_requested:
+                break
+            if i == 1 and len(self.checked) == 1:
+                os.kill(os.getpid(), signal.SIGTERM)
+            self.checked.append(i)
+            await asyncio.sleep(0.01)
+
+
+def test_sigterm_drains_current_cycle_and_closes(monkeypatch):
+    monkeypatch.setattr(check_prices, 'PriceMonitor', FakeMonitor)
+    daemon = PriceDaemon(interval=0.01)
+    asyncio.run(daemon.run())
+
+    monitor = FakeMonitor.instances[-1]
+    # The product in flight when the signal arrived finished; nothing after it started
+    assert monitor.checked == [0, 1]
+    assert daemon.cycles == 1
+    assert monitor.closed and monitor.driver.quit_called
+
+
+def test_runs_cycles_on_one_warm_monitor(monkeypatch):
+    monkeypatch.setattr(check_prices, 'PriceMonitor', FakeMonitor)
+    FakeMonitor.instances.clear()
+
+    async def check_all_products(self):
+        self.checked.append(len(self.checked))
+
+    monkeypatch.setattr(FakeMonitor, 'check_all_products', check_all_products)
+    daemon = PriceDaemon(interval=0, max_cycles=3)
+    asyncio.run(daemon.run())
+    assert len(FakeMonitor.instances) == 1
+    assert FakeMonitor.instances[0].checked == [0, 1, 2]
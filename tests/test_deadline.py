@@ -0,0 +1,85 @@
+import time
+
+import pytest
+
+from deadline import Deadline, DeadlineExceeded, wait_timeout
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_child_deadline_is_capped_by_parent():
+    clock = FakeClock()
+    cycle = Deadline(10, clock=clock)
+    product = cycle.child(45)
+    assert product.remaining() == 10
+    assert wait_timeout(product, 15) == 10
+    assert wait_timeout(None, 15) == 15
+
+    clock.now += 10
+    assert product.expired
+    with pytest.raises(DeadlineExceeded):
+        wait_timeout(product, 5)
+
+
+def test_scraper_aborts_slow_page_load_within_budget():
+    pytest.importorskip("selenium")
+    from selenium.common.exceptions import NoSuchElementException, TimeoutException
+
+    from scrap_f import scrape_product_data
+
+    class StuckDriver:
+        def __init__(self):
+            self.scripts = []
+
+        def set_page_load_timeout(self, seconds):
+            self.page_load_timeout = seconds
+
+        def implicitly_wait(self, seconds):
+            pass
+
+        def get(self, url):
+            time.sleep(self.page_load_timeout)
+            raise TimeoutException("page load")
+
+        def execute_script(self, script):
+            self.scripts.append(script)
+
+        def find_element(self, *args):
+            raise NoSuchElementException("missing")
+
+    driver = StuckDriver()
+    started = time.monotonic()
+    result = scrape_product_data(driver, croma_url="https://www.croma.com/p/1", deadline=Deadline(1.2))
+    assert time.monotonic() - started < 3
+    assert driver.scripts == ["window.stop();"]
+    assert result['timed_out'] and not result['price']
+
+
+def test_load_page_restores_driver_timeouts_for_the_next_product():
+    pytest.importorskip("selenium")
+    from scrap_f import IMPLICIT_WAIT, PAGE_LOAD_TIMEOUT, load_page
+
+    class RecordingDriver:
+        def set_page_load_timeout(self, seconds):
+            self.page_load_timeout = seconds
+
+        def implicitly_wait(self, seconds):
+            self.implicit_wait = seconds
+
+        def get(self, url):
+            self.loaded_with = self.page_load_timeout
+
+    driver = RecordingDriver()
+    driver.set_page_load_timeout(PAGE_LOAD_TIMEOUT)
+    load_page(driver, "https://www.croma.com/p/1", Deadline(2))
+    assert driver.loaded_with <= 2 and driver.page_load_timeout == PAGE_LOAD_TIMEOUT
+    assert driver.implicit_wait <= 2
+
+    load_page(driver, "https://www.croma.com/p/2")
+    assert driver.loaded_with == PAGE_LOAD_TIMEOUT and driver.implicit_wait == IMPLICIT_WAIT
@@ -0,0 +1,42 @@
+from types import SimpleNamespace
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from drop_rules import detect_drops, evaluate, history_arrays
+
+
+def test_detect_drops_matches_scalar_rule():
+    previous = [10000, 10000, 1000, 10000, None]
+    current = [9000, 9800, 500, 9400, 5000]
+    # 10% & 1000; 2% only; 50% but only 500 abs -> ok; 6% & 600; missing previous
+    assert detect_drops(previous, current).tolist() == [0, 2, 3]
+
+
+def test_overrides_and_all_time_low():
+    previous = [10000, 10000]
+    current = [9000, 9000]
+    retailers = ["croma", "amazon"]
+    hits = detect_drops(previous, current, retailers=retailers,
+                        retailer_overrides={"croma": {"pct": 0.2}})
+    assert hits.tolist() == [1]
+
+    hits = detect_drops(previous, current, all_time_low=[8500, 9500], require_all_time_low=True)
+    assert hits.tolist() == [1]
+
+
+def test_backtest_over_history():
+    product = SimpleNamespace(url="u", retailer="amazon", price_history=[
+        {"value": 10000, "timestamp": "t0"},
+        {"value": 8000, "timestamp": "t1"},
+        {"value": 9000, "timestamp": "t2"},
+        {"value": 8500, "timestamp": "t3"},
+    ])
+    arrays = history_arrays([product])
+    assert arrays['all_time_low'].tolist() == [10000, 8000, 8000]
+
+    hits = evaluate(arrays)
+    assert [h['timestamp'] for h in hits] == ["t1", "t3"]
+    assert evaluate(arrays, require_all_time_low=True)[0]['timestamp'] == "t1"
+    assert len(evaluate(arrays, require_all_time_low=True)) == 1
@@ -0,0 +1,73 @@
+import asyncio
+import uuid
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+
+from events import EventBus, PriceChangeEvent, PriceChangeStats, bus
+
+
+def make(old, new, retailer="amazon"):
+    return PriceChangeEvent("id", "https://www.amazon.in/dp/X", retailer, old, new, "2024-01-01 00:00:00")
+
+
+def test_bus_runs_sync_and_async_handlers_and_isolates_failures():
+    event_bus = EventBus()
+    seen = []
+
+    def broken(event):
+        raise RuntimeError("boom")
+
+    async def async_handler(event):
+        seen.append(("async", event.new_value))
+
+    event_bus.subscribe(broken)
+    event_bus.subscribe(lambda event: seen.append(("sync", event.new_value)))
+    event_bus.subscribe(async_handler)
+
+    async def run():
+        event_bus.publish(make(100, 90))
+        await event_bus.drain()
+
+    asyncio.run(run())
+    assert seen == [("sync", 90), ("async", 90)]
+
+
+def test_stats_and_json_round_trip():
+    stats = PriceChangeStats()
+    for event in (make(None, 100), make(100, 90), make(90, 95), make(100, 80, "croma")):
+        stats(PriceChangeEvent.from_json(event.to_json()))
+    assert stats.summary() == {
+        "amazon": {"changes": 3, "drops": 1, "rises": 1, "new": 1},
+        "croma": {"changes": 1, "drops": 1, "rises": 0, "new": 0},
+    }
+
+
+def test_db_updates_publish_events():
+    import db_d
+
+    db_d.Base.metadata.create_all(db_d.engine)
+    db = next(db_d.get_db())
+    url = f"https://www.amazon.in/dp/{uuid.uuid4().hex[:10]}"
+    events = []
+    bus.subscribe(events.append)
+    try:
+        db_d.add_product_to_db(db, url, "amazon", {"value": 1000}, [{"value": 1000, "timestamp": "t0"}])
+        db_d.update_product_prices(db, url, {"value": 900})
+        db_d.update_product_prices(db, url, {"value": 900})
+    finally:
+        bus.unsubscribe(events.append)
+        db.close()
+
+    assert [(e.url, e.old_value, e.new_value) for e in events] == [(url, None, 1000), (url, 1000, 900)]
+
+
+def test_product_versions_invalidate_on_every_change():
+    from events import versions
+
+    before_generation = versions.generation
+    before = versions.version("id")
+    bus.publish(make(100, 90))
+    assert versions.version("id") == before + 1
+    assert versions.generation == before_generation + 1
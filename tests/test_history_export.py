@@ -0,0 +1,59 @@
+import csv
+import gzip
+import io
+import json
+import uuid
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+
+import db_d
+from history_export import export_history, main, parse_bound
+
+
+@pytest.fixture
+def histories():
+    db_d.Base.metadata.create_all(db_d.engine)
+    db = next(db_d.get_db())
+    tag = uuid.uuid4().hex
+    urls = [f"https://www.croma.com/p/{tag}-1", f"https://www.amazon.in/dp/{tag}"]
+    for url, retailer in zip(urls, ('croma', 'amazon')):
+        history = [{'value': 1000.0 - day, 'currency': 'INR', 'timestamp': f"2026-03-0{day} 10:00:00"}
+                   for day in range(1, 6)]
+        db_d.add_product_to_db(db, url, retailer, history[-1], history)
+    yield db, urls
+    db.query(db_d.Product).filter(db_d.Product.url.in_(urls)).delete(synchronize_session=False)
+    db.commit()
+    db.close()
+
+
+def test_parse_bound_accepts_dates_and_timestamps():
+    assert parse_bound('2026-03-02') == '2026-03-02'
+    assert parse_bound('2026-03-02 08:30:00') == '2026-03-02 08:30:00'
+    assert parse_bound(None) is None
+    with pytest.raises(ValueError):
+        parse_bound('03/02/2026')
+
+
+def test_csv_export_filters_products_and_time_range(histories):
+    db, urls = histories
+    out = io.StringIO()
+    assert export_history(db, out, 'csv', urls=urls, retailer='croma', since='2026-03-02', until='2026-03-04') == 2
+
+    rows = list(csv.DictReader(io.StringIO(out.getvalue())))
+    assert [(row['url'], row['timestamp'], row['price']) for row in rows] == [
+        (urls[0], '2026-03-02 10:00:00', '998.0'),
+        (urls[0], '2026-03-03 10:00:00', '997.0'),
+    ]
+
+
+def test_gzipped_ndjson_export_from_the_command_line(histories, tmp_path):
+    _, urls = histories
+    path = tmp_path / "history.ndjson.gz"
+    main(['--output', str(path), '--url', urls[0], '--url', urls[1], '--since', '2026-03-05'])
+
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        records = [json.loads(line) for line in f]
+    assert sorted((record['retailer'], record['price']) for record in records) == [('amazon', 995.0), ('croma', 995.0)]
+    assert all(record['currency'] == 'INR' and uuid.UUID(record['product_id']) for record in records)
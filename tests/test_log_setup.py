@@ -0,0 +1,59 @@
+import json
+import logging
+import queue
+
+import pytest
+
+import log_setup
+from log_setup import DebugSampler, DroppingQueueHandler, JsonFormatter, configure_logging, shutdown_logging
+
+
+@pytest.fixture
+def restore_root():
+    root = logging.getLogger()
+    handlers, level = list(root.handlers), root.level
+    yield
+    shutdown_logging()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    for handler in handlers:
+        root.addHandler(handler)
+    root.setLevel(level)
+
+
+def make_record(level=logging.INFO, msg="price %s", args=(42,)):
+    return logging.LogRecord("test", level, __file__, 1, msg, args, None)
+
+
+def test_full_queue_drops_instead_of_blocking():
+    handler = DroppingQueueHandler(queue.Queue(2))
+    for _ in range(5):
+        handler.handle(make_record())
+    assert handler.queue.qsize() == 2
+    assert handler.dropped == 3
+
+
+def test_debug_sampler_only_thins_debug():
+    sampler = DebugSampler(0.0)
+    assert not sampler.filter(make_record(logging.DEBUG))
+    assert sampler.filter(make_record(logging.INFO))
+    assert DebugSampler(1.0).filter(make_record(logging.DEBUG))
+
+
+def test_json_formatter_renders_args_and_tag():
+    line = JsonFormatter(tag="shard 2").format(make_record())
+    entry = json.loads(line)
+    assert entry['message'] == "price 42"
+    assert entry['level'] == 'INFO' and entry['tag'] == "shard 2"
+
+
+def test_records_reach_file_through_listener(tmp_path, restore_root):
+    log_file = tmp_path / "run.log"
+    configure_logging(level="INFO", json_format=True, log_file=str(log_file))
+    logging.getLogger("check_prices").info("Checked %s products", 3)
+    logging.getLogger("check_prices").debug("not emitted")
+    shutdown_logging()
+
+    lines = [json.loads(line) for line in log_file.read_text(encoding='utf-8').splitlines()]
+    assert [line['message'] for line in lines] == ["Checked 3 products"]
+    assert log_setup._listener is None
@@ -0,0 +1,54 @@
+import json
+import time
+import urllib.request
+
+from metrics import Registry, start_http_server
+
+
+def test_prometheus_text_and_json_snapshot():
+    registry = Registry()
+    scrapes = registry.counter('scrapes_total', "Scrapes", ('retailer', 'outcome'))
+    latency = registry.histogram('load_seconds', "Load time", ('retailer',), buckets=(0.1, 1.0))
+    gauge = registry.gauge('rate', "Rate", ('retailer',))
+    gauge.set_function(lambda: {('amazon',): 0.5})
+
+    scrapes.labels('amazon', 'ok').inc()
+    scrapes.labels('amazon', 'ok').inc(2)
+    for value in (0.05, 0.5, 3.0):
+        latency.labels('croma').observe(value)
+
+    text = registry.render_prometheus()
+    assert '# TYPE scrapes_total counter' in text
+    assert 'scrapes_total{retailer="amazon",outcome="ok"} 3' in text
+    assert 'load_seconds_bucket{retailer="croma",le="0.1"} 1' in text
+    assert 'load_seconds_bucket{retailer="croma",le="1"} 2' in text
+    assert 'load_seconds_bucket{retailer="croma",le="+Inf"} 3' in text
+    assert 'load_seconds_count{retailer="croma"} 3' in text
+    assert 'rate{retailer="amazon"} 0.5' in text
+
+    snapshot = json.loads(json.dumps(registry.snapshot()))
+    assert snapshot['metrics']['load_seconds']['samples'][0]['count'] == 3
+    assert snapshot['metrics']['scrapes_total']['samples'][0]['value'] == 3
+
+
+def test_recording_is_cheap():
+    registry = Registry()
+    child = registry.histogram('hot_seconds', "Hot loop").labels()
+    started = time.perf_counter()
+    for _ in range(100_000):
+        child.observe(0.01)
+    # Generous bound so slow CI machines pass; typically well under 1µs per observation
+    assert (time.perf_counter() - started) / 100_000 < 20e-6
+
+
+def test_http_endpoint_serves_metrics():
+    server = start_http_server(0)
+    try:
+        port = server.server_address[1]
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics") as response:
+            assert response.headers['Content-Type'].startswith('text/plain')
+            assert b'price_page_load_seconds' in response.read()
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics.json") as response:
+            assert 'metrics' in json.loads(response.read())
+    finally:
+        server.shutdown()
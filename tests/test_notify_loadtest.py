@@ -0,0 +1,27 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("aiohttp")
+
+from mock_webhook import MockWebhookServer
+from notify_loadtest import percentile, run_load
+
+
+def test_percentile_nearest_rank():
+    assert percentile([5, 1, 4, 2, 3], 50) == 3
+    assert percentile(list(range(1, 101)), 99) == 99
+    assert percentile([], 50) == 0.0
+
+
+@pytest.mark.parametrize("target", ["price_alert", "discord_notifier", "fanout"])
+def test_rate_limited_alerts_count_as_lost(target):
+    async def run():
+        async with MockWebhookServer(rate_limit_ratio=0.5, seed=3) as server:
+            report = await run_load(target, server.url, alerts=40, concurrency=8)
+            return report, server.responses
+
+    report, responses = asyncio.run(run())
+    assert report['lost'] == responses[429]
+    assert report['delivered'] == responses[204]
+    assert 0 < report['loss_rate'] < 1
@@ -0,0 +1,77 @@
+import time
+
+from page_classifier import (
+    BLOCKED, NOT_FOUND, OK, OUT_OF_STOCK, PageSnapshot, classify_page, classify_snapshot, sold_out_verdict
+)
+from rate_limit import classify_result
+
+PRODUCT_URL = 'https://www.amazon.in/dp/B0TEST'
+BIG = 250_000
+
+
+def snapshot(title='Test Phone : Amazon.in', text='Test Phone 128GB ₹12,999 Add to Cart',
+             final_url=PRODUCT_URL, size=BIG, availability='In stock'):
+    return PageSnapshot(PRODUCT_URL, final_url, title, text, size, availability)
+
+
+def test_product_page_is_ok():
+    assert classify_snapshot(snapshot()).outcome == OK
+
+
+def test_captcha_and_bot_walls_are_blocked():
+    assert classify_snapshot(snapshot(title='Robot Check')).outcome == BLOCKED
+    assert classify_snapshot(snapshot(final_url='https://www.amazon.in/errors/validateCaptcha')).outcome == BLOCKED
+    assert classify_snapshot(snapshot(title='Flipkart', text='Are you a human? Please verify')).outcome == BLOCKED
+    assert classify_snapshot(snapshot(title='503 Service Unavailable', size=300)).outcome == BLOCKED
+    # Unrecognised but suspiciously tiny pages count as walls too
+    assert classify_snapshot(snapshot(title='', text='', size=200)).outcome == BLOCKED
+
+
+def test_not_found_and_out_of_stock():
+    assert classify_snapshot(snapshot(title='Page Not Found')).outcome == NOT_FOUND
+    assert classify_snapshot(snapshot(final_url='https://www.amazon.in/')).outcome == NOT_FOUND
+    verdict = classify_snapshot(snapshot(availability='Currently unavailable.'))
+    assert verdict == (OUT_OF_STOCK, 'currently unavailable')
+    # Blocked wins when both appear
+    assert classify_snapshot(snapshot(title='Robot Check', text='Page not found')).outcome == BLOCKED
+
+
+def test_sold_out_text_outside_the_buy_box_is_not_trusted():
+    # A carousel of other products further down the page
+    page = snapshot(text='Test Phone ₹12,999 Add to Cart  Similar items: Phone X Sold Out  Phone Y Coming Soon')
+    assert classify_snapshot(page).outcome == OK
+    # ...unless the price selectors then find nothing
+    assert sold_out_verdict(page) == (OUT_OF_STOCK, 'sold out')
+    assert sold_out_verdict(snapshot()) is None
+
+
+def test_product_slugs_are_not_bot_walls():
+    url = 'https://www.amazon.in/unblocked-sim-free-phone/dp/B0TEST'
+    assert classify_snapshot(PageSnapshot(url, url, 'Phone', 'Phone ₹9,999', BIG)).outcome == OK
+
+
+def test_classify_page_uses_one_script_call_and_never_raises():
+    class FakeDriver:
+        current_url = PRODUCT_URL
+
+        def __init__(self, page):
+            self.page = page
+            self.calls = 0
+
+        def execute_script(self, script, *args):
+            self.calls += 1
+            if isinstance(self.page, Exception):
+                raise self.page
+            return self.page
+
+    driver = FakeDriver({'title': 'Robot Check', 'url': PRODUCT_URL, 'text': '', 'size': 900})
+    started = time.perf_counter()
+    assert classify_page(driver, PRODUCT_URL).outcome == BLOCKED
+    assert time.perf_counter() - started < 0.1
+    assert driver.calls == 1
+    assert classify_page(FakeDriver(RuntimeError('no session')), PRODUCT_URL).outcome == OK
+
+
+def test_outcomes_feed_the_rate_limiter():
+    assert classify_result({'outcome': BLOCKED, 'error': 'blocked: robot check'}, 0.2) == 'blocked'
+    assert classify_result({'outcome': NOT_FOUND, 'error': 'not_found: page not found'}, 0.2) == 'ok'
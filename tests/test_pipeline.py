@@ -0,0 +1,101 @@
+import asyncio
+import threading
+import time
+import uuid
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+
+import db_d
+from pipeline import DriverPool, PricePipeline
+
+
+class FakeMonitor:
+    def __init__(self):
+        self.product_names = {}
+        self.alerts = []
+        self.timed_out = []
+        self.skipped = {}
+        self.stop_requested = False
+
+    async def on_price_change(self, event):
+        self.alerts.append((event.url, event.old_value, event.new_value))
+
+
+class SlowScrapePipeline(PricePipeline):
+    def __init__(self, *args, prices, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prices = prices
+        self.concurrent = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def _scrape(self, url):
+        with self.driver_pool.acquire():
+            with self.lock:
+                self.concurrent += 1
+                self.peak = max(self.peak, self.concurrent)
+            time.sleep(0.05)
+            with self.lock:
+                self.concurrent -= 1
+            return {'price': self.prices[url], 'name': 'Phone', 'retailer': 'croma'}
+
+
+def test_pipeline_overlaps_scrapes_and_batches_writes():
+    db_d.Base.metadata.create_all(db_d.engine)
+    db = next(db_d.get_db())
+    urls = [f"https://www.croma.com/p/{uuid.uuid4().hex}" for _ in range(12)]
+    for url in urls:
+        db_d.add_product_to_db(db, url, "croma", {"value": 1000}, [{"value": 1000, "timestamp": "t0"}])
+    db.close()
+
+    prices = {url: (900 if i % 2 else 1000) for i, url in enumerate(urls)}
+    monitor = FakeMonitor()
+    pool = DriverPool(4, factory=object)
+    results = {}
+    pipeline = SlowScrapePipeline(monitor, pool, queue_size=2, batch_size=5, batch_timeout=0.2, prices=prices,
+                                  on_result=results.__setitem__)
+
+    started = time.perf_counter()
+    stats = asyncio.run(pipeline.run(urls))
+    elapsed = time.perf_counter() - started
+
+    assert stats['persisted'] == 12 and stats['changes'] == 6
+    assert stats['batches'] < 12
+    assert results == {url: True for url in urls}
+    assert sorted(monitor.alerts) == sorted((u, 1000, 900) for u in urls if prices[u] == 900)
+    assert pipeline.peak == 4
+    assert elapsed < 12 * 0.05
+    assert pipeline.queue_depths() == {'scrape': 0, 'persist': 0, 'notify': 0}
+
+
+class OutcomePipeline(PricePipeline):
+    def __init__(self, *args, outcomes, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.outcomes = outcomes
+        self.depths = []
+
+    def _scrape(self, url):
+        from metrics import PIPELINE_QUEUE_DEPTH
+        self.depths.append({labels['stage']: value for _, labels, value in PIPELINE_QUEUE_DEPTH.samples()})
+        return {'price': None, 'outcome': self.outcomes[url]}
+
+
+def test_missing_products_are_counted_apart_from_failures_and_depths_are_exported():
+    from metrics import PIPELINE_QUEUE_DEPTH
+
+    urls = [f"https://www.croma.com/p/{uuid.uuid4().hex}" for _ in range(3)]
+    outcomes = dict(zip(urls, ('not_found', 'out_of_stock', 'error')))
+    results = {}
+    pipeline = OutcomePipeline(FakeMonitor(), DriverPool(1, factory=object), queue_size=5, outcomes=outcomes,
+                               on_result=results.__setitem__)
+
+    stats = asyncio.run(pipeline.run(urls))
+
+    assert (stats['not_found'], stats['out_of_stock'], stats['scrape_failed']) == (1, 1, 1)
+    assert results == {url: False for url in urls}
+    assert all(set(depths) == {'scrape', 'persist', 'notify'} for depths in pipeline.depths)
+    assert any(depths['scrape'] > 0 for depths in pipeline.depths)
+    assert {labels['stage']: value for _, labels, value in PIPELINE_QUEUE_DEPTH.samples()} == \
+        {'scrape': 0, 'persist': 0, 'notify': 0}
@@ -0,0 +1,160 @@
+import asyncio
+import time
+import uuid
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+aiohttp = pytest.importorskip("aiohttp")
+
+import db_d
+from events import make_event, versions
+from price_api import PriceAPI, TTLCache, top_drops
+from scheduler import TIMESTAMP_FORMAT
+
+
+@pytest.fixture
+def product():
+    """One product with ten daily prices, the last one today"""
+    db_d.Base.metadata.create_all(db_d.engine)
+    db = next(db_d.get_db())
+    url = f"https://www.croma.com/p/{uuid.uuid4().hex}"
+    now = time.time()
+    history = [{'value': 2000.0 - 100 * day, 'currency': 'INR',
+                'timestamp': time.strftime(TIMESTAMP_FORMAT, time.localtime(now - (9 - day) * 86400))}
+               for day in range(10)]
+    row = db_d.add_product_to_db(db, url, 'croma', history[-1], history)
+    yield {'id': str(row.product_id), 'url': url, 'history': history}
+    db.query(db_d.Product).filter(db_d.Product.url == url).delete()
+    db.commit()
+    db.close()
+
+
+class CountingSessions:
+    def __init__(self):
+        self.opened = 0
+
+    def __call__(self):
+        self.opened += 1
+        return db_d.SessionLocal()
+
+
+def serve(coroutine_function):
+    async def run():
+        sessions = CountingSessions()
+        async with PriceAPI(session_factory=sessions) as api:
+            async with aiohttp.ClientSession(api.url) as client:
+                return await coroutine_function(api, client, sessions)
+    return asyncio.run(run())
+
+
+def test_ttl_cache_expires_and_follows_versions():
+    now = [0.0]
+    cache = TTLCache(ttl=10, max_entries=2, clock=lambda: now[0])
+    cache.put('a', 1, version=1)
+    assert cache.get('a', version=1) == 1
+    assert cache.get('a', version=2) is None  # Changed since cached
+    cache.put('a', 1)
+    now[0] = 10
+    assert cache.get('a') is None
+    for key in 'bcd':
+        cache.put(key, key)
+    assert len(cache) == 2 and cache.get('b') is None
+
+
+def test_product_lookup_latest_and_conditional_get(product):
+    async def check(api, client, sessions):
+        async with client.get('/products', params={'url': product['url']}) as response:
+            assert response.status == 200
+            summary = await response.json()
+        assert summary['product_id'] == product['id'] and summary['history_length'] == 10
+
+        async with client.get(f"/products/{product['id']}/latest") as response:
+            etag = response.headers['ETag']
+            assert (await response.json())['value'] == 1100.0
+        async with client.get(f"/products/{product['id']}/latest", headers={'If-None-Match': etag}) as response:
+            assert response.status == 304
+        unknown = uuid.uuid4()
+        for _ in range(3):
+            async with client.get(f"/products/{unknown}") as response:
+                assert response.status == 404
+        return sessions.opened
+
+    # URL lookup, one product load and one miss for the unknown id; everything else is served from cache
+    assert serve(check) == 3
+
+
+def test_history_pages_by_cursor_within_time_range(product):
+    since = product['history'][2]['timestamp']
+    until = product['history'][9]['timestamp']
+
+    async def check(api, client, sessions):
+        pages, cursor = [], None
+        while True:
+            params = {'since': since, 'until': until, 'limit': 3}
+            if cursor:
+                params['cursor'] = cursor
+            async with client.get(f"/products/{product['id']}/history", params=params) as response:
+                body = await response.json()
+            pages.append([entry['value'] for entry in body['history']])
+            cursor = body['next_cursor']
+            if not cursor:
+                break
+        async with client.get(f"/products/{product['id']}/history", params={'cursor': '!!'}) as response:
+            assert response.status == 400
+        return pages
+
+    assert serve(check) == [[1800.0, 1700.0, 1600.0], [1500.0, 1400.0, 1300.0], [1200.0]]
+
+
+def test_price_change_event_invalidates_cached_product(product):
+    async def check(api, client, sessions):
+        path = f"/products/{product['id']}/latest"
+        async with client.get(path) as response:
+            etag = response.headers['ETag']
+
+        db = next(db_d.get_db())
+        row = db_d.update_product_prices(db, product['url'], {'value': 999.0})
+        db.close()
+        versions(make_event(row, 1100.0, 999.0))  # As the bus would on a node that sees the change
+
+        async with client.get(path, headers={'If-None-Match': etag}) as response:
+            assert response.status == 200
+            return (await response.json())['value']
+
+    assert serve(check) == 999.0
+
+
+def test_top_drops_ranks_by_percentage():
+    now = time.time()
+    stamp = lambda hours_ago: time.strftime(TIMESTAMP_FORMAT, time.localtime(now - hours_ago * 3600))
+    rows = [
+        ('a', 'https://www.croma.com/p/a', 'croma', [{'value': 1000, 'timestamp': stamp(48)},
+                                                     {'value': 900, 'timestamp': stamp(2)}]),
+        ('b', 'https://www.croma.com/p/b', 'croma', [{'value': 1000, 'timestamp': stamp(30)},
+                                                     {'value': 700, 'timestamp': stamp(5)},
+                                                     {'value': 600, 'timestamp': stamp(1)}]),
+        ('c', 'https://www.croma.com/p/c', 'croma', [{'value': 1000, 'timestamp': stamp(48)},
+                                                     {'value': 500, 'timestamp': stamp(30)}]),  # Outside window
+        ('d', 'https://www.amazon.in/dp/d', 'amazon', [{'value': 100, 'timestamp': stamp(3)},
+                                                       {'value': 120, 'timestamp': stamp(1)}]),  # A rise
+    ]
+    drops = top_drops(rows, stamp(24), limit=10)
+    assert [(drop['product_id'], drop['drop_pct']) for drop in drops] == [('b', 40.0), ('a', 10.0)]
+    assert top_drops(rows, stamp(24), limit=10, retailer='amazon') == []
+
+
+def test_drops_are_recomputed_by_ttl_not_on_every_price_change(product):
+    async def check(api, client, sessions):
+        for _ in range(3):
+            async with client.get('/drops', params={'hours': 48}) as response:
+                drops = (await response.json())['drops']
+            other = SimpleNamespace(product_id=uuid.uuid4(), url="https://www.croma.com/p/other", retailer='croma')
+            versions(make_event(other, 1000.0, 900.0))  # Some other product changes meanwhile
+        return drops, sessions.opened
+
+    drops, opened = serve(check)
+    assert opened == 1
+    assert [(drop['product_id'], drop['old_price'], drop['new_price']) for drop in drops
+            if drop['product_id'] == product['id']] == [(product['id'], 1300.0, 1100.0)]
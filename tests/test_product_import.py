@@ -0,0 +1,75 @@
+import io
+import uuid
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+
+import db_d
+from product_import import canonical_url, import_urls, read_urls
+from product_urls import clean_url
+
+
+@pytest.fixture
+def db():
+    db_d.Base.metadata.create_all(db_d.engine)
+    session = next(db_d.get_db())
+    yield session
+    session.close()
+
+
+def test_canonical_url_is_the_stored_form():
+    assert canonical_url(" https://www.amazon.in/Apple-iPhone/dp/B0DGJ/ref=sr_1_1?tag=x-21&th=1#reviews ") == \
+        "https://www.amazon.in/Apple-iPhone/dp/B0DGJ/ref=sr_1_1"
+    assert canonical_url("http://www.flipkart.com/phone/p/itm1?srno=s_1&pid=P1&lid=L1") == \
+        "http://www.flipkart.com/phone/p/itm1?pid=P1&lid=L1"
+    assert canonical_url("www.croma.com/phone/p/309742") == "https://www.croma.com/phone/p/309742"
+    assert canonical_url("ftp://www.croma.com/p/1") is None
+    assert canonical_url("not a url at all") is None
+    assert canonical_url("") is None
+
+
+def test_read_urls_from_csv_with_or_without_header():
+    with_header = io.StringIO("name,url\nPhone,https://www.croma.com/p/1\nTV,https://www.croma.com/p/2\n")
+    assert list(read_urls(with_header, 'csv')) == ["https://www.croma.com/p/1", "https://www.croma.com/p/2"]
+    bare = io.StringIO("https://www.croma.com/p/1\nhttps://www.croma.com/p/2\n")
+    assert list(read_urls(bare, 'csv')) == ["https://www.croma.com/p/1", "https://www.croma.com/p/2"]
+
+
+def test_read_urls_from_ndjson_skips_bad_lines():
+    stream = io.StringIO('{"url": "https://www.croma.com/p/1"}\nnot json\n"https://www.croma.com/p/2"\n\n{"sku": 1}\n')
+    assert list(read_urls(stream, 'ndjson')) == ["https://www.croma.com/p/1", "https://www.croma.com/p/2"]
+
+
+def test_import_dedupes_in_file_and_against_db_in_batches(db):
+    tag = uuid.uuid4().hex
+    existing = f"https://www.croma.com/p/{tag}-0"
+    db_d.add_product_to_db(db, existing, "croma", {"value": 100}, [{"value": 100, "timestamp": "t0"}])
+
+    def lines():
+        for i in range(25):
+            yield f"https://www.croma.com/p/{tag}-{i}?utm_source=feed"
+            yield f"https://www.croma.com/p/{tag}-{i}#again"  # Same product, shared differently
+        yield "https://shop.example.com/p/1"
+        yield "not a url at all"
+
+    stats = import_urls(db, lines(), batch_size=10)
+    assert stats == {'read': 52, 'invalid': 1, 'unsupported': 1, 'duplicate': 25, 'existing': 1, 'added': 24}
+
+    pending = db.query(db_d.Product).filter(db_d.Product.url.like(f"%{tag}%")).all()
+    assert len(pending) == 25
+    fresh = [product for product in pending if product.url != existing]
+    assert all(product.price_history == [] and product.retailer == 'croma' for product in fresh)
+    db.query(db_d.Product).filter(db_d.Product.url.like(f"%{tag}%")).delete(synchronize_session=False)
+    db.commit()
+
+
+def test_import_counts_products_the_scrapers_stored_as_existing(db):
+    tag = uuid.uuid4().hex
+    shared = f"https://www.flipkart.com/phone/p/itm{tag}?pid=MOB1&lid=L1&otracker=search"
+    db_d.add_product_to_db(db, clean_url(shared), "flipkart", {"value": 100}, [{"value": 100, "timestamp": "t0"}])
+
+    stats = import_urls(db, [f"https://www.flipkart.com/phone/p/itm{tag}?pid=MOB1&srno=s_1&lid=L1#reviews"])
+    assert stats['existing'] == 1 and stats['added'] == 0
+    db.query(db_d.Product).filter(db_d.Product.url.like(f"%{tag}%")).delete(synchronize_session=False)
+    db.commit()
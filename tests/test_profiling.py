@@ -0,0 +1,51 @@
+import asyncio
+import time
+
+from profiling import ProfileSession
+
+
+def slow_scrape(seconds):
+    time.sleep(seconds)
+    return [0] * 50000
+
+
+def test_report_ranks_products_and_folds_in_thread_profiles(tmp_path):
+    session = ProfileSession(memory=True, top=5)
+    session.start()
+
+    async def run():
+        for url, seconds in (("https://www.croma.com/p/fast", 0.01), ("https://www.amazon.in/dp/SLOW", 0.1)):
+            with session.product(url) as record:
+                await asyncio.to_thread(session.runcall, slow_scrape, seconds)
+                record['ok'] = True
+
+    asyncio.run(run())
+    session.stop()
+
+    slowest = max(session.products, key=lambda r: r['seconds'])
+    assert slowest['retailer'] == 'amazon' and slowest['peak_kb'] > 0
+    report = session.report()
+    assert report.index("amazon.in/dp/SLOW") < report.index("croma.com/p/fast")
+    # Came from the scrape threads' profilers, which the event loop's cProfile can't see
+    assert any(name == 'slow_scrape' and calls[0] == 2 for (_, _, name), calls in session.stats().stats.items())
+    assert "allocation sites" in report
+
+    session.write(str(tmp_path / "profile.txt"))
+    assert (tmp_path / "profile.txt.prof").exists()
+
+
+def test_back_to_back_profiled_calls_share_the_running_session():
+    session = ProfileSession()
+    session.start()
+
+    async def run():
+        for url in ("https://www.croma.com/p/1", "https://www.croma.com/p/2"):
+            with session.product(url) as record:
+                assert len(await asyncio.to_thread(session.runcall, slow_scrape, 0)) == 50000
+                record['ok'] = True
+
+    asyncio.run(run())
+    session.stop()
+
+    assert [record['ok'] for record in session.products] == [True, True]
+    assert any(name == 'slow_scrape' and calls[0] == 2 for (_, _, name), calls in session.stats().stats.items())
@@ -0,0 +1,79 @@
+import threading
+import time
+
+from rate_limit import AdaptiveLimiter, LimiterRegistry, classify_result, retailer_for_url
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_backs_off_on_block_and_recovers_additively():
+    clock = FakeClock()
+    limiter = AdaptiveLimiter('amazon', rate=2.0, concurrency=4, cooldown=10, clock=clock)
+
+    assert limiter.acquire(0)
+    limiter.release('blocked')
+    assert limiter.rate == 1.0 and limiter.limit == 2
+
+    # A second failure inside the cooldown is the same congestion signal
+    clock.now += 1
+    assert limiter.acquire(0)
+    limiter.release('slow')
+    assert limiter.rate == 1.0 and limiter.decreases == 1
+
+    for _ in range(10):
+        clock.now += 1
+        assert limiter.acquire(0)
+        limiter.release('ok')
+    assert limiter.rate > 1.0 and limiter.limit >= 3
+    assert limiter.snapshot()['in_flight'] == 0
+
+
+def test_token_bucket_and_concurrency_limit():
+    clock = FakeClock()
+    limiter = AdaptiveLimiter('croma', rate=1.0, concurrency=1, clock=clock)
+    assert limiter.acquire(0)
+    # No second slot while one is in flight, even with a token available
+    clock.now += 5
+    assert not limiter.acquire(0)
+    limiter.release('error')
+    assert limiter.acquire(0)
+    limiter.release('error')
+    # Tokens are spent: the next request has to wait for a refill
+    assert not limiter.acquire(0)
+
+
+def test_waiting_thread_wakes_on_release():
+    limiter = AdaptiveLimiter('flipkart', rate=100.0, concurrency=1)
+    assert limiter.acquire()
+    acquired = []
+    waiter = threading.Thread(target=lambda: acquired.append(limiter.acquire(2.0)))
+    waiter.start()
+    time.sleep(0.05)
+    limiter.release('ok')
+    waiter.join()
+    assert acquired == [True]
+
+
+def test_classify_and_registry():
+    assert classify_result({'price': 100.0}, 1.0) == 'ok'
+    assert classify_result({'price': 100.0}, 60.0) == 'slow'
+    assert classify_result({'error': 'Captcha page shown'}, 1.0) == 'blocked'
+    assert classify_result({'error': 'Price element not found'}, 1.0) == 'error'
+    assert classify_result({'error': 'HTTP 503 from upstream'}, 1.0) == 'blocked'
+    assert classify_result({'error': 'status: 429'}, 1.0) == 'blocked'
+    assert classify_result({'error': "Could not parse price '₹1,503'"}, 1.0) == 'error'
+    assert classify_result({'error': 'no price on https://www.amazon.in/dp/B0503XYZ'}, 1.0) == 'error'
+    assert classify_result({'error': 'deadline exceeded', 'timed_out': True}, 60.0) == 'expired'
+    assert classify_result(None, 1.0) == 'error'
+
+    assert retailer_for_url('https://www.amazon.in/dp/X') == 'amazon'
+    assert retailer_for_url('https://example.com/p') == 'other'
+    registry = LimiterRegistry()
+    assert registry.for_url('https://www.flipkart.com/p') is registry.get('flipkart')
+    assert set(registry.snapshot()) == {'flipkart'}
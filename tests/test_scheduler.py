@@ -0,0 +1,73 @@
+from scheduler import MAX_INTERVAL, MIN_INTERVAL, RefreshScheduler, estimate_change_rate
+
+
+class FakeClock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_volatile_and_watched_products_are_checked_sooner():
+    clock = FakeClock()
+    scheduler = RefreshScheduler(pages_per_hour=1000, clock=clock)
+    scheduler.add("static", "flipkart", change_rate=1 / (24 * 90), last_checked=clock.now)
+    scheduler.add("volatile", "flipkart", change_rate=10.0, last_checked=clock.now)
+    scheduler.add("watched", "flipkart", change_rate=1 / 24, interest=50, last_checked=clock.now)
+
+    assert scheduler.states["static"].next_check - clock.now == MAX_INTERVAL
+    assert scheduler.states["volatile"].next_check - clock.now == MIN_INTERVAL
+    assert scheduler.interval_for(scheduler.states["watched"]) < 12 * 3600 / 4
+
+    clock.now += MIN_INTERVAL
+    assert scheduler.due() == ["volatile"]
+
+
+def test_budget_limits_pages_and_record_reschedules():
+    clock = FakeClock()
+    scheduler = RefreshScheduler(pages_per_hour=3, clock=clock)
+    for i in range(5):
+        scheduler.add(f"p{i}", "flipkart")
+
+    first = scheduler.due()
+    assert first == ["p0", "p1", "p2"]
+    assert scheduler.due() == []
+
+    clock.now += 1200  # one page worth of budget refills
+    assert scheduler.due() == ["p3"]
+
+    scheduler.record("p0", changed=True)
+    assert scheduler.states["p0"].next_check > clock.now
+
+
+def test_estimate_change_rate_from_history():
+    history = [
+        {"timestamp": "2024-01-01 00:00:00"},
+        {"timestamp": "2024-01-01 12:00:00"},
+        {"timestamp": "2024-01-02 00:00:00"},
+    ]
+    assert abs(estimate_change_rate(history) - 2 / 24) < 1e-9
+
+
+def test_state_survives_a_restart(tmp_path):
+    path = str(tmp_path / "scheduler.json")
+    clock = FakeClock()
+    scheduler = RefreshScheduler(pages_per_hour=3, clock=clock, state_path=path)
+    for i in range(3):
+        scheduler.add(f"p{i}", "flipkart")
+    assert scheduler.due() == ["p0", "p1", "p2"]  # Bucket now empty
+    scheduler.states["p0"].change_rate = 0.01
+    scheduler.record("p0")
+    scheduler.save_state()
+
+    # A cron run 40 minutes later: the bucket has refilled by two pages, not to full
+    clock.now += 2400
+    restarted = RefreshScheduler(pages_per_hour=3, clock=clock, state_path=path)
+    assert restarted.states["p0"].change_rate == scheduler.states["p0"].change_rate
+    assert restarted.states["p0"].next_check == scheduler.states["p0"].next_check
+    restarted.add("p3", "flipkart")
+    assert restarted.due() == ["p1", "p2"]  # In flight when saved, so due again; p3 waits for budget
+
+    restarted.retain(["p0", "p3"])
+    assert set(restarted.states) == {"p0", "p3"}
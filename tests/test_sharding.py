@@ -0,0 +1,66 @@
+import os
+
+from sharding import ShardSupervisor, partition, shard_for
+
+URLS = [f"https://www.croma.com/p/{i}" for i in range(20)]
+
+
+def test_shards_are_stable_and_cover_everything():
+    assert shard_for("https://www.croma.com/p/1", 4) == shard_for("HTTPS://WWW.CROMA.COM/p/1/", 4)
+    buckets = partition(URLS, 4)
+    assert sorted(u for b in buckets for u in b) == sorted(URLS)
+    assert all(buckets)
+
+
+def crashing_worker(shard, urls, results):
+    """Dies once on its first URL (marker file), then behaves"""
+    marker = os.path.join(os.environ["SHARD_TEST_DIR"], f"crashed-{shard}")
+    for url in urls:
+        results.put(('start', shard, url, None))
+        if not os.path.exists(marker):
+            open(marker, "w").close()
+            os._exit(1)
+        results.put(('done', shard, url, {'ok': True, 'seconds': 0.0}))
+    results.put(('exit', shard, None, {"croma": {"changes": 1}}))
+
+
+def test_crashed_shards_restart_without_losing_work(tmp_path, monkeypatch):
+    monkeypatch.setenv("SHARD_TEST_DIR", str(tmp_path))
+    stats = ShardSupervisor(2, target=crashing_worker).run(URLS)
+    assert stats['succeeded'] == len(URLS)
+    assert stats['restarts'] == 2
+    assert stats['skipped'] == 0
+    assert stats['changes'] == {"croma": {"changes": 2}}
+
+
+def slow_worker(shard, urls, results):
+    """Shard 0 dies at once; the others stay busy reporting, so the queue is never quiet"""
+    import time
+    if shard == 0 and not os.path.exists(os.path.join(os.environ["SHARD_TEST_DIR"], "crashed")):
+        open(os.path.join(os.environ["SHARD_TEST_DIR"], "crashed"), "w").close()
+        results.put(('start', shard, urls[0], None))
+        os._exit(1)
+    for url in urls:
+        results.put(('start', shard, url, None))
+        time.sleep(0.05)
+        results.put(('done', shard, url, {'ok': True, 'seconds': time.time()}))
+    results.put(('exit', shard, None, {}))
+
+
+def test_dead_shard_restarts_while_others_are_busy(tmp_path, monkeypatch):
+    monkeypatch.setenv("SHARD_TEST_DIR", str(tmp_path))
+    urls = [f"https://www.croma.com/p/{i}" for i in range(120)]
+    finished_at = {}
+    stats = ShardSupervisor(4, target=slow_worker).run(urls, on_result=lambda url, ok: finished_at.setdefault(url, ok))
+    assert stats['succeeded'] == len(urls) and stats['restarts'] == 1
+    assert set(finished_at) == set(urls)
+
+
+def test_workers_reject_flags_they_cannot_honour():
+    import pytest
+    pytest.importorskip("selenium")
+    from check_prices import parse_args
+
+    with pytest.raises(SystemExit):
+        parse_args(['--workers', '4', '--scheduled'])
+    assert parse_args(['--workers', '4', '--fresh']).fresh
@@ -0,0 +1,179 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("aiohttp")
+
+from sinks import NotificationFanout, NotificationSink
+
+
+class RecordingSink(NotificationSink):
+    kind = 'recording'
+    renders = 0
+
+    def __init__(self, delay=0.0, **kwargs):
+        super().__init__(**kwargs)
+        self.delay = delay
+        self.delivered = []
+
+    def render(self, alert):
+        RecordingSink.renders += 1
+        return alert['product_name']
+
+    async def deliver(self, payload, session):
+        await asyncio.sleep(self.delay)
+        self.delivered.append(payload)
+        return True
+
+
+def test_fanout_renders_once_per_kind_and_isolates_slow_sinks():
+    RecordingSink.renders = 0
+    fast = RecordingSink(name="fast")
+    slow = RecordingSink(delay=1.0, name="slow", timeout=0.05)
+
+    async def run():
+        async with NotificationFanout([fast, slow], min_drop=5.0) as fanout:
+            return await fanout.send_alert("Phone", 1000, 800, "https://www.amazon.in/dp/X", "amazon")
+
+    assert asyncio.run(run()) is True
+    assert RecordingSink.renders == 1
+    assert fast.delivered == ["Phone"]
+    assert slow.delivered == []
+
+
+def test_fanout_skips_small_drops():
+    sink = RecordingSink()
+
+    async def run():
+        async with NotificationFanout([sink], min_drop=5.0) as fanout:
+            return await fanout.send_alert("Phone", 1000, 990, "https://www.amazon.in/dp/X", "amazon")
+
+    assert asyncio.run(run()) is False
+    assert sink.delivered == []
+
+
+def test_send_alert_returns_once_queued():
+    slow = RecordingSink(delay=0.3, name="slow")
+
+    async def run():
+        async with NotificationFanout([slow], min_drop=5.0) as fanout:
+            loop = asyncio.get_running_loop()
+            started = loop.time()
+            assert await fanout.send_alert("Phone", 1000, 800, "https://www.amazon.in/dp/X", "amazon")
+            queued_in = loop.time() - started
+            assert slow.delivered == []
+        return queued_in
+
+    assert asyncio.run(run()) < 0.1
+    assert slow.delivered == ["Phone"]  # close() flushed the queue
+
+
+def test_waiting_for_a_slot_counts_against_the_timeout():
+    sink = RecordingSink(delay=0.2, name="narrow", max_concurrency=1, timeout=0.3)
+
+    async def run():
+        async with NotificationFanout([sink], min_drop=5.0) as fanout:
+            return await asyncio.gather(
+                fanout.deliver_alert("First", 1000, 800, "https://www.amazon.in/dp/A", "amazon"),
+                fanout.deliver_alert("Second", 1000, 800, "https://www.amazon.in/dp/B", "amazon")
+            )
+
+    # The second alert spends 0.2s queued behind the first, leaving too little time to deliver
+    assert asyncio.run(run()) == [True, False]
+    assert sink.delivered == ["First"]
+
+
+def test_timed_out_smtp_send_keeps_its_slot_until_the_thread_returns(monkeypatch):
+    import threading
+    import time
+
+    from sinks import SmtpSink
+
+    sink = SmtpSink("localhost", 25, "a@example.com", ["b@example.com"], max_concurrency=1, timeout=0.05)
+    running = []
+    overlapped = threading.Event()
+
+    def slow_send(subject, body):
+        if running:
+            overlapped.set()
+        running.append(subject)
+        time.sleep(0.2)  # smtplib ignores our cancellation
+        running.remove(subject)
+        return True
+
+    monkeypatch.setattr(sink, '_send', slow_send)
+
+    async def run():
+        async with NotificationFanout([sink], min_drop=5.0) as fanout:
+            first = await fanout.deliver_alert("First", 1000, 800, "https://www.amazon.in/dp/A", "amazon")
+            sink.timeout = 1.0
+            second = await fanout.deliver_alert("Second", 1000, 800, "https://www.amazon.in/dp/B", "amazon")
+            return first, second
+
+    assert asyncio.run(run()) == (False, True)
+    assert not overlapped.is_set()
+
+
+def test_user_alerts_go_to_the_subscription_webhook(monkeypatch):
+    import sinks
+    from subscriptions import SubscriptionEntry
+
+    shared = RecordingSink(name="shared")
+    personal = RecordingSink(name="personal")
+    monkeypatch.setattr(sinks, 'sink_for_destination', lambda url, **kwargs: personal)
+    subscription = SubscriptionEntry("s1", "alice", "https://www.amazon.in/dp/X", 900, None, "https://hooks.example/alice")
+
+    async def run():
+        async with NotificationFanout([shared], min_drop=50.0) as fanout:
+            # 2% is below the shared threshold, but alice asked for this target
+            return await fanout.send_user_alert(subscription, "Phone", 1000, 980, "https://www.amazon.in/dp/X", "amazon")
+
+    assert asyncio.run(run()) is True
+    assert personal.delivered == ["Phone"] and shared.delivered == []
+
+
+class FailingSink(RecordingSink):
+    async def deliver(self, payload, session):
+        return False
+
+
+def test_undelivered_hook_fires_only_when_every_sink_fails():
+    undelivered = []
+
+    async def run(sinks):
+        async with NotificationFanout(sinks, min_drop=5.0) as fanout:
+            fanout.on_undelivered = undelivered.append
+            assert await fanout.send_alert("Phone", 1000, 800, "https://www.amazon.in/dp/X", "amazon")
+
+    asyncio.run(run([FailingSink(name="a"), RecordingSink(name="b")]))
+    assert undelivered == []
+    asyncio.run(run([FailingSink(name="a"), FailingSink(name="b")]))
+    assert [alert['url'] for alert in undelivered] == ["https://www.amazon.in/dp/X"]
+
+
+def test_user_sinks_are_bounded_and_evicted_ones_finish_their_backlog(monkeypatch):
+    import sinks
+    from subscriptions import SubscriptionEntry
+
+    created = {}
+
+    def make_sink(url, **kwargs):
+        created[url] = RecordingSink(delay=0.05, name="user")
+        return created[url]
+
+    monkeypatch.setattr(sinks, 'sink_for_destination', make_sink)
+    monkeypatch.setattr(sinks, 'MAX_USER_SINKS', 2)
+
+    async def run():
+        async with NotificationFanout([], min_drop=5.0) as fanout:
+            for i in range(4):
+                subscription = SubscriptionEntry(f"s{i}", f"u{i}", "https://www.amazon.in/dp/X", 900, None,
+                                                 f"https://hooks.example/{i}")
+                await fanout.send_user_alert(subscription, "Phone", 1000, 800, "https://www.amazon.in/dp/X", "amazon")
+            assert list(fanout._user_sinks) == ["https://hooks.example/2", "https://hooks.example/3"]
+            assert len(fanout._queues) == 2
+        return fanout
+
+    fanout = asyncio.run(run())
+    assert all(sink.delivered == ["Phone"] for sink in created.values())
+    assert not fanout._workers and not fanout._retired
@@ -0,0 +1,29 @@
+from subscriptions import SubscriptionEntry, SubscriptionMatcher
+
+URL = "https://www.amazon.in/dp/B0DGJHBX5Y"
+
+
+def entry(sid, target=None, pct=None, url=URL):
+    return SubscriptionEntry(sid, f"user-{sid}", url, target, pct)
+
+
+def test_target_prices_match_only_crossed_range():
+    matcher = SubscriptionMatcher()
+    matcher.load([entry("a", target=900), entry("b", target=800), entry("c", target=700), entry("d", target=1000)])
+
+    assert {e.subscription_id for e in matcher.match(URL, 1000, 800)} == {"a", "b"}
+    assert matcher.match(URL, 800, 900) == []
+    assert matcher.match("https://other", 1000, 500) == []
+
+
+def test_drop_percentage_and_removal():
+    matcher = SubscriptionMatcher()
+    matcher.add(entry("small", pct=5))
+    matcher.add(entry("large", pct=20))
+    matcher.add(entry("both", target=950, pct=50))
+
+    assert {e.subscription_id for e in matcher.match(URL, 1000, 900)} == {"small", "both"}
+    assert matcher.remove("small")
+    assert not matcher.remove("small")
+    assert matcher.interest(URL) == 3
+    assert {e.subscription_id for e in matcher.match(URL, 1000, 700)} == {"large", "both"}
@@ -0,0 +1,52 @@
+import asyncio
+import json
+import threading
+
+from tracing import Tracer, traced
+import tracing
+
+
+def test_spans_nest_across_tasks_and_threads(monkeypatch, tmp_path):
+    tracer = Tracer(sample_rate=1.0)
+    monkeypatch.setattr(tracing, 'tracer', tracer)
+
+    @traced()
+    def scrape(url):
+        with tracer.span('wait_for_element', field='price'):
+            return threading.get_native_id()
+
+    async def check(url):
+        with tracer.trace('check_product', url=url) as span:
+            tid = await asyncio.to_thread(scrape, url)
+            span.set(ok=True)
+            return tid
+
+    async def run():
+        return await asyncio.gather(check('a'), check('b'))
+
+    asyncio.run(run())
+    path = tmp_path / "trace.json"
+    assert tracer.dump(str(path)) == 6
+
+    events = json.loads(path.read_text())['traceEvents']
+    assert {e['ph'] for e in events} == {'X'}
+    by_trace = {}
+    for event in events:
+        by_trace.setdefault(event['args']['trace_id'], []).append(event)
+    assert len(by_trace) == 2
+    for spans in by_trace.values():
+        names = {e['name']: e for e in spans}
+        assert set(names) == {'check_product', 'scrape', 'wait_for_element'}
+        root, child = names['check_product'], names['wait_for_element']
+        assert root['args']['ok'] is True and child['args']['field'] == 'price'
+        # Children start and end within their root, on the scrape thread
+        assert root['ts'] <= child['ts'] and child['ts'] + child['dur'] <= root['ts'] + root['dur']
+        assert child['tid'] == names['scrape']['tid'] != root['tid']
+
+
+def test_unsampled_work_records_nothing():
+    tracer = Tracer(sample_rate=0.0)
+    with tracer.trace('check_product') as root:
+        with tracer.span('scrape') as child:
+            assert root is None and child is None
+    assert tracer.events == []
@@ -0,0 +1,135 @@
+import threading
+import uuid
+from datetime import timedelta
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+
+import db_d
+from db_d import ScrapeJob
+from work_queue import (
+    QueueWorker, claim_jobs, complete_job, enqueue_products, fail_job, heartbeat, release_jobs, requeue_expired, utcnow
+)
+
+
+@pytest.fixture
+def db():
+    db_d.Base.metadata.create_all(db_d.engine)
+    session = next(db_d.get_db())
+    session.query(ScrapeJob).delete()
+    session.commit()
+    yield session
+    session.query(ScrapeJob).delete()
+    session.commit()
+    session.close()
+
+
+def urls(n):
+    return [f"https://www.flipkart.com/p/{uuid.uuid4().hex}" for _ in range(n)]
+
+
+def test_workers_never_share_claims(db):
+    enqueue_products(db, urls(6))
+    first = claim_jobs(db, "w1", limit=4)
+    second = claim_jobs(db, "w2", limit=4)
+    assert len(first) == 4 and len(second) == 2
+    assert not {j.job_id for j in first} & {j.job_id for j in second}
+    assert claim_jobs(db, "w3") == []
+
+
+def test_expired_leases_are_requeued_and_stale_worker_loses_job(db):
+    enqueue_products(db, urls(1))
+    (job,) = claim_jobs(db, "w1", lease_seconds=60)
+    job_id = job.job_id
+    assert heartbeat(db, "w1", [job_id]) == 1
+
+    job.lease_expires_at = utcnow() - timedelta(seconds=1)
+    db.commit()
+    assert requeue_expired(db) == 1
+
+    (reclaimed,) = claim_jobs(db, "w2")
+    assert reclaimed.attempts == 2
+    assert not complete_job(db, job_id, "w1")
+    assert complete_job(db, job_id, "w2")
+    assert db.get(ScrapeJob, job_id).status == 'done'
+
+
+def test_failures_back_off_then_park(db):
+    enqueue_products(db, urls(1))
+    (job,) = claim_jobs(db, "w1")
+    job_id = job.job_id
+    assert fail_job(db, job_id, "w1", "timeout", max_attempts=1)
+    assert db.get(ScrapeJob, job_id).status == 'failed'
+
+    # Re-enqueueing re-arms parked jobs
+    assert enqueue_products(db, [db.get(ScrapeJob, job_id).product_url]) == 1
+    assert db.get(ScrapeJob, job_id).status == 'queued'
+
+
+def test_expired_lease_on_last_attempt_parks_job(db):
+    enqueue_products(db, urls(1))
+    (job,) = claim_jobs(db, "w1")
+    job_id = job.job_id
+    job.attempts = 3
+    job.lease_expires_at = utcnow() - timedelta(seconds=1)
+    db.commit()
+
+    assert requeue_expired(db, max_attempts=3) == 0
+    parked = db.get(ScrapeJob, job_id)
+    assert parked.status == 'failed' and parked.last_error == 'lease expired'
+
+
+def test_stopping_worker_releases_unprocessed_claims(db):
+    import asyncio
+
+    enqueue_products(db, urls(3))
+
+    class StoppingMonitor:
+        skipped = {}
+
+        def __init__(self):
+            self.checked = []
+
+        async def check_product(self, url):
+            self.checked.append(url)
+            worker.stop()  # Stop requested while the first job is in flight
+            return True
+
+    monitor = StoppingMonitor()
+    worker = QueueWorker(monitor, worker_id="w1", batch_size=3)
+    assert asyncio.run(worker.run_once()) == 3
+
+    db.expire_all()
+    jobs = db.query(ScrapeJob).all()
+    assert sorted(job.status for job in jobs) == ['done', 'queued', 'queued']
+    assert all(job.attempts == 0 and job.claimed_by is None for job in jobs if job.status == 'queued')
+    assert release_jobs(db, [job.job_id for job in jobs], "w1") == 0  # Nothing left claimed
+    assert len(claim_jobs(db, "w2")) == 2
+
+
+def test_concurrent_claims_against_postgres(db):
+    if db.bind.dialect.name != 'postgresql':
+        pytest.skip("SKIP LOCKED semantics need Postgres")
+    enqueue_products(db, urls(50))
+    claimed = []
+    lock = threading.Lock()
+
+    def worker(name):
+        session = next(db_d.get_db())
+        try:
+            while True:
+                jobs = claim_jobs(session, name, limit=3)
+                if not jobs:
+                    return
+                with lock:
+                    claimed.extend(j.job_id for j in jobs)
+        finally:
+            session.close()
+
+    threads = [threading.Thread(target=worker, args=(f"w{i}",)) for i in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(claimed) == len(set(claimed)) == 50
@@ -0,0 +1,179 @@
+import contextvars
+import functools
+import inspect
+import json
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", 0))      # Share of product checks traced; 0 = off
+TRACE_PATH = os.getenv("TRACE_PATH", "price_checks.trace.json")   # Chrome trace-event JSON, written per run
+TRACE_MAX_EVENTS = int(os.getenv("TRACE_MAX_EVENTS", 200000))     # Bound memory on long daemon runs
+
+
+class Span:
+    """One timed operation inside a sampled trace"""
+
+    __slots__ = ('name', 'trace_id', 'attrs', 'started_ns', 'duration_ns', 'tid')
+
+    def __init__(self, name: str, trace_id: int, attrs: Dict[str, Any]):
+        self.name = name
+        self.trace_id = trace_id
+        self.attrs = attrs
+        self.started_ns = time.perf_counter_ns()
+        self.duration_ns = 0
+        self.tid = threading.get_native_id()
+
+    def set(self, **attrs) -> None:
+        self.attrs.update(attrs)
+
+    def to_event(self, pid: int) -> Dict[str, Any]:
+        """Chrome trace-event 'complete' event (microsecond timestamps)"""
+        args = {key: value if isinstance(value, (int, float, bool, str)) or value is None else str(value)
+                for key, value in self.attrs.items()}
+        args['trace_id'] = self.trace_id
+        return {
+            'name': self.name,
+            'cat': 'price_check',
+            'ph': 'X',
+            'ts': self.started_ns / 1000,
+            'dur': self.duration_ns / 1000,
+            'pid': pid,
+            'tid': self.tid,
+            'args': args
+        }
+
+
+_current: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar('current_span', default=None)
+
+
+class Tracer:
+    """Sampled span trees kept in context variables, exported as Chrome trace events
+
+    trace() opens a root span for a sampled fraction of calls; span() nests
+    under whatever span is current and costs one ContextVar lookup when the
+    current work is not being traced. Context variables follow asyncio tasks
+    and asyncio.to_thread, so spans opened in scrape threads land in the
+    product's trace.
+    """
+
+    def __init__(self, sample_rate: float = TRACE_SAMPLE_RATE, max_events: int = TRACE_MAX_EVENTS):
+        self.sample_rate = sample_rate
+        self.max_events = max_events
+        self.events: List[Dict[str, Any]] = []
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._ids = iter(range(1, 1 << 62))
+
+    def _finish(self, span: Span) -> None:
+        span.duration_ns = time.perf_counter_ns() - span.started_ns
+        event = span.to_event(os.getpid())
+        with self._lock:
+            if len(self.events) < self.max_events:
+                self.events.append(event)
+            else:
+                self.dropped += 1
+
+    @contextmanager
+    def _open(self, name: str, trace_id: int, attrs: Dict[str, Any]):
+        span = Span(name, trace_id, attrs)
+        token = _current.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.attrs['error'] = type(e).__name__
+            raise
+        finally:
+            _current.reset(token)
+            self._finish(span)
+
+    @contextmanager
+    def trace(self, name: str, **attrs):
+        """Root span, sampled at `sample_rate`; inside an existing trace it is just a child span"""
+        parent = _current.get()
+        if parent is not None:
+            with self._open(name, parent.trace_id, attrs) as span:
+                yield span
+            return
+        if not self.sample_rate or random.random() >= self.sample_rate:
+            yield None
+            return
+        with self._lock:
+            trace_id = next(self._ids)
+        with self._open(name, trace_id, attrs) as span:
+            yield span
+
+    @contextmanager
+    def span(self, name: str, **attrs):
+        """Child of the current span; a no-op (yielding None) outside a sampled trace"""
+        parent = _current.get()
+        if parent is None:
+            yield None
+            return
+        with self._open(name, parent.trace_id, attrs) as span:
+            yield span
+
+    def dump(self, path: str = TRACE_PATH) -> int:
+        """Write collected events as a Chrome trace file and start collecting afresh"""
+        with self._lock:
+            events, self.events = self.events, []
+            dropped, self.dropped = self.dropped, 0
+        if not events:
+            return 0
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms', 'otherData': {'dropped_events': dropped}}, f)
+        os.replace(tmp_path, path)
+        logger.info("Wrote %s trace events to %s (%s dropped)", len(events), path, dropped)
+        return len(events)
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+def annotate(**attrs) -> None:
+    """Attach attributes to the current span, if this work is being traced"""
+    span = _current.get()
+    if span is not None:
+        span.attrs.update(attrs)
+
+
+def traced(name: Optional[str] = None) -> Callable:
+    """Decorator: run the function (sync or async) inside a child span"""
+    def decorate(func):
+        span_name = name or func.__name__
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with tracer.span(span_name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with tracer.span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def dump_from_env(part: Optional[str] = None) -> None:
+    """Write the run's traces to TRACE_PATH; `part` (a cycle or shard) goes before the extension"""
+    if not tracer.sample_rate:
+        return
+    path = TRACE_PATH
+    if part is not None:
+        stem, ext = os.path.splitext(TRACE_PATH)
+        path = f"{stem}.{part}{ext}"
+    tracer.dump(path)
+
+
+# Process-wide tracer shared by every check
+tracer = Tracer()
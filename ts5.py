@@ -1,48 +1,12 @@
 from scrap_d import init_driver, scrape_product_data
 from db_d import get_db, add_product_to_db
+from product_urls import clean_url
+from log_setup import configure_logging
 import logging
 import time
-from urllib.parse import urlparse, parse_qs, urlunparse
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler('scraper.log')
-    ]
-)
 logger = logging.getLogger(__name__)
 
-def clean_url(url):
-    """Remove tracking parameters from URLs"""
-    if not url:
-        return url
-    
-    try:
-        parsed = urlparse(url)
-        
-        if 'amazon.' in parsed.netloc:
-            keep_params = {'dp', 'product'}
-        elif 'flipkart.' in parsed.netloc:
-            keep_params = {'pid', 'lid'}
-        else:
-            keep_params = set()
-        
-        query = parse_qs(parsed.query)
-        clean_query = {k: v for k, v in query.items() if k in keep_params}
-        
-        return urlunparse(
-            parsed._replace(
-                query='&'.join(f"{k}={v[0]}" for k, v in clean_query.items()),
-                fragment=''
-            )
-        )
-    except Exception as e:
-        logger.warning(f"URL cleaning failed: {str(e)}")
-        return url
-
 # Product URLs
 urls = {
     'amazon': clean_url("https://www.amazon.in/iPhone-16-128-GB-Control/dp/B0DGJHBX5Y"),
@@ -67,13 +31,13 @@ def main():
                                                   urls['flipkart'], 
                                                   urls['croma'])
         
-        logger.info(f"Scraped product: {name}")
-        logger.info(f"Prices: {prices}")
+        logger.info("Scraped product: %s", name)
+        logger.info("Prices: %s", prices)
 
         # Save each retailer's data separately
         for retailer in ['amazon', 'flipkart', 'croma']:
             if prices.get(retailer) is not None:
-                logger.info(f"Processing {retailer} data")
+                logger.info("Processing %s data", retailer)
                 
                 # Prepare retailer-specific data
                 price_data = {
@@ -92,12 +56,12 @@ def main():
                 )
                 
                 if product:
-                    logger.info(f"Added {retailer} product (ID: {product.product_id})")
+                    logger.info("Added %s product (ID: %s)", retailer, product.product_id)
                 else:
-                    logger.error(f"Failed to add {retailer} product")
+                    logger.error("Failed to add %s product", retailer)
             
     except Exception as e:
-        logger.error(f"Fatal error: {str(e)}", exc_info=True)
+        logger.error("Fatal error: %s", e, exc_info=True)
     finally:
         if driver:
             logger.info("Closing browser driver")
@@ -105,4 +69,5 @@ def main():
         logger.info("Scraping process completed")
 
 if __name__ == "__main__":
+    configure_logging(log_file='scraper.log')
     main()
\ No newline at end of file
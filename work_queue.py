@@ -0,0 +1,358 @@
+import argparse
+import asyncio
+import logging
+import os
+import socket
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, List, Optional
+
+from sqlalchemy import update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from db_d import get_db, Product, ScrapeJob
+from log_setup import configure_logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LEASE_SECONDS = int(os.getenv("SCRAPE_JOB_LEASE_SECONDS", 300))
+DEFAULT_MAX_ATTEMPTS = 3
+RETRY_BACKOFF_SECONDS = 60
+SUBSCRIPTION_REFRESH_SECONDS = 300  # Long-running workers pick up new subscriptions this often
+
+
+def utcnow() -> datetime:
+    """Naive UTC timestamp; all nodes must keep their clocks NTP-synced"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def enqueue_products(db, urls: Iterable[str], delay_seconds: float = 0) -> int:
+    """Queue products for scraping; finished or failed jobs are re-armed, live ones left alone"""
+    available_at = utcnow() + timedelta(seconds=delay_seconds)
+    urls = list(dict.fromkeys(url[:500] for url in urls))
+    if not urls:
+        return 0
+
+    if db.bind.dialect.name == 'postgresql':
+        stmt = pg_insert(ScrapeJob.__table__).values([
+            {'product_url': url, 'status': 'queued', 'attempts': 0, 'available_at': available_at}
+            for url in urls
+        ])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['product_url'],
+            set_={'status': 'queued', 'attempts': 0, 'available_at': available_at, 'last_error': None},
+            where=ScrapeJob.__table__.c.status.in_(('done', 'failed'))
+        )
+        result = db.execute(stmt)
+        db.commit()
+        return result.rowcount
+
+    # Portable fallback (SQLite for local tests)
+    existing = {job.product_url: job for job in db.query(ScrapeJob).filter(ScrapeJob.product_url.in_(urls))}
+    queued = 0
+    for url in urls:
+        job = existing.get(url)
+        if job is None:
+            db.add(ScrapeJob(product_url=url, status='queued', attempts=0, available_at=available_at))
+            queued += 1
+        elif job.status in ('done', 'failed'):
+            job.status, job.attempts, job.available_at, job.last_error = 'queued', 0, available_at, None
+            queued += 1
+    db.commit()
+    return queued
+
+
+def claim_jobs(db, worker_id: str, limit: int = 10, lease_seconds: int = DEFAULT_LEASE_SECONDS) -> List[ScrapeJob]:
+    """Atomically claim up to `limit` due jobs
+
+    SELECT ... FOR UPDATE SKIP LOCKED lets any number of workers claim
+    concurrently: rows locked by another worker's claim are skipped rather
+    than waited on, so no job is handed out twice.
+    """
+    now = utcnow()
+    jobs = (
+        db.query(ScrapeJob)
+        .filter(ScrapeJob.status == 'queued', ScrapeJob.available_at <= now)
+        .order_by(ScrapeJob.available_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+    for job in jobs:
+        job.status = 'claimed'
+        job.claimed_by = worker_id
+        job.attempts += 1
+        job.heartbeat_at = now
+        job.lease_expires_at = now + timedelta(seconds=lease_seconds)
+    db.commit()
+    return jobs
+
+
+def heartbeat(db, worker_id: str, job_ids: List, lease_seconds: int = DEFAULT_LEASE_SECONDS) -> int:
+    """Extend leases on our claimed jobs; returns how many we still hold"""
+    if not job_ids:
+        return 0
+    now = utcnow()
+    result = db.execute(
+        update(ScrapeJob)
+        .where(ScrapeJob.job_id.in_(job_ids), ScrapeJob.claimed_by == worker_id, ScrapeJob.status == 'claimed')
+        .values(heartbeat_at=now, lease_expires_at=now + timedelta(seconds=lease_seconds))
+    )
+    db.commit()
+    return result.rowcount
+
+
+def complete_job(db, job_id, worker_id: str, next_run_in: Optional[float] = None) -> bool:
+    """Mark a claimed job done, or re-queue it `next_run_in` seconds out for recurring checks"""
+    values = {'claimed_by': None, 'lease_expires_at': None, 'last_error': None}
+    if next_run_in is None:
+        values['status'] = 'done'
+    else:
+        values.update(status='queued', attempts=0, available_at=utcnow() + timedelta(seconds=next_run_in))
+    result = db.execute(
+        update(ScrapeJob)
+        .where(ScrapeJob.job_id == job_id, ScrapeJob.claimed_by == worker_id, ScrapeJob.status == 'claimed')
+        .values(**values)
+    )
+    db.commit()
+    return result.rowcount == 1
+
+
+def fail_job(db, job_id, worker_id: str, error: str, max_attempts: int = DEFAULT_MAX_ATTEMPTS) -> bool:
+    """Re-queue a failed job with exponential backoff, or park it as failed after max_attempts"""
+    job = db.query(ScrapeJob).filter(
+        ScrapeJob.job_id == job_id, ScrapeJob.claimed_by == worker_id, ScrapeJob.status == 'claimed'
+    ).with_for_update().first()
+    if not job:
+        db.rollback()
+        return False
+    job.claimed_by = None
+    job.lease_expires_at = None
+    job.last_error = (error or '')[:500]
+    if job.attempts >= max_attempts:
+        job.status = 'failed'
+    else:
+        job.status = 'queued'
+        job.available_at = utcnow() + timedelta(seconds=RETRY_BACKOFF_SECONDS * 2 ** (job.attempts - 1))
+    db.commit()
+    return True
+
+
+def requeue_expired(db, max_attempts: int = DEFAULT_MAX_ATTEMPTS) -> int:
+    """Return jobs whose worker stopped heartbeating to the queue
+
+    A job that has already used up its attempts is parked as failed instead,
+    so a product that keeps killing its worker can't circulate forever.
+    """
+    now = utcnow()
+    expired = (ScrapeJob.status == 'claimed', ScrapeJob.lease_expires_at < now)
+    parked = db.execute(
+        update(ScrapeJob)
+        .where(*expired, ScrapeJob.attempts >= max_attempts)
+        .values(status='failed', claimed_by=None, lease_expires_at=None, last_error='lease expired')
+    )
+    result = db.execute(
+        update(ScrapeJob)
+        .where(*expired)
+        .values(status='queued', claimed_by=None, lease_expires_at=None, available_at=now)
+    )
+    db.commit()
+    if parked.rowcount:
+        logger.warning("Parked %s jobs as failed after %s expired leases", parked.rowcount, max_attempts)
+    if result.rowcount:
+        logger.warning("Re-queued %s jobs with expired leases", result.rowcount)
+    return result.rowcount
+
+
+def release_jobs(db, job_ids: List, worker_id: str) -> int:
+    """Hand claimed jobs we never started back to the queue at once, without using an attempt"""
+    if not job_ids:
+        return 0
+    result = db.execute(
+        update(ScrapeJob)
+        .where(ScrapeJob.job_id.in_(job_ids), ScrapeJob.claimed_by == worker_id, ScrapeJob.status == 'claimed')
+        .values(status='queued', claimed_by=None, lease_expires_at=None, available_at=utcnow(),
+                attempts=ScrapeJob.attempts - 1)
+    )
+    db.commit()
+    return result.rowcount
+
+
+class _Heartbeat(threading.Thread):
+    """Keeps leases alive from a thread
+
+    Renewal uses the blocking DB session, and check_product still runs its own
+    DB reads and writes on the event loop, so a loop task could be held up long
+    enough to lose the leases; the thread renews on time regardless.
+    """
+
+    def __init__(self, worker_id: str, job_ids: List, lease_seconds: int):
+        super().__init__(name=f"heartbeat-{worker_id}", daemon=True)
+        self.worker_id = worker_id
+        self.job_ids = job_ids
+        self.lease_seconds = lease_seconds
+        self.stopped = threading.Event()
+
+    def run(self):
+        interval = max(1.0, self.lease_seconds / 3)
+        while not self.stopped.wait(interval):
+            db = next(get_db())
+            try:
+                held = heartbeat(db, self.worker_id, list(self.job_ids), self.lease_seconds)
+                if held < len(self.job_ids):
+                    logger.warning("%s lost %s job leases", self.worker_id, len(self.job_ids) - held)
+            except Exception as e:
+                logger.error("Heartbeat failed: %s", e)
+            finally:
+                db.close()
+
+    def stop(self):
+        self.stopped.set()
+
+
+class QueueWorker:
+    """Drains scrape_jobs with a PriceMonitor; run as many of these as you like"""
+
+    def __init__(
+        self,
+        monitor,
+        worker_id: Optional[str] = None,
+        batch_size: int = 5,
+        lease_seconds: int = DEFAULT_LEASE_SECONDS,
+        poll_interval: float = 5.0,
+        recheck_interval: Optional[float] = None,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS
+    ):
+        self.monitor = monitor
+        self.worker_id = worker_id or default_worker_id()
+        self.batch_size = batch_size
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.recheck_interval = recheck_interval
+        self.max_attempts = max_attempts
+        self.stopping = asyncio.Event()
+        self.subscriptions_loaded_at: Optional[float] = None
+
+    async def run_once(self) -> int:
+        """Claim and process one batch; returns the number of jobs processed"""
+        db = next(get_db())
+        try:
+            requeue_expired(db, self.max_attempts)
+            jobs = [(job.job_id, job.product_url) for job in claim_jobs(db, self.worker_id, self.batch_size, self.lease_seconds)]
+        finally:
+            db.close()
+        if not jobs:
+            return 0
+
+        beat = _Heartbeat(self.worker_id, [job_id for job_id, _ in jobs], self.lease_seconds)
+        beat.start()
+        try:
+            for job_id, url in jobs:
+                if self.stopping.is_set():
+                    break
+                ok = await self.monitor.check_product(url)
+                beat.job_ids.remove(job_id)
+                db = next(get_db())
+                try:
+                    if ok:
+                        complete_job(db, job_id, self.worker_id, self.recheck_interval)
+                    elif url in self.monitor.skipped:
+                        # Retailer's circuit is open: not the product's fault, so no backoff penalty
+                        complete_job(db, job_id, self.worker_id, self.monitor.skipped.pop(url))
+                    else:
+                        fail_job(db, job_id, self.worker_id, "scrape failed", self.max_attempts)
+                finally:
+                    db.close()
+        finally:
+            beat.stop()
+            if beat.job_ids:
+                # Stopped (or crashed) part-way: let other workers have the rest now, not after the lease
+                db = next(get_db())
+                try:
+                    released = release_jobs(db, list(beat.job_ids), self.worker_id)
+                    logger.info("%s released %s unprocessed jobs", self.worker_id, released)
+                except Exception as e:
+                    logger.error("Releasing jobs failed; they will be re-queued when their leases expire: %s", e)
+                finally:
+                    db.close()
+        return len(jobs)
+
+    def refresh_subscriptions(self) -> None:
+        """Load subscriptions on start and every SUBSCRIPTION_REFRESH_SECONDS after"""
+        now = time.monotonic()
+        if self.subscriptions_loaded_at is None or now - self.subscriptions_loaded_at >= SUBSCRIPTION_REFRESH_SECONDS:
+            self.monitor.load_subscriptions()
+            self.subscriptions_loaded_at = now
+
+    async def run(self) -> None:
+        logger.info("Queue worker %s started", self.worker_id)
+        while not self.stopping.is_set():
+            self.refresh_subscriptions()
+            processed = await self.run_once()
+            if not processed:
+                try:
+                    await asyncio.wait_for(self.stopping.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+        logger.info("Queue worker %s stopped", self.worker_id)
+
+    def stop(self) -> None:
+        self.stopping.set()
+
+
+async def _run_worker(args):
+    from check_prices import PriceMonitor
+
+    monitor = PriceMonitor()
+    worker = QueueWorker(
+        monitor,
+        worker_id=args.worker_id,
+        batch_size=args.batch_size,
+        lease_seconds=args.lease,
+        recheck_interval=args.recheck,
+        max_attempts=args.max_attempts
+    )
+    try:
+        await worker.run()
+    finally:
+        await monitor.aclose()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Distributed scrape job queue")
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('enqueue', help="Queue every product in the products table")
+    sub.add_parser('requeue', help="Return jobs with expired leases to the queue")
+    worker = sub.add_parser('worker', help="Claim and scrape jobs until interrupted")
+    worker.add_argument('--worker-id', default=None)
+    worker.add_argument('--batch-size', type=int, default=5)
+    worker.add_argument('--lease', type=int, default=DEFAULT_LEASE_SECONDS)
+    worker.add_argument('--max-attempts', type=int, default=DEFAULT_MAX_ATTEMPTS,
+                        help="Park a job as failed after this many failed or expired attempts")
+    worker.add_argument('--recheck', type=float, default=None,
+                        help="Re-queue finished jobs this many seconds later instead of marking them done")
+    args = parser.parse_args(argv)
+
+    if args.command == 'worker':
+        asyncio.run(_run_worker(args))
+        return
+
+    db = next(get_db())
+    try:
+        if args.command == 'enqueue':
+            count = enqueue_products(db, (url for (url,) in db.query(Product.url)))
+            logger.info("Queued %s products", count)
+        else:
+            requeue_expired(db)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    configure_logging()
+    main()